@@ -0,0 +1,867 @@
+#!/usr/bin/env python3
+"""Hardware-free benchmark for the station controller daemon, the rotary client and the station runtime.
+
+``python3 bench.py run`` starts a stand-in FLSS server in this process. It
+serves ``/ws/controller``, ``/dispatch/remote/*``, ``/dispatch/environment``
+and ``/environment/ingest``, with configurable latency, jitter, error
+injection and connection flaps. Each client then runs in its own process on
+gpiozero's mock pin factory, and the encoder and buttons are toggled through
+the same ``Button`` callbacks real edges would hit.
+
+Every run prints one JSON line containing:
+
+- inputs generated and inputs the server actually received;
+- throughput and per-stage latency percentiles (from ``latency.py``);
+- CPU time and RSS of the client process.
+
+``--baseline`` compares the run against an earlier ``--out`` file and
+exits 1 on regressions, so a slower hot path shows up before a release
+reaches the floor.
+
+``python3 bench.py footprint`` runs the same inputs and simulated sensors
+twice. The first run uses the two-service setup (``controller_daemon.py`` and
+the rotary client side by side). The second uses ``station.py`` alone. It
+prints the summed RSS and CPU of each.
+
+Scenarios:
+  spin     sustained encoder spin, fast LAN
+  buttons  button storm, fast LAN
+  flap     moderate input while the server drops off the network every few seconds
+  slow     moderate input against a 250ms +/- 100ms server
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROTARY_SCRIPT = os.path.join(os.path.dirname(HERE), "scripts", "rotary-pi-wired.py")
+TOKEN = "bench-token"
+
+# Pins shared by both clients' defaults: encoder CLK/DT, then two push buttons
+# (CONFIRM/BACK on the daemon, Print/Fulfill on the rotary client).
+CLK_PIN, DT_PIN = 17, 27
+PRESS_PINS = (5, 6)
+PRESS_HOLD_S = 0.06  # longer than both clients' 50ms button bounce_time
+
+CW_DETENT = [0b01, 0b11, 0b10, 0b00]
+CCW_DETENT = [0b10, 0b11, 0b01, 0b00]
+LINE_ACTIONS = {"next", "prev", "qty_increase", "qty_decrease"}
+
+
+@dataclass(frozen=True)
+class Scenario:
+    detents_per_s: float
+    presses_per_s: float
+    latency_ms: float = 2.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    flap_up_s: float = 0.0
+    flap_down_s: float = 0.0
+    reverse_every: int = 40
+
+
+SCENARIOS = {
+    "spin": Scenario(detents_per_s=30, presses_per_s=0),
+    "buttons": Scenario(detents_per_s=0, presses_per_s=8),
+    "flap": Scenario(detents_per_s=10, presses_per_s=1, flap_up_s=3.0, flap_down_s=1.5),
+    "slow": Scenario(detents_per_s=10, presses_per_s=1, latency_ms=250, jitter_ms=100),
+}
+
+
+# -- stand-in FLSS server ----------------------------------------------------------
+
+
+class StandInServer:
+    """HTTP + WebSocket fake of the FLSS endpoints the Pi clients use."""
+
+    def __init__(self) -> None:
+        self.scenario = SCENARIOS["spin"]
+        self._lock = threading.Lock()
+        self._rng = random.Random(7)
+        self.counts: Counter[str] = Counter()
+        self._seen_keys: set[str] = set()
+        self._last_seq = 0
+        self._epoch = time.monotonic()
+        self._http: ThreadingHTTPServer | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._ws_server = None
+        self._ws_conns: set = set()
+        self.http_base = ""
+        self.ws_url = ""
+
+    # lifecycle -------------------------------------------------------------------
+
+    def start(self) -> None:
+        self._http = ThreadingHTTPServer(("127.0.0.1", 0), _HttpHandler)
+        self._http.daemon_threads = True
+        self._http.bench = self
+        threading.Thread(target=self._http.serve_forever, name="bench-http", daemon=True).start()
+        self.http_base = f"http://127.0.0.1:{self._http.server_address[1]}/api/v1"
+
+        ready = threading.Event()
+        threading.Thread(target=self._run_ws, args=(ready,), name="bench-ws", daemon=True).start()
+        ready.wait(10)
+
+    def stop(self) -> None:
+        if self._http is not None:
+            self._http.shutdown()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def configure(self, scenario: Scenario) -> None:
+        with self._lock:
+            self.scenario = scenario
+            self.counts = Counter()
+            self._seen_keys = set()
+            self._last_seq = 0
+            self._epoch = time.monotonic()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+    # behaviour -------------------------------------------------------------------
+
+    def is_down(self) -> bool:
+        scenario = self.scenario
+        if scenario.flap_up_s <= 0 or scenario.flap_down_s <= 0:
+            return False
+        phase = (time.monotonic() - self._epoch) % (scenario.flap_up_s + scenario.flap_down_s)
+        return phase >= scenario.flap_up_s
+
+    def delay_s(self) -> float:
+        scenario = self.scenario
+        with self._lock:
+            jitter = self._rng.uniform(-scenario.jitter_ms, scenario.jitter_ms) if scenario.jitter_ms else 0.0
+        return max(0.0, scenario.latency_ms + jitter) / 1000.0
+
+    def _inject_error(self) -> bool:
+        with self._lock:
+            return self.scenario.error_rate > 0 and self._rng.random() < self.scenario.error_rate
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counts[key] += amount
+
+    def remote_action(self, body: dict) -> tuple[int, dict]:
+        if self._inject_error():
+            self.count("errorsInjected")
+            return 503, {"ok": False, "error": "injected"}
+        action = str(body.get("action") or "")
+        key = str(body.get("idempotencyKey") or "")
+        with self._lock:
+            duplicate = bool(key) and key in self._seen_keys
+            self._seen_keys.add(key)
+        if duplicate:
+            self.count("replayed")
+            return 200, {"ok": True, "action": action, "deduped": True}
+        steps = abs(int(body.get("steps") or 1))
+        self.count("lines" if action in LINE_ACTIONS else "presses", steps if action in LINE_ACTIONS else 1)
+        return 200, {"ok": True, "action": action, "selectedOrderId": "bench-1"}
+
+    def legacy_action(self, action: str) -> tuple[int, dict]:
+        self.count("legacy")
+        self.count("lines" if action in {"next", "prev"} else "presses")
+        return 200, {"ok": True, "action": action}
+
+    def environment(self, body) -> tuple[int, dict]:
+        readings = body if isinstance(body, list) else body.get("readings") if isinstance(body, dict) else None
+        self.count("readings", len(readings) if isinstance(readings, list) else 1)
+        return 200, {"ok": True}
+
+    def controller_events(self, events: list) -> int:
+        """Count first deliveries of sequenced controller events; return the highest seq."""
+        highest = 0
+        for event in events:
+            seq = int(event.get("seq") or 0)
+            highest = max(highest, seq)
+            with self._lock:
+                if seq and seq <= self._last_seq:
+                    self.counts["replayed"] += 1
+                    continue
+                self._last_seq = max(self._last_seq, seq)
+                data = event.get("data") or {}
+                if event.get("event") == "ROTATE":
+                    self.counts["lines"] += int(data.get("steps") or 0)
+                elif event.get("event") == "PRESS" and data.get("action") == "click":
+                    self.counts["presses"] += 1
+                self.counts["events"] += 1
+        return highest
+
+    # WebSocket side ------------------------------------------------------------------
+
+    def _run_ws(self, ready: threading.Event) -> None:
+        import websockets
+
+        async def main() -> None:
+            self._loop = asyncio.get_running_loop()
+            self._ws_server = await websockets.serve(self._ws_handler, "127.0.0.1", 0)
+            port = next(iter(self._ws_server.sockets)).getsockname()[1]
+            self.ws_url = f"ws://127.0.0.1:{port}/ws/controller"
+            ready.set()
+            while True:
+                await asyncio.sleep(0.05)
+                if self.is_down():
+                    for conn in list(self._ws_conns):
+                        # No close frame: the client sees the link vanish, as on a real outage.
+                        conn.transport.abort()
+
+        try:
+            asyncio.run(main())
+        except RuntimeError:
+            pass
+
+    async def _ws_handler(self, ws, _path: str | None = None) -> None:
+        if self.is_down():
+            ws.transport.abort()
+            return
+        request = getattr(ws, "request", None)
+        headers = getattr(request, "headers", None) or getattr(ws, "request_headers", {})
+        authorized = headers.get("Authorization", "") == f"Bearer {TOKEN}"
+        self.count("wsConnects")
+        self._ws_conns.add(ws)
+        loop = asyncio.get_running_loop()
+        outgoing: asyncio.Queue = asyncio.Queue()
+
+        async def writer() -> None:
+            # Replies keep arrival order; each leaves once its injected delay has passed.
+            while True:
+                due, frame = await outgoing.get()
+                delay = due - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await ws.send(frame)
+
+        writer_task = asyncio.create_task(writer())
+        last_due = 0.0
+        try:
+            await ws.send(json.dumps({"channel": "ready", "payload": {"remoteCommands": True}}))
+            async for raw in ws:
+                delay = self.delay_s()
+                due = last_due = max(last_due, loop.time() + delay)
+                # Half the delay is the uplink, so serverTime sits mid-flight like on a real link.
+                server_ms = (time.time() + delay / 2) * 1000.0
+                frame = self._ws_reply(json.loads(raw), authorized, server_ms)
+                if frame == "drop":
+                    ws.transport.abort()
+                    break
+                if frame is not None:
+                    outgoing.put_nowait((due, frame))
+        except Exception:
+            pass
+        finally:
+            writer_task.cancel()
+            self._ws_conns.discard(ws)
+
+    def _ws_reply(self, message, authorized: bool, server_ms: float) -> str | None:
+        kind = message.get("type") if isinstance(message, dict) else None
+        if kind in {"remote-action", "remote-heartbeat", "remote-environment"}:
+            self.count(f"ws:{kind}")
+            body = message.get("body") or {}
+            if not authorized:
+                status, reply = 401, {"ok": False, "error": "Unauthorized"}
+            elif kind == "remote-action":
+                status, reply = self.remote_action(body)
+            elif kind == "remote-environment":
+                status, reply = self.environment(body)
+            else:
+                status, reply = 200, {"ok": True}
+            payload = {"id": message.get("id"), "status": status, "body": reply, "serverTime": server_ms}
+            return json.dumps({"channel": "remote-result", "payload": payload})
+
+        events = message if isinstance(message, list) else message.get("events") if kind == "controller-batch" else [message]
+        self.count("ws:frames")
+        if self._inject_error():
+            self.count("errorsInjected")
+            return "drop"
+        seq = self.controller_events([event for event in events if isinstance(event, dict)])
+        if not seq:
+            return None
+        return json.dumps({"channel": "ack", "payload": {"seq": seq, "serverTime": server_ms}})
+
+
+class _HttpHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server naming
+        bench: StandInServer = self.server.bench
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if bench.is_down():
+            # Hang up without answering: requests raises ConnectionError like on a dead link.
+            self.close_connection = True
+            return
+        delay = bench.delay_s()
+        time.sleep(delay / 2)
+        server_ms = time.time() * 1000.0
+        path = self.path.split("?", 1)[0].removeprefix("/api/v1")
+        bench.count(f"http:{path}")
+        try:
+            body = json.loads(raw or b"{}")
+        except ValueError:
+            body = {}
+        status, reply = self._route(bench, path, body)
+        time.sleep(delay / 2)
+        encoded = json.dumps(reply).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.send_header("X-Server-Time", str(int(server_ms)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def _route(self, bench: StandInServer, path: str, body) -> tuple[int, dict]:
+        authorized = self.headers.get("Authorization", "") == f"Bearer {TOKEN}"
+        if path.startswith("/dispatch/") and path.count("/") == 2 and path.rsplit("/", 1)[1] in {
+            "next", "prev", "confirm", "print", "fulfill"
+        }:
+            return bench.legacy_action(path.rsplit("/", 1)[1])
+        if not authorized:
+            return 401, {"ok": False, "error": "Unauthorized"}
+        if path == "/dispatch/remote/action":
+            return bench.remote_action(body if isinstance(body, dict) else {})
+        if path == "/dispatch/remote/heartbeat":
+            return 200, {"ok": True}
+        if path in {"/dispatch/environment", "/environment/ingest"}:
+            return bench.environment(body)
+        return 404, {"ok": False, "error": "Not found"}
+
+    def log_message(self, *_args) -> None:
+        pass
+
+
+# -- client side (runs in a child process) -------------------------------------------
+
+
+def input_timeline(scenario: Scenario, duration_s: float) -> tuple[list[tuple[float, int, bool]], int, int]:
+    """``(t, pin, pressed)`` edges for the scenario, plus the detent and press counts."""
+    edges: list[tuple[float, int, bool]] = []
+    detents = int(duration_s * scenario.detents_per_s)
+    if detents:
+        gap = 1.0 / (scenario.detents_per_s * 4)
+        state = 0b00
+        t = 0.0
+        for detent in range(detents):
+            sequence = CW_DETENT if (detent // max(1, scenario.reverse_every)) % 2 == 0 else CCW_DETENT
+            for nxt in sequence:
+                changed = state ^ nxt
+                pin = CLK_PIN if changed & 0b10 else DT_PIN
+                pressed = bool(nxt & (0b10 if pin == CLK_PIN else 0b01))
+                edges.append((t, pin, pressed))
+                state = nxt
+                t += gap
+    presses = int(duration_s * scenario.presses_per_s)
+    if presses:
+        period = 1.0 / scenario.presses_per_s
+        for index in range(presses):
+            pin = PRESS_PINS[index % len(PRESS_PINS)]
+            edges.append((index * period + period / 2, pin, True))
+            edges.append((index * period + period / 2 + PRESS_HOLD_S, pin, False))
+    edges.sort(key=lambda edge: edge[0])
+    return edges, detents, presses
+
+
+def drive(edges: list[tuple[float, int, bool]], hold_s: float = 0.0) -> None:
+    """Replay ``edges``, then stay idle until ``hold_s`` has passed since the first one."""
+    from gpiozero import Device
+
+    pins = {pin: Device.pin_factory.pin(pin) for _t, pin, _pressed in edges}
+    started = time.monotonic()
+    for t, pin, pressed in edges:
+        delay = started + t - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        # Buttons are pull-up: pressed means pulled to GND.
+        if pressed:
+            pins[pin].drive_low()
+        else:
+            pins[pin].drive_high()
+    time.sleep(max(0.0, started + hold_s - time.monotonic()))
+
+
+def _process_usage() -> dict[str, float]:
+    usage = {"cpuS": time.process_time()}
+    try:
+        with open("/proc/self/status", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key = "rssKb" if line.startswith("VmRSS") else "rssPeakKb"
+                    usage[key] = float(line.split()[1])
+    except OSError:
+        import resource
+
+        usage["rssPeakKb"] = float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    return usage
+
+
+def _wait_until(predicate, timeout_s: float) -> bool:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def load_rotary():
+    """Import ``scripts/rotary-pi-wired.py`` (not a valid module name) as ``rotary_pi_wired``."""
+    if "rotary_pi_wired" in sys.modules:
+        return sys.modules["rotary_pi_wired"]
+    spec = importlib.util.spec_from_file_location("rotary_pi_wired", ROTARY_SCRIPT)
+    rotary = importlib.util.module_from_spec(spec)
+    sys.modules["rotary_pi_wired"] = rotary
+    spec.loader.exec_module(rotary)
+    return rotary
+
+
+def _socket_stats(client) -> dict[str, int]:
+    socket = client.remote_socket
+    if socket is None:
+        return {}
+    return {"socketRequests": socket.requests, "socketFallbacks": socket.fallbacks, "socketConnects": socket.connects}
+
+
+def run_rotary(edges, duration_s: float, hold_s: float = 0.0) -> dict:
+    rotary = load_rotary()
+    from gpiozero import RGBLED
+
+    settings = rotary.load_settings()
+    led = RGBLED(settings.rgb_red_pin, settings.rgb_green_pin, settings.rgb_blue_pin)
+    client = rotary.RotaryFlssClient(settings, led)
+    client.start()
+    # Sensors and periodic jobs as the service runs them, so footprints compare like for like.
+    environment = rotary.EnvironmentMonitor(settings, client.telemetry)
+    environment.start()
+    executor, jobs = rotary.start_jobs(client, environment, settings)
+    controls = rotary.open_controls(client, settings)
+    if client.remote_socket is not None:
+        _wait_until(client.remote_socket.is_connected, 3.0)
+
+    before = _process_usage()
+    started = time.monotonic()
+    drive(edges, hold_s)
+    inputs_done = time.monotonic()
+    dispatcher = client.dispatcher
+    _wait_until(
+        lambda: client.pending_actions() == 0 and dispatcher.queue_depth() == 0 and dispatcher.in_flight == 0,
+        30.0 + duration_s,
+    )
+    finished = time.monotonic()
+    after = _process_usage()
+
+    stats = dispatcher.stats()
+    stats.pop("latencyByAction", None)
+    stats.update(_socket_stats(client))
+    result = _client_result(client.latency, before, after, started, inputs_done, finished, stats)
+    del controls
+    for job in jobs:
+        job.stop()
+    executor.shutdown(wait=False, cancel_futures=True)
+    environment.stop()
+    client.close()
+    return result
+
+
+def _daemon_drained(daemon) -> bool:
+    return (
+        daemon.ingress.depth() == 0
+        and daemon._encoder_flush_at is None
+        and daemon.event_q.empty()
+        and daemon.outbox.pending() == 0
+    )
+
+
+def run_daemon(edges, duration_s: float, hold_s: float = 0.0) -> dict:
+    import controller_daemon
+
+    daemon = controller_daemon.ControllerDaemon()
+
+    def drained() -> bool:
+        return _daemon_drained(daemon)
+
+    async def main() -> dict:
+        task = asyncio.create_task(daemon.run())
+        await asyncio.sleep(1.0)
+        before = _process_usage()
+        started = time.monotonic()
+        await asyncio.get_running_loop().run_in_executor(None, drive, edges, hold_s)
+        inputs_done = time.monotonic()
+        deadline = inputs_done + 30.0 + duration_s
+        while not drained() and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+        finished = time.monotonic()
+        after = _process_usage()
+        stats = {
+            "droppedEvents": daemon.dropped_events,
+            "coalescedEvents": daemon.coalesced_events,
+            "outboxDropped": daemon.outbox.dropped,
+            "outboxPending": daemon.outbox.pending(),
+            "ingressOverruns": daemon.ingress.overruns,
+            "ingressWakeups": daemon.ingress.wakeups,
+        }
+        result = _client_result(daemon.latency, before, after, started, inputs_done, finished, stats)
+        daemon.stop.set()
+        await task
+        return result
+
+    return asyncio.run(main())
+
+
+def run_station(edges, duration_s: float, hold_s: float = 0.0) -> dict:
+    import station
+
+    runtime = station.StationRuntime(os.getenv("STATION_INPUT_PROFILE", "rotary"))
+    client = runtime.client
+    dispatcher = client.dispatcher
+
+    def drained() -> bool:
+        idle = client.pending_actions() == 0 and dispatcher.queue_depth() == 0 and dispatcher.in_flight == 0
+        return idle and _daemon_drained(runtime)
+
+    async def main() -> dict:
+        task = asyncio.create_task(runtime.run())
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(1.0)
+        await loop.run_in_executor(None, _wait_until, lambda: runtime.remote_ready, 3.0)
+        before = _process_usage()
+        started = time.monotonic()
+        await loop.run_in_executor(None, drive, edges, hold_s)
+        inputs_done = time.monotonic()
+        deadline = inputs_done + 30.0 + duration_s
+        while not drained() and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+        finished = time.monotonic()
+        after = _process_usage()
+        stats = dispatcher.stats()
+        stats.pop("latencyByAction", None)
+        stats.update(_socket_stats(client))
+        stats.update(droppedEvents=runtime.dropped_events, outboxPending=runtime.outbox.pending())
+        # Whichever side the input profile sent the inputs through.
+        latency = client.latency if runtime.profile == "rotary" else runtime.latency
+        result = _client_result(latency, before, after, started, inputs_done, finished, stats)
+        runtime.shutdown()
+        await task
+        return result
+
+    return asyncio.run(main())
+
+
+def _client_result(latency, before, after, started, inputs_done, finished, stats) -> dict:
+    snapshot = latency.snapshot()
+    wall_s = finished - started
+    cpu_s = after["cpuS"] - before["cpuS"]
+    totals = [stages["total"]["p99Ms"] for stages in snapshot.values() if "total" in stages]
+    return {
+        "wallS": round(wall_s, 3),
+        "drainS": round(finished - inputs_done, 3),
+        "cpuS": round(cpu_s, 3),
+        "cpuPct": round(100.0 * cpu_s / wall_s, 2) if wall_s > 0 else 0.0,
+        "rssKb": after.get("rssKb"),
+        "rssPeakKb": after.get("rssPeakKb"),
+        "p99Ms": max(totals) if totals else None,
+        "latency": snapshot,
+        "clientStats": stats,
+    }
+
+
+def client_main(args: argparse.Namespace) -> int:
+    from gpiozero import Device
+    from gpiozero.pins.mock import MockFactory, MockPWMPin
+
+    Device.pin_factory = MockFactory(pin_class=MockPWMPin)
+    scenario = Scenario(**json.loads(args.scenario))
+    edges, _detents, _presses = input_timeline(scenario, args.duration)
+    run = {"daemon": run_daemon, "rotary": run_rotary, "station": run_station}[args.client]
+    result = run(edges, args.duration, args.hold)
+    with open(args.result, "w", encoding="utf-8") as handle:
+        json.dump(result, handle)
+    return 0
+
+
+# -- orchestration ---------------------------------------------------------------
+
+
+def client_env(client: str, server: StandInServer, overrides: dict[str, str], workdir: str) -> dict[str, str]:
+    env = dict(os.environ)
+    # The station runtime reads both clients' settings.
+    if client in {"daemon", "station"}:
+        env.update(
+            FLSS_CONTROLLER_WS=server.ws_url,
+            FLSS_CONTROLLER_SOURCE="bench-station",
+            FLSS_OUTBOX_DIR=os.path.join(workdir, "outbox"),
+            # One line per detent, so delivered lines can be compared with inputs.
+            ENCODER_ACCEL_MAX="1",
+        )
+    if client in {"rotary", "station"}:
+        env.update(
+            FLSS_BASE_URL=server.http_base,
+            ROTARY_WS_URL=f"{server.ws_url}?source=bench-rotary",
+            REMOTE_TOKEN=TOKEN,
+            ROTARY_TOKEN=TOKEN,
+            REMOTE_ID="bench-rotary",
+            DHT11_ENABLED="0",
+            ENV_SENSOR_CMD="",
+            ENV_HISTORY_DIR=os.path.join(workdir, "history"),
+            ROTARY_ENCODER_ACCEL_MAX="1",
+        )
+    # Never touch a real DHT11 from the bench, even on a Pi.
+    env["SENSORS"] = "[]"
+    env.update(overrides)
+    return env
+
+
+def _launch(client: str, scenario: Scenario, args: argparse.Namespace, workdir: str, env: dict[str, str], hold_s: float = 0.0):
+    """Start one ``_client`` child with its output in ``workdir``; returns the process and its log handle."""
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "_client",
+        client,
+        "--scenario",
+        json.dumps(asdict(scenario)),
+        "--duration",
+        str(args.duration),
+        "--hold",
+        str(hold_s),
+        "--result",
+        os.path.join(workdir, "result.json"),
+    ]
+    log = open(os.path.join(workdir, "client.log"), "w", encoding="utf-8")
+    proc = subprocess.Popen(command, cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return proc, log
+
+
+def _collect(proc: subprocess.Popen, log, client: str, name: str, args: argparse.Namespace, workdir: str) -> dict:
+    """Wait for a child started by ``_launch`` and read its result."""
+    try:
+        proc.wait(timeout=args.duration * 4 + 90)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+    log.close()
+    log_path = os.path.join(workdir, "client.log")
+    result_path = os.path.join(workdir, "result.json")
+    if getattr(args, "log_dir", None):
+        os.makedirs(args.log_dir, exist_ok=True)
+        shutil.copyfile(log_path, os.path.join(args.log_dir, f"{client}-{name}.log"))
+    if proc.returncode != 0 or not os.path.exists(result_path):
+        with open(log_path, encoding="utf-8") as handle:
+            tail = handle.read()[-2000:]
+        raise RuntimeError(f"{client}/{name} exited with {proc.returncode}:\n{tail}")
+    with open(result_path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def run_one(server: StandInServer, client: str, name: str, scenario: Scenario, args: argparse.Namespace) -> dict:
+    server.configure(scenario)
+    edges, detents, presses = input_timeline(scenario, args.duration)
+    with tempfile.TemporaryDirectory(prefix="flss-bench-") as workdir:
+        proc, log = _launch(client, scenario, args, workdir, client_env(client, server, args.env, workdir))
+        measured = _collect(proc, log, client, name, args, workdir)
+
+    served = server.stats()
+    expected = detents + presses
+    delivered = served.get("lines", 0) + served.get("presses", 0)
+    return {
+        "client": client,
+        "scenario": name,
+        "durationS": args.duration,
+        "inputs": {"detents": detents, "presses": presses},
+        "delivered": {"lines": served.get("lines", 0), "presses": served.get("presses", 0)},
+        "deliveredRatio": round(delivered / expected, 4) if expected else None,
+        "throughputPerS": round(delivered / measured["wallS"], 2) if measured["wallS"] else 0.0,
+        **measured,
+        "server": {**asdict(scenario), "counts": served},
+        "env": args.env,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+
+
+# Metric -> True when a higher value is better.
+COMPARED = {"deliveredRatio": True, "throughputPerS": True, "p99Ms": False, "cpuPct": False, "rssPeakKb": False}
+
+
+def compare(results: list[dict], baseline_path: str, tolerance: float) -> list[str]:
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline = {(entry["client"], entry["scenario"]): entry for entry in map(json.loads, filter(str.strip, handle))}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result["client"], result["scenario"]))
+        if previous is None:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (change < -tolerance) if higher_is_better else (change > tolerance):
+                regressions.append(f"{result['client']}/{result['scenario']} {metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def run_main(args: argparse.Namespace) -> int:
+    server = StandInServer()
+    server.start()
+    results = []
+    try:
+        for client in args.client:
+            for name in args.scenario:
+                scenario = SCENARIOS[name]
+                overrides = {
+                    key: value
+                    for key, value in {
+                        "latency_ms": args.latency_ms,
+                        "jitter_ms": args.jitter_ms,
+                        "error_rate": args.error_rate,
+                    }.items()
+                    if value is not None
+                }
+                result = run_one(server, client, name, replace(scenario, **overrides), args)
+                results.append(result)
+                line = json.dumps(result, separators=(",", ":"))
+                print(line, flush=True)
+                if args.out:
+                    with open(args.out, "a", encoding="utf-8") as handle:
+                        handle.write(line + "\n")
+    finally:
+        server.stop()
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"[REGRESSION] {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+# The same simulated sensors for both setups, so each pays for polling as a real station would.
+FOOTPRINT_SENSORS = [
+    {"id": "sim-packing", "driver": "simulated", "interval_s": 2, "latency_s": 0.25},
+    {"id": "sim-cold-room", "driver": "simulated", "interval_s": 5, "latency_s": 0.25},
+]
+FOOTPRINT_SETUPS = {"pair": ("daemon", "rotary"), "station": ("station",)}
+
+
+def footprint_main(args: argparse.Namespace) -> int:
+    """Summed RSS and CPU of the two-service setup against ``station.py`` on the same inputs."""
+    scenario = SCENARIOS[args.scenario]
+    # Inputs go to the rotary client (its actions are what the station runs); the daemon idles beside it.
+    idle = replace(scenario, detents_per_s=0, presses_per_s=0)
+    overrides = {"SENSORS": json.dumps(FOOTPRINT_SENSORS), **args.env}
+    server = StandInServer()
+    server.start()
+    totals: dict[str, dict] = {}
+    try:
+        for setup, clients in FOOTPRINT_SETUPS.items():
+            server.configure(scenario)
+            with contextlib.ExitStack() as stack:
+                running = []
+                for client in clients:
+                    workdir = stack.enter_context(tempfile.TemporaryDirectory(prefix="flss-bench-"))
+                    env = client_env(client, server, overrides, workdir)
+                    # Every process stays up for the whole run, so CPU covers the same idle time.
+                    launched = _launch(client, idle if client == "daemon" else scenario, args, workdir, env, args.duration)
+                    running.append((client, workdir, *launched))
+                measured = {
+                    client: _collect(proc, log, client, f"footprint-{setup}", args, workdir)
+                    for client, workdir, proc, log in running
+                }
+            served = server.stats()
+            total = {
+                "setup": setup,
+                "scenario": args.scenario,
+                "durationS": args.duration,
+                "processes": len(measured),
+                "rssKb": sum(result.get("rssKb") or 0 for result in measured.values()),
+                "rssPeakKb": sum(result.get("rssPeakKb") or 0 for result in measured.values()),
+                "cpuS": round(sum(result["cpuS"] for result in measured.values()), 3),
+                "cpuPct": round(sum(result["cpuPct"] for result in measured.values()), 2),
+                "delivered": {key: served.get(key, 0) for key in ("lines", "presses", "readings")},
+                "perProcess": {
+                    client: {key: result.get(key) for key in ("rssKb", "rssPeakKb", "cpuS", "cpuPct")}
+                    for client, result in measured.items()
+                },
+            }
+            totals[setup] = total
+            print(json.dumps(total, separators=(",", ":")), flush=True)
+    finally:
+        server.stop()
+
+    pair, station = totals["pair"], totals["station"]
+    saved = {
+        key: round(100.0 * (pair[key] - station[key]) / pair[key], 1) if pair[key] else None
+        for key in ("rssKb", "rssPeakKb", "cpuS")
+    }
+    print(json.dumps({"savedPct": saved}, separators=(",", ":")), flush=True)
+    return 0
+
+
+def _env_pair(raw: str) -> tuple[str, str]:
+    key, sep, value = raw.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError("expected KEY=VALUE")
+    return key, value
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run scenarios against the stand-in server")
+    run.add_argument("--client", action="append", choices=("daemon", "rotary", "station"), help="default: daemon and rotary")
+    run.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="default: all")
+    run.add_argument("--duration", type=float, default=10.0, help="seconds of input per run")
+    run.add_argument("--latency-ms", type=float, help="override the scenario's server latency")
+    run.add_argument("--jitter-ms", type=float, help="override the scenario's latency jitter")
+    run.add_argument("--error-rate", type=float, help="fraction of requests answered 503 / frames dropped")
+    run.add_argument("--env", type=_env_pair, action="append", default=[], help="KEY=VALUE passed to the client")
+    run.add_argument("--out", help="append JSON lines to this file")
+    run.add_argument("--log-dir", help="keep each client's output here as <client>-<scenario>.log")
+    run.add_argument("--baseline", help="JSON lines from an earlier run to compare against")
+    run.add_argument("--tolerance", type=float, default=0.25, help="allowed relative change before a regression")
+
+    footprint = commands.add_parser("footprint", help="RSS and CPU of daemon + rotary client vs the station runtime")
+    footprint.add_argument("--scenario", choices=sorted(SCENARIOS), default="buttons")
+    footprint.add_argument("--duration", type=float, default=30.0, help="seconds each setup runs")
+    footprint.add_argument("--env", type=_env_pair, action="append", default=[], help="KEY=VALUE passed to every process")
+    footprint.add_argument("--log-dir", help="keep each process's output here")
+
+    child = commands.add_parser("_client")
+    child.add_argument("client", choices=("daemon", "rotary", "station"))
+    child.add_argument("--scenario", required=True)
+    child.add_argument("--duration", type=float, required=True)
+    child.add_argument("--hold", type=float, default=0.0)
+    child.add_argument("--result", required=True)
+
+    args = parser.parse_args(argv)
+    if args.command == "_client":
+        return client_main(args)
+    args.env = dict(args.env)
+    if args.command == "footprint":
+        return footprint_main(args)
+    args.client = args.client or ["daemon", "rotary"]
+    args.scenario = args.scenario or list(SCENARIOS)
+    return run_main(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,26 +4,35 @@
 from __future__ import annotations
 
 import asyncio
+import inspect
 import json
 import logging
 import os
 import signal
-from dataclasses import dataclass
+import time
+from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
 
 import websockets
 from gpiozero import Button
 
-try:
-    import adafruit_dht
-    import board
-except Exception:  # pragma: no cover - optional runtime dependency on non-Pi hosts
-    adafruit_dht = None
-    board = None
+from edgetrace import EdgeRecorder
+from eventqueue import CLASSES, PriorityEventQueue
+from ingress import LEVEL_HELD, LEVEL_PRESSED, LEVEL_RELEASED, EdgeIngress
+from latency import LatencyRecorder
+from loopwatch import LoopWatchdog, StepProfiler
+from metrics import MetricsServer, MetricsWriter, histogram_gauges, on_loop, process_metrics
+from outbox import Outbox
+from quadrature import QuadratureDecoder
+from sensors import SensorPoller, SensorSpec, SensorState, load_specs
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 LOGGER = logging.getLogger("flss-pi-controller")
+# websockets >= 13 takes additional_headers; the legacy client called it extra_headers.
+_WS_HEADERS_ARG = (
+    "additional_headers" if "additional_headers" in inspect.signature(websockets.connect).parameters else "extra_headers"
+)
 
 
 @dataclass(frozen=True)
@@ -39,24 +48,134 @@ class PinMap:
     shift: int = 26
 
 
+def coalesce_records(records: list[tuple[int, str]]) -> list[tuple[int, str]]:
+    """Collapse a replayed backlog into fewer frames without changing its meaning.
+
+    Consecutive ROTATE events with the same direction and shift state become one
+    event with the summed step count, only the newest SENSOR reading per sensor survives, and
+    PRESS/HOLD events are never merged or reordered. A merged record keeps the seq
+    of its newest member so cumulative acks still cover everything it replaced.
+    """
+    if len(records) < 2:
+        return records
+
+    events = [(seq, json.loads(encoded), encoded) for seq, encoded in records]
+    newest_sensor_seq: dict[object, int] = {}
+    for seq, event, _ in events:
+        if event.get("event") == "SENSOR":
+            newest_sensor_seq[(event.get("data") or {}).get("sensor")] = seq
+
+    merged: list[list] = []
+    for seq, event, encoded in events:
+        kind = event.get("event")
+        if kind == "SENSOR" and seq != newest_sensor_seq[(event.get("data") or {}).get("sensor")]:
+            continue
+        if kind == "ROTATE" and merged and merged[-1][1].get("event") == "ROTATE":
+            previous = merged[-1][1]
+            if previous["data"].get("dir") == event["data"].get("dir") and bool(previous["data"].get("shift")) == bool(
+                event["data"].get("shift")
+            ):
+                previous["data"]["steps"] = int(previous["data"].get("steps", 0)) + int(event["data"].get("steps", 0))
+                previous["ts"] = event.get("ts", previous.get("ts"))
+                merged[-1][0] = seq
+                merged[-1][2] = None
+                continue
+        merged.append([seq, event, encoded])
+
+    return [(seq, encoded if encoded is not None else json.dumps(event, separators=(",", ":"))) for seq, event, encoded in merged]
+
+
 class ControllerDaemon:
+    BUTTON_NAMES = ("CONFIRM", "BACK", "QUICK", "MODE", "SHIFT")
+
     def __init__(self) -> None:
         self.ws_url = os.getenv("FLSS_CONTROLLER_WS", "ws://localhost:3000/ws/controller")
         self.source = os.getenv("FLSS_CONTROLLER_SOURCE", "pi-station-01")
-        self.sensor_interval_s = float(os.getenv("DHT_INTERVAL_S", "10"))
+        # Controller events need no token; FLSS only checks it for remote commands on the same socket.
+        self.ws_token = os.getenv("FLSS_CONTROLLER_TOKEN", "").strip()
         self.debounce_s = float(os.getenv("BUTTON_DEBOUNCE_S", "0.05"))
         self.long_press_s = float(os.getenv("LONG_PRESS_S", "0.8"))
         self.encoder_batch_ms = float(os.getenv("ENCODER_BATCH_MS", "30")) / 1000.0
+        self.decoder = QuadratureDecoder(
+            steps_per_detent=int(os.getenv("ENCODER_STEPS_PER_DETENT", "4")),
+            accel_max=int(os.getenv("ENCODER_ACCEL_MAX", "3")),
+            accel_slow_ms=float(os.getenv("ENCODER_ACCEL_SLOW_MS", "60")),
+            accel_fast_ms=float(os.getenv("ENCODER_ACCEL_FAST_MS", "15")),
+            reverse=os.getenv("ENCODER_REVERSE", "0").strip().lower() in {"1", "true", "yes"},
+        )
+        self.ws_send_gap_s = float(os.getenv("WS_MIN_SEND_GAP_MS", "30")) / 1000.0
+        self.ws_ack_window = max(1, int(os.getenv("WS_ACK_WINDOW", "256")))
+        # Opt-in micro-batching: 0 ms keeps one frame per event.
+        self.ws_batch_window_s = float(os.getenv("WS_BATCH_WINDOW_MS", "0")) / 1000.0
+        self.ws_batch_max = max(1, int(os.getenv("WS_BATCH_MAX", "32")))
+        self.ws_coalesce = os.getenv("WS_COALESCE", "1").strip().lower() not in {"0", "false", "no"}
+        self.coalesced_events = 0
+        # Edge -> emit -> send -> ack timings per event type; 0 s reports only on SIGUSR1.
+        self.latency = LatencyRecorder()
+        self.latency_report_s = float(os.getenv("LATENCY_REPORT_S", "0"))
+        self._traces: dict[int, list] = {}
+        self._trace_limit = 4096
+        # Loop-lag watchdog and per-coroutine busy time; cheap enough to leave on.
+        self.profiler = StepProfiler()
+        self.watchdog: LoopWatchdog | None = None
+        if os.getenv("LOOP_WATCHDOG", "1").strip().lower() not in {"0", "false", "no"}:
+            self.watchdog = LoopWatchdog(
+                interval_s=float(os.getenv("LOOP_WATCHDOG_INTERVAL_MS", "100")) / 1000.0,
+                stall_s=float(os.getenv("LOOP_STALL_MS", "100")) / 1000.0,
+            )
+
+        # Prometheus text on GET /metrics; host:port or unix:/path, empty to disable.
+        self.metrics_addr = os.getenv("METRICS_ADDR", "127.0.0.1:9464").strip()
+        if self.metrics_addr.lower() in {"0", "off", "false", "no"}:
+            self.metrics_addr = ""
+        self.metrics_server: MetricsServer | None = None
+        self.events_sent = 0
+        self.ws_connects = 0
+        self.ws_connected = False
+        self.server_rejections = 0
+
+        # Set EDGE_TRACE_PATH to record every raw edge for `edgetrace.py replay`.
+        self.edge_trace_path = os.getenv("EDGE_TRACE_PATH", "").strip()
+        self.recorder: EdgeRecorder | None = None
 
         self.pin_map = PinMap()
-        self.event_q: asyncio.Queue[dict] = asyncio.Queue()
+        # SENSORS / SENSORS_FILE list every sensor; without them, the single DHT11 on PinMap.dht.
+        self.sensor_poller = SensorPoller(
+            load_specs(os.getenv("SENSORS", ""), os.getenv("SENSORS_FILE", ""), [self._default_sensor()]),
+            self._on_sensor_result,
+            workers=int(os.getenv("SENSOR_WORKERS", "2")),
+        )
+        self.button_by_pin: dict[int, str] = {self.pin_map.enc_sw: "ENC_SW"}
+        self.button_by_pin.update({getattr(self.pin_map, name.lower()): name for name in self.BUTTON_NAMES})
+        self.ingress = EdgeIngress(int(os.getenv("GPIO_INGRESS_CAPACITY", "1024")))
+        # (event, edge_ns, enqueued_ns) until the spooler gives it a sequence number. ROTATE and
+        # SENSOR wait here while the outbox holds EVENT_SPOOL_AHEAD unacked events; 0 never holds them.
+        self.spool_ahead = max(0, int(os.getenv("EVENT_SPOOL_AHEAD", "64")))
+        queue_max = int(os.getenv("EVENT_QUEUE_MAX", "1024"))
+        self.event_q = PriorityEventQueue(
+            capacities={
+                name: int(os.getenv(f"EVENT_QUEUE_{name}_MAX", str(8 if name == "SENSOR" else queue_max)))
+                for name in CLASSES
+            },
+            policies={name: os.getenv(f"EVENT_QUEUE_{name}_POLICY", "drop-oldest").strip().lower() for name in CLASSES},
+            gate=self._spool_open if self.spool_ahead else None,
+        )
+        self.outbox = Outbox(
+            os.getenv("FLSS_OUTBOX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "outbox")),
+            segment_bytes=int(os.getenv("OUTBOX_SEGMENT_BYTES", str(256 * 1024))),
+            max_bytes=int(os.getenv("OUTBOX_MAX_BYTES", str(4 * 1024 * 1024))),
+        )
+        self._outbox_ready = asyncio.Event()
+        self._acked = asyncio.Event()
         self.stop = asyncio.Event()
 
         self.shift_held = False
         self._encoder_steps = 0
         self._encoder_dir = None
-        self._encoder_flush_task = None
-        self._dht = None
+        self._encoder_flush_at: float | None = None
+        self._encoder_edge_ns = 0
+        self._clk_level = 0
+        self._dt_level = 0
 
     @staticmethod
     def ts() -> str:
@@ -71,116 +190,466 @@ class ControllerDaemon:
             "data": data,
         }
 
-    async def emit(self, event: str, data: dict) -> None:
-        await self.event_q.put(self._base_event(event, data))
+    def _stamp(self, event: str, edge_ns: int | None) -> tuple[int, int]:
+        enqueued_ns = time.monotonic_ns()
+        edge_ns = edge_ns or enqueued_ns
+        self.latency.record(event, "input", enqueued_ns - edge_ns)
+        return edge_ns, enqueued_ns
+
+    @property
+    def dropped_events(self) -> int:
+        return self.event_q.dropped
+
+    def _spool_open(self) -> bool:
+        return self.outbox.pending() < self.spool_ahead
+
+    async def emit(self, event: str, data: dict, edge_ns: int | None = None) -> None:
+        self.emit_nowait(event, data, edge_ns)
+
+    def emit_nowait(self, event: str, data: dict, edge_ns: int | None = None) -> None:
+        # Never blocks: a full class applies its drop policy and counts it.
+        self.event_q.put_nowait((self._base_event(event, data), *self._stamp(event, edge_ns)))
 
     def setup_gpio(self) -> None:
-        self.enc_clk = Button(self.pin_map.enc_clk, pull_up=True, bounce_time=self.debounce_s)
-        self.enc_dt = Button(self.pin_map.enc_dt, pull_up=True, bounce_time=self.debounce_s)
+        # The quadrature decoder rejects bounce itself; a bounce_time would drop real edges.
+        self.enc_clk = Button(self.pin_map.enc_clk, pull_up=True, bounce_time=None)
+        self.enc_dt = Button(self.pin_map.enc_dt, pull_up=True, bounce_time=None)
         self.enc_sw = Button(self.pin_map.enc_sw, pull_up=True, bounce_time=self.debounce_s, hold_time=self.long_press_s)
 
         self.buttons = {
-            "CONFIRM": Button(self.pin_map.confirm, pull_up=True, bounce_time=self.debounce_s, hold_time=self.long_press_s),
-            "BACK": Button(self.pin_map.back, pull_up=True, bounce_time=self.debounce_s, hold_time=self.long_press_s),
-            "QUICK": Button(self.pin_map.quick, pull_up=True, bounce_time=self.debounce_s, hold_time=self.long_press_s),
-            "MODE": Button(self.pin_map.mode, pull_up=True, bounce_time=self.debounce_s, hold_time=self.long_press_s),
-            "SHIFT": Button(self.pin_map.shift, pull_up=True, bounce_time=self.debounce_s, hold_time=self.long_press_s),
+            name: Button(
+                getattr(self.pin_map, name.lower()),
+                pull_up=True,
+                bounce_time=self.debounce_s,
+                hold_time=self.long_press_s,
+            )
+            for name in self.BUTTON_NAMES
         }
 
-        self.enc_clk.when_pressed = lambda: self.on_encoder_edge("CW" if self.enc_dt.is_pressed else "CCW")
-        self.enc_sw.when_pressed = lambda: asyncio.create_task(self.emit_press("CONFIRM", "down"))
-        self.enc_sw.when_released = lambda: asyncio.create_task(self.emit_press("CONFIRM", "up"))
-        self.enc_sw.when_held = lambda: asyncio.create_task(self.emit_press("CONFIRM", "long"))
+        self.reset_encoder(int(self.enc_clk.is_pressed), int(self.enc_dt.is_pressed))
+
+        # gpiozero callbacks run on gpiozero threads: they only record the edge.
+        push = self.ingress.push
+        for pin, device in [(self.pin_map.enc_clk, self.enc_clk), (self.pin_map.enc_dt, self.enc_dt)]:
+            device.when_pressed = lambda p=pin: push(p, LEVEL_PRESSED)
+            device.when_released = lambda p=pin: push(p, LEVEL_RELEASED)
+        for pin, name in self.button_by_pin.items():
+            device = self.enc_sw if name == "ENC_SW" else self.buttons[name]
+            device.when_pressed = lambda p=pin: push(p, LEVEL_PRESSED)
+            device.when_released = lambda p=pin: push(p, LEVEL_RELEASED)
+            device.when_held = lambda p=pin: push(p, LEVEL_HELD)
+
+    def reset_encoder(self, clk_level: int, dt_level: int) -> None:
+        self._clk_level = clk_level
+        self._dt_level = dt_level
+        self.decoder.reset(clk_level, dt_level)
+
+    def start_edge_trace(self) -> None:
+        self.recorder = EdgeRecorder(
+            self.edge_trace_path,
+            {
+                "client": "daemon",
+                "source": self.source,
+                "pins": asdict(self.pin_map),
+                "encoder": [self.pin_map.enc_clk, self.pin_map.enc_dt],
+                "initial": [self._clk_level, self._dt_level],
+            },
+        )
+        LOGGER.info("Recording GPIO edges to %s", self.edge_trace_path)
+
+    async def input_loop(self) -> None:
+        """Single consumer that turns queued GPIO edges into controller events."""
+        loop = asyncio.get_running_loop()
+        while not self.stop.is_set():
+            timeout = None if self._encoder_flush_at is None else max(0.0, self._encoder_flush_at - loop.time())
+            await self.ingress.wait(timeout)
+            self.ingress.drain(self.handle_edge)
+            if self._encoder_flush_at is not None and loop.time() >= self._encoder_flush_at:
+                self.flush_encoder()
+
+    def handle_edge(self, pin: int, level: int, ts_ns: int) -> None:
+        if self.recorder is not None:
+            self.recorder.record(pin, level, ts_ns)
+        if pin == self.pin_map.enc_clk or pin == self.pin_map.enc_dt:
+            if pin == self.pin_map.enc_clk:
+                self._clk_level = level
+            else:
+                self._dt_level = level
+            lines = self.decoder.update(self._clk_level, self._dt_level, ts_ns)
+            if lines:
+                self.on_encoder_lines("CW" if lines > 0 else "CCW", abs(lines), ts_ns)
+            return
 
-        for name, button in self.buttons.items():
-            button.when_pressed = lambda n=name: asyncio.create_task(self.on_button_down(n))
-            button.when_released = lambda n=name: asyncio.create_task(self.on_button_up(n))
-            button.when_held = lambda n=name: asyncio.create_task(self.emit_press(n, "long"))
+        name = self.button_by_pin.get(pin)
+        if name is None:
+            return
+        if name == "ENC_SW":
+            action = {LEVEL_PRESSED: "down", LEVEL_RELEASED: "up", LEVEL_HELD: "long"}[level]
+            self.emit_press("CONFIRM", action, ts_ns)
+        elif level == LEVEL_PRESSED:
+            self.on_button_down(name, ts_ns)
+        elif level == LEVEL_RELEASED:
+            self.on_button_up(name, ts_ns)
+        else:
+            self.emit_press(name, "long", ts_ns)
 
-    async def emit_press(self, button: str, action: str) -> None:
-        await self.emit("PRESS", {"button": button, "action": action, "shift": self.shift_held})
+    def emit_press(self, button: str, action: str, edge_ns: int | None = None) -> None:
+        if self._encoder_steps:
+            # Keep input order: pending rotation goes out before the press that followed it.
+            self.flush_encoder()
+        self.emit_nowait("PRESS", {"button": button, "action": action, "shift": self.shift_held}, edge_ns)
 
-    async def on_button_down(self, name: str) -> None:
+    def on_button_down(self, name: str, edge_ns: int | None = None) -> None:
         if name == "SHIFT":
             self.shift_held = True
-        await self.emit_press(name, "down")
+        self.emit_press(name, "down", edge_ns)
 
-    async def on_button_up(self, name: str) -> None:
-        await self.emit_press(name, "up")
-        await self.emit_press(name, "click")
+    def on_button_up(self, name: str, edge_ns: int | None = None) -> None:
+        self.emit_press(name, "up", edge_ns)
+        self.emit_press(name, "click", edge_ns)
         if name == "SHIFT":
             self.shift_held = False
 
-    def on_encoder_edge(self, direction: str) -> None:
-        if direction == self._encoder_dir:
-            self._encoder_steps += 1
-        else:
-            self._encoder_dir = direction
-            self._encoder_steps = 1
-        if self._encoder_flush_task and not self._encoder_flush_task.done():
-            self._encoder_flush_task.cancel()
-        self._encoder_flush_task = asyncio.create_task(self.flush_encoder_after_delay())
-
-    async def flush_encoder_after_delay(self) -> None:
-        try:
-            await asyncio.sleep(self.encoder_batch_ms)
-        except asyncio.CancelledError:
-            return
+    def on_encoder_lines(self, direction: str, steps: int, edge_ns: int | None = None) -> None:
+        if self._encoder_dir is not None and direction != self._encoder_dir:
+            # A reversal inside the batch window must not swallow the earlier steps.
+            self.flush_encoder()
+        if not self._encoder_steps:
+            # A batched ROTATE is timed from the first detent that went into it.
+            self._encoder_edge_ns = edge_ns or time.monotonic_ns()
+        self._encoder_dir = direction
+        self._encoder_steps += steps
+        if self._encoder_flush_at is None:
+            self._encoder_flush_at = asyncio.get_running_loop().time() + self.encoder_batch_ms
+
+    def flush_encoder(self) -> None:
+        started_ns = time.perf_counter_ns()
         if self._encoder_steps > 0 and self._encoder_dir:
-            await self.emit("ROTATE", {"dir": self._encoder_dir, "steps": self._encoder_steps, "shift": self.shift_held})
+            self.emit_nowait(
+                "ROTATE",
+                {"dir": self._encoder_dir, "steps": self._encoder_steps, "shift": self.shift_held},
+                self._encoder_edge_ns,
+            )
         self._encoder_steps = 0
         self._encoder_dir = None
-
-    async def sensor_loop(self) -> None:
-        if adafruit_dht is None or board is None:
-            LOGGER.warning("DHT11 dependencies unavailable; SENSOR events disabled")
+        self._encoder_flush_at = None
+        self.profiler.record_ns("flush_encoder", time.perf_counter_ns() - started_ns)
+
+    def _default_sensor(self) -> SensorSpec:
+        interval_s = float(os.getenv("DHT_INTERVAL_S", "10"))
+        # Reads run off the loop; the interval shrinks to MIN while readings move and grows to MAX while stable.
+        return SensorSpec(
+            id=os.getenv("DHT_SENSOR_ID", "dht11"),
+            driver="dht11",
+            interval_s=interval_s,
+            min_interval_s=max(1.0, float(os.getenv("DHT_INTERVAL_MIN_S", str(min(3.0, interval_s))))),
+            max_interval_s=float(os.getenv("DHT_INTERVAL_MAX_S", str(interval_s * 6))),
+            timeout_s=float(os.getenv("DHT_READ_TIMEOUT_S", "3")),
+            filter={
+                "window": int(os.getenv("DHT_FILTER_WINDOW", "5")),
+                "max_jump_c": float(os.getenv("DHT_OUTLIER_C", "5")),
+                "max_jump_pct": float(os.getenv("DHT_OUTLIER_PCT", "15")),
+            },
+            stable_c=float(os.getenv("DHT_STABLE_DELTA_C", "0.5")),
+            stable_pct=float(os.getenv("DHT_STABLE_DELTA_PCT", "1")),
+            options={"pin": self.pin_map.dht},
+        )
+
+    def _on_sensor_result(self, state: SensorState, payload: dict[str, float] | None) -> None:
+        if payload is None:
             return
+        LOGGER.info("SENSOR %s %s", state.id, payload)
+        self.emit_nowait("SENSOR", {"sensor": state.id, **payload})
 
-        pin = getattr(board, "D4", None)
-        if pin is None:
-            LOGGER.warning("Board D4 pin not available; SENSOR events disabled")
+    async def sensor_loop(self) -> None:
+        await self.sensor_poller.run()
+        if not self.sensor_poller.sensors:
+            LOGGER.warning("No sensors available; SENSOR events disabled")
+
+    async def spool_loop(self) -> None:
+        """Move staged events into the durable outbox, assigning sequence numbers."""
+        while True:
+            event, edge_ns, enqueued_ns = await self.event_q.get()
+            try:
+                seq = self.outbox.append(event, json.dumps(event, separators=(",", ":")))
+            except OSError as exc:
+                LOGGER.error("Outbox append failed; event dropped: %s", exc)
+                continue
+            if len(self._traces) < self._trace_limit:
+                # [event, edge_ns, enqueued_ns, sent_ns, sent_wall_ns]; sequence order is insertion order.
+                self._traces[seq] = [event["event"], edge_ns, enqueued_ns, 0, 0]
+            self._outbox_ready.set()
+
+    def _mark_sent(self, records: list[tuple[int, str]]) -> None:
+        sent_ns, sent_wall_ns = time.monotonic_ns(), time.time_ns()
+        self.events_sent += len(records)
+        for seq, _encoded in records:
+            trace = self._traces.get(seq)
+            if trace is not None:
+                trace[3] = sent_ns
+                trace[4] = sent_wall_ns
+
+    def _settle_traces(self, acked_seq: int, server_ms: float | None) -> None:
+        """Record send -> ack and edge -> ack for every traced event the cumulative ack covers."""
+        traces = self._traces
+        if not traces:
             return
-
-        self._dht = adafruit_dht.DHT11(pin, use_pulseio=False)
+        now_ns, now_wall_ns = time.monotonic_ns(), time.time_ns()
+        record = self.latency.record
+        while traces:
+            seq = next(iter(traces))
+            if seq > acked_seq:
+                break
+            kind, edge_ns, enqueued_ns, sent_ns, sent_wall_ns = traces.pop(seq)
+            record(kind, "total", now_ns - edge_ns)
+            if not sent_ns:
+                # Merged into a later record by coalescing; only its end-to-end time is meaningful.
+                continue
+            record(kind, "queue", sent_ns - enqueued_ns)
+            record(kind, "rtt", now_ns - sent_ns)
+            if seq == acked_seq:
+                self.latency.record_uplink(kind, sent_wall_ns, now_wall_ns, server_ms)
+
+    def report_latency(self) -> None:
+        lines = self.latency.report_lines()
+        if not lines:
+            LOGGER.info("latency: no events recorded yet")
+        for line in lines:
+            LOGGER.info("latency %s", line)
+        for line in self.watchdog.report_lines() if self.watchdog is not None else ():
+            LOGGER.info("%s", line)
+        for line in self.profiler.report_lines():
+            LOGGER.info("busy %s", line)
+        for line in self.event_q.report_lines():
+            LOGGER.info("queue %s", line)
+
+    async def latency_report_loop(self) -> None:
         while not self.stop.is_set():
+            await asyncio.sleep(self.latency_report_s)
+            self.report_latency()
+
+    async def recv_loop(self, ws) -> None:
+        async for message in ws:
             try:
-                temp = self._dht.temperature
-                humidity = self._dht.humidity
-                if temp is not None and humidity is not None:
-                    payload = {"temp_c": float(temp), "humidity": float(humidity)}
-                    LOGGER.info("SENSOR %s", payload)
-                    await self.emit("SENSOR", payload)
-            except RuntimeError:
-                pass
-            except Exception as exc:
-                LOGGER.warning("DHT11 read failed: %s", exc)
-            await asyncio.sleep(self.sensor_interval_s)
+                frame = json.loads(message)
+            except (TypeError, ValueError):
+                continue
+            channel = frame.get("channel") if isinstance(frame, dict) else None
+            payload = frame.get("payload") or {}
+            if channel == "ack":
+                seq = int(payload.get("seq") or 0)
+                self.outbox.ack(seq)
+                self._settle_traces(seq, payload.get("serverTime"))
+                self._acked.set()
+                self.event_q.wake()
+            elif channel == "error":
+                self.server_rejections += 1
+                LOGGER.warning("Server rejected event: %s", payload)
+            else:
+                self.handle_frame(channel, payload)
+
+    def handle_frame(self, channel: str | None, payload: dict) -> None:
+        """Frames other than ack/error (ready, controller-event, ...); the daemon has no use for them."""
+
+    async def _wait_or_disconnect(self, waiter: asyncio.Event, recv_task: asyncio.Task) -> None:
+        wait_task = asyncio.ensure_future(waiter.wait())
+        try:
+            await asyncio.wait({wait_task, recv_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            wait_task.cancel()
+        if recv_task.done():
+            recv_task.result()
+            raise ConnectionError("WebSocket closed by server")
+
+    async def send_loop(self, ws, recv_task: asyncio.Task) -> None:
+        while not self.stop.is_set():
+            if self.outbox.unacked_in_flight() >= self.ws_ack_window:
+                self._acked.clear()
+                await self._wait_or_disconnect(self._acked, recv_task)
+                continue
+
+            budget = self.ws_ack_window - self.outbox.unacked_in_flight()
+            records = self.outbox.read(budget)
+            if not records:
+                self._outbox_ready.clear()
+                records = self.outbox.read(budget)
+            if not records:
+                await self._wait_or_disconnect(self._outbox_ready, recv_task)
+                continue
+
+            if self.ws_coalesce and len(records) > 1:
+                compacted = coalesce_records(records)
+                self.coalesced_events += len(records) - len(compacted)
+                records = compacted
+
+            if self.ws_batch_window_s > 0:
+                await self.send_batch(ws, records, budget)
+                continue
+
+            for record in records:
+                await ws.send(self._frame_event(*record))
+                self._mark_sent([record])
+                if self.ws_send_gap_s > 0:
+                    await asyncio.sleep(self.ws_send_gap_s)
+
+    @staticmethod
+    def _frame_event(seq: int, encoded: str) -> str:
+        # Splice the sequence number in without re-encoding the stored JSON.
+        return f'{{"seq":{seq},{encoded[1:]}'
+
+    async def send_batch(self, ws, records: list[tuple[int, str]], budget: int) -> None:
+        """Send up to ``ws_batch_max`` records as one ``controller-batch`` frame.
+
+        A partial batch waits at most ``ws_batch_window_s`` for more events so a
+        lone button press is never held back longer than the window.
+        """
+        limit = min(budget, self.ws_batch_max)
+        pending = records[:limit]
+        overflow = records[limit:]
+        deadline = asyncio.get_running_loop().time() + self.ws_batch_window_s
+        while len(pending) < limit:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            self._outbox_ready.clear()
+            more = self.outbox.read(limit - len(pending))
+            if not more:
+                try:
+                    await asyncio.wait_for(self._outbox_ready.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                more = self.outbox.read(limit - len(pending))
+            pending.extend(more)
+
+        while pending:
+            frame = ",".join(self._frame_event(seq, encoded) for seq, encoded in pending)
+            await ws.send(f'{{"type":"controller-batch","source":{json.dumps(self.source)},"events":[{frame}]}}')
+            self._mark_sent(pending)
+            if self.ws_send_gap_s > 0:
+                await asyncio.sleep(self.ws_send_gap_s)
+            pending, overflow = overflow[: self.ws_batch_max], overflow[self.ws_batch_max :]
 
     async def ws_loop(self) -> None:
         backoff_s = 1
         while not self.stop.is_set():
             try:
-                ws_target = f"{self.ws_url}?source={self.source}"
-                async with websockets.connect(ws_target, ping_interval=20, ping_timeout=20) as ws:
-                    LOGGER.info("Connected to %s", ws_target)
+                ws_target = f"{self.ws_url}?source={self.source}&stream={self.outbox.stream_id}"
+                headers = {_WS_HEADERS_ARG: {"Authorization": f"Bearer {self.ws_token}"}} if self.ws_token else {}
+                async with websockets.connect(ws_target, ping_interval=20, ping_timeout=20, **headers) as ws:
+                    LOGGER.info("Connected to %s (replaying %s pending events)", ws_target, self.outbox.pending())
                     backoff_s = 1
-                    while not self.stop.is_set():
-                        event = await asyncio.wait_for(self.event_q.get(), timeout=1)
-                        await ws.send(json.dumps(event))
-            except asyncio.TimeoutError:
-                continue
+                    self.ws_connects += 1
+                    self.ws_connected = True
+                    self.outbox.rewind()
+                    recv_task = asyncio.create_task(self.profiler.wrap("recv_loop", self.recv_loop(ws)))
+                    try:
+                        await self.send_loop(ws, recv_task)
+                    finally:
+                        self.ws_connected = False
+                        recv_task.cancel()
+            except asyncio.CancelledError:
+                raise
             except Exception as exc:
-                LOGGER.warning("WS disconnected: %s", exc)
+                LOGGER.warning("WS disconnected: %s (%s events pending)", exc, self.outbox.pending())
                 await asyncio.sleep(backoff_s)
                 backoff_s = min(30, backoff_s * 2)
 
+    def collect_metrics(self) -> MetricsWriter:
+        """Current counters as Prometheus text; runs on the loop thread."""
+        w = MetricsWriter("flss_controller")
+        process_metrics(w)
+        w.gauge("ws_connected", "1 while the /ws/controller socket is open.", self.ws_connected)
+        w.counter("ws_connects_total", "WebSocket connections opened, including reconnects.", self.ws_connects)
+        w.counter("events_sent_total", "Events written to the socket, resends after a reconnect included.", self.events_sent)
+        w.counter("events_coalesced_total", "Outbox records merged into another before sending.", self.coalesced_events)
+        w.counter("server_rejections_total", "Events the server answered with an error.", self.server_rejections)
+        queue = self.event_q.snapshot()
+        w.counter("event_queue_held_total", "Times ROTATE/SENSOR spooling waited for the outbox to drain.", queue["held"])
+        # Each family's samples must be contiguous, so iterate classes per family.
+        for kind, name, help_text, key in (
+            ("gauge", "event_queue_depth", "Events staged ahead of the outbox.", "depth"),
+            ("gauge", "event_queue_capacity", "Per-class staging bound.", "capacity"),
+            ("counter", "events_enqueued_total", "Events emitted by the inputs.", "enqueued"),
+            ("counter", "events_merged_total", "Events folded into a queued one.", "merged"),
+            ("counter", "events_dropped_total", "Events dropped by a full class.", "dropped"),
+        ):
+            write = w.gauge if kind == "gauge" else w.counter
+            for cls_name, cls in queue["classes"].items():
+                write(name, help_text, cls[key], {"class": cls_name})
+        outbox = self.outbox
+        w.gauge("outbox_pending", "Spooled events the server has not acknowledged.", outbox.pending())
+        w.gauge("outbox_in_flight", "Sent events awaiting acknowledgement.", outbox.unacked_in_flight())
+        w.gauge("outbox_last_seq", "Newest outbox sequence number.", outbox.last_seq)
+        w.gauge("outbox_acked_seq", "Highest acknowledged sequence number.", outbox.acked_seq)
+        w.counter("outbox_dropped_total", "Unacknowledged events lost to the outbox size cap.", outbox.dropped)
+        w.gauge("ingress_depth", "GPIO edges waiting for the input loop.", self.ingress.depth())
+        w.counter("ingress_overruns_total", "GPIO edges lost to a full ingress buffer.", self.ingress.overruns)
+        w.counter("ingress_wakeups_total", "Loop wakeups for queued GPIO edges.", self.ingress.wakeups)
+        sensor_stats = self.sensor_poller.stats()
+        for kind, name, help_text, key in (
+            ("counter", "sensor_reads_total", "Sensor read attempts.", "attempts"),
+            ("counter", "sensor_timeouts_total", "Reads abandoned after the sensor's timeout_s.", "timeouts"),
+            ("counter", "sensor_read_errors_total", "Reads that failed or returned nothing.", "readErrors"),
+            ("counter", "sensor_busy_skips_total", "Reads skipped while an earlier one was stuck.", "busySkips"),
+            ("counter", "sensor_rejected_total", "Readings held back as glitches by the median filter.", "rejected"),
+            ("gauge", "sensor_interval_seconds", "Current adaptive sampling period.", "intervalS"),
+        ):
+            write = w.gauge if kind == "gauge" else w.counter
+            for sensor_id, stats in sensor_stats.items():
+                write(name, help_text, stats[key], {"sensor": sensor_id})
+        if self.watchdog is not None:
+            histogram_gauges(w, "loop_lag_seconds", "Event-loop wakeup lag.", self.watchdog.lag.summary())
+            w.counter("loop_stalls_total", "Loop stalls longer than LOOP_STALL_MS.", self.watchdog.stalls)
+        for task, summary in self.profiler.snapshot().items():
+            w.counter("task_busy_seconds_total", "Time each task held the event loop.", summary["busyS"], {"task": task})
+        w.latency("latency_seconds", "Edge -> enqueue -> send -> ack time per event type and stage.", self.latency.snapshot(), "event")
+        return w
+
+    def metrics_health(self) -> tuple[bool, str]:
+        return True, f"ok ws_connected={int(self.ws_connected)} outbox_pending={self.outbox.pending()}"
+
+    def start_metrics(self) -> None:
+        if not self.metrics_addr:
+            return
+        loop = asyncio.get_running_loop()
+        server = MetricsServer(self.metrics_addr, on_loop(loop, self.collect_metrics), on_loop(loop, self.metrics_health))
+        if server.start():
+            self.metrics_server = server
+            LOGGER.info("Metrics on %s/metrics", self.metrics_addr)
+
     async def run(self) -> None:
+        self.outbox.open()
+        self.ingress.bind(asyncio.get_running_loop())
         self.setup_gpio()
-        sensor_task = asyncio.create_task(self.sensor_loop())
-        ws_task = asyncio.create_task(self.ws_loop())
+        if self.edge_trace_path:
+            self.start_edge_trace()
+        profile = self.profiler.wrap
+        watchdog_task = asyncio.create_task(self.watchdog.run()) if self.watchdog is not None else None
+        input_task = asyncio.create_task(profile("input_loop", self.input_loop()))
+        spool_task = asyncio.create_task(profile("spool_loop", self.spool_loop()))
+        sensor_task = asyncio.create_task(profile("sensor_loop", self.sensor_loop()))
+        ws_task = asyncio.create_task(profile("ws_loop", self.ws_loop()))
+        report_task = asyncio.create_task(self.latency_report_loop()) if self.latency_report_s > 0 else None
+        self.start_metrics()
         await self.stop.wait()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if watchdog_task is not None:
+            watchdog_task.cancel()
+        if report_task is not None:
+            report_task.cancel()
+        input_task.cancel()
+        self.ingress.drain(self.handle_edge)
+        self.flush_encoder()
         sensor_task.cancel()
         ws_task.cancel()
+        # Flush whatever is still staged so it survives the restart.
+        for event, _edge_ns, _enqueued_ns in self.event_q.drain():
+            self.outbox.append(event, json.dumps(event, separators=(",", ":")))
+        spool_task.cancel()
+        self.outbox.close()
+        if self.recorder is not None:
+            self.recorder.close()
 
 
 def main() -> None:
@@ -193,6 +662,8 @@ def main() -> None:
 
     signal.signal(signal.SIGINT, shutdown)
     signal.signal(signal.SIGTERM, shutdown)
+    # `kill -USR1 <pid>` logs p50/p99/max per event type and stage, loop lag, busy time per task and queue counters.
+    signal.signal(signal.SIGUSR1, lambda *_args: loop.call_soon_threadsafe(daemon.report_latency))
 
     loop.run_until_complete(daemon.run())
 
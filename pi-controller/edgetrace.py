@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""Record raw GPIO edges to a compact binary trace and replay them into either Pi client.
+
+``EdgeRecorder.record(pin, level, ts_ns)`` appends to preallocated ``array``
+columns under a short lock. Full chunks are written by a background thread,
+so the per-edge cost on the GPIO path is a few appends. A trace file is:
+
+    b"FLSSEDG1" | u32 header length | JSON header | chunks...
+    chunk: u32 count | u16 pins[count] | u8 levels[count] | u64 monotonic_ns[count]
+
+All fields are little-endian. The JSON header carries the recording client,
+its pin map and the encoder levels at start, so a replay starts from the
+same decoder state.
+
+``replay`` feeds a trace to any ``sink(pin, level, ts_ns)`` with the
+recorded spacing divided by ``speed`` (0 = no waiting). The CLI replays it
+through the daemon's ``EdgeIngress`` -> ``handle_edge`` path or the rotary
+client's ``RotaryInput.on_edge``. It prints the resulting events or actions
+as JSON lines, and ``--expect`` turns a saved run into a regression fixture:
+
+    python3 edgetrace.py info session.edges
+    python3 edgetrace.py replay session.edges --client rotary > golden.jsonl
+    python3 edgetrace.py replay session.edges --client rotary --expect golden.jsonl
+
+Switch click windows, hold timers, the rotary client's minimum action gap
+and the daemon's encoder batch window run on wall-clock timers. Record
+fixtures at ``--speed 1``; faster speeds compress those windows, which is
+useful as stress input but changes how clicks and detents group.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+MAGIC = b"FLSSEDG1"
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _le_bytes(column: array) -> bytes:
+    if _LITTLE_ENDIAN:
+        return column.tobytes()
+    swapped = array(column.typecode, column)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+class EdgeRecorder:
+    """Append-only edge trace writer that is safe to call from any thread."""
+
+    def __init__(
+        self,
+        path: str,
+        meta: dict,
+        *,
+        chunk_edges: int = 4096,
+        flush_s: float = 5.0,
+        max_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        self.path = path
+        self.chunk_edges = max(16, chunk_edges)
+        self.flush_ns = int(flush_s * 1_000_000_000)
+        self.max_bytes = max_bytes
+        self.recorded = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pins, self._levels, self._ts = self._columns()
+        self._chunk_started_ns = 0
+        self._bytes = 0
+        self._closed = False
+        self._chunks: queue.SimpleQueue = queue.SimpleQueue()
+
+        self._file = open(path, "wb")
+        header = json.dumps({**meta, "version": 1, "recordedAt": time.time()}, separators=(",", ":")).encode()
+        self._file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self._bytes = self._file.tell()
+        self._writer = threading.Thread(target=self._write_chunks, name="edge-trace", daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def _columns() -> tuple[array, array, array]:
+        return array("H"), array("B"), array("Q")
+
+    def record(self, pin: int, level: int, ts_ns: int) -> None:
+        with self._lock:
+            if self._closed or self._bytes >= self.max_bytes:
+                self.dropped += 1
+                return
+            if not self._ts:
+                self._chunk_started_ns = ts_ns
+            self._pins.append(pin)
+            self._levels.append(level)
+            self._ts.append(ts_ns)
+            self.recorded += 1
+            if len(self._ts) >= self.chunk_edges or ts_ns - self._chunk_started_ns >= self.flush_ns:
+                self._hand_off()
+
+    def _hand_off(self) -> None:
+        # Caller holds the lock. The writer thread owns the full columns from here on.
+        count = len(self._ts)
+        self._chunks.put((self._pins, self._levels, self._ts))
+        self._bytes += 4 + count * 11
+        self._pins, self._levels, self._ts = self._columns()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            if self._ts:
+                self._hand_off()
+            self._closed = True
+        self._chunks.put(None)
+        self._writer.join()
+        self._file.close()
+
+    def _write_chunks(self) -> None:
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                return
+            pins, levels, stamps = chunk
+            self._file.write(struct.pack("<I", len(stamps)) + _le_bytes(pins) + _le_bytes(levels) + _le_bytes(stamps))
+            self._file.flush()
+
+
+@dataclass
+class EdgeTrace:
+    meta: dict
+    pins: array = field(default_factory=lambda: array("H"))
+    levels: array = field(default_factory=lambda: array("B"))
+    ts: array = field(default_factory=lambda: array("Q"))
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def duration_s(self) -> float:
+        return (self.ts[-1] - self.ts[0]) / 1e9 if len(self.ts) > 1 else 0.0
+
+    def edges(self) -> Iterator[tuple[int, int, int]]:
+        return zip(self.pins, self.levels, self.ts)
+
+
+def load_trace(path: str) -> EdgeTrace:
+    with open(path, "rb") as handle:
+        data = handle.read()
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not an edge trace")
+    offset = len(MAGIC)
+    (header_len,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    trace = EdgeTrace(json.loads(data[offset : offset + header_len]))
+    offset += header_len
+    while offset + 4 <= len(data):
+        (count,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        end = offset + count * 11
+        if end > len(data):
+            break  # torn final chunk from a crash; keep what is complete
+        for column, width in ((trace.pins, 2), (trace.levels, 1), (trace.ts, 8)):
+            part = array(column.typecode)
+            part.frombytes(data[offset : offset + count * width])
+            if not _LITTLE_ENDIAN:
+                part.byteswap()
+            column.extend(part)
+            offset += count * width
+    return trace
+
+
+def replay(trace: EdgeTrace, sink: Callable[[int, int, int], None], *, speed: float = 1.0) -> int:
+    """Feed every edge to ``sink(pin, level, ts_ns)``; timestamps are rebased onto ``monotonic_ns``.
+
+    With ``speed`` > 0 edges are delivered on a schedule ``speed`` times faster
+    than recorded and stamped on that schedule. With ``speed`` 0 they are
+    delivered back to back but keep their recorded spacing in ``ts_ns``, so
+    the encoder decoder (including acceleration) sees the original timing.
+    """
+    if not len(trace):
+        return 0
+    first_ns = trace.ts[0]
+    started_ns = time.monotonic_ns()
+    for pin, level, ts_ns in trace.edges():
+        offset_ns = ts_ns - first_ns
+        if speed > 0:
+            offset_ns = int(offset_ns / speed)
+            delay_s = (started_ns + offset_ns - time.monotonic_ns()) / 1e9
+            if delay_s > 0:
+                time.sleep(delay_s)
+        sink(pin, level, started_ns + offset_ns)
+    return len(trace)
+
+
+# -- CLI -----------------------------------------------------------------------------
+
+
+def info(trace: EdgeTrace) -> dict:
+    by_pin: dict[int, int] = {}
+    for pin in trace.pins:
+        by_pin[pin] = by_pin.get(pin, 0) + 1
+    duration_s = trace.duration_s()
+    return {
+        "meta": trace.meta,
+        "edges": len(trace),
+        "durationS": round(duration_s, 3),
+        "edgesPerS": round(len(trace) / duration_s, 1) if duration_s else None,
+        "edgesByPin": by_pin,
+    }
+
+
+def replay_daemon(trace: EdgeTrace, speed: float, emit: Callable[[dict], None]) -> None:
+    import controller_daemon
+
+    daemon = controller_daemon.ControllerDaemon()
+    clk_level, dt_level = trace.meta.get("initial", [0, 0])
+
+    async def main() -> None:
+        loop = asyncio.get_running_loop()
+        daemon.ingress.bind(loop)
+        daemon.reset_encoder(clk_level, dt_level)
+        input_task = asyncio.create_task(daemon.input_loop())
+
+        async def consume() -> None:
+            while True:
+                event, _edge_ns, _enqueued_ns = await daemon.event_q.get()
+                emit({"event": event["event"], "data": event["data"]})
+
+        consume_task = asyncio.create_task(consume())
+        # A worker thread pushes edges, exactly as gpiozero's callback threads do.
+        await loop.run_in_executor(None, lambda: replay(trace, daemon.ingress.push, speed=speed))
+        await asyncio.sleep(daemon.encoder_batch_ms + 0.05)
+        daemon.stop.set()
+        input_task.cancel()
+        daemon.ingress.drain(daemon.handle_edge)
+        daemon.flush_encoder()
+        await asyncio.sleep(0)
+        while not daemon.event_q.empty():
+            await asyncio.sleep(0)
+        consume_task.cancel()
+
+    asyncio.run(main())
+
+
+def replay_rotary(trace: EdgeTrace, speed: float, emit: Callable[[dict], None]) -> None:
+    from gpiozero import RGBLED, Device
+    from gpiozero.pins.mock import MockFactory, MockPWMPin
+
+    from bench import load_rotary
+
+    Device.pin_factory = MockFactory(pin_class=MockPWMPin)
+    rotary = load_rotary()
+    settings = rotary.load_settings()
+    led = RGBLED(settings.rgb_red_pin, settings.rgb_green_pin, settings.rgb_blue_pin)
+    client = rotary.RotaryFlssClient(settings, led)
+    started = time.monotonic()
+
+    def deliver(item) -> None:
+        record = {"action": item.action, "atMs": round((time.monotonic() - started) * 1000.0, 1)}
+        if item.steps != 1:
+            record["steps"] = item.steps
+        emit(record)
+
+    # Capture instead of sending: nothing reaches FLSS during a replay.
+    client.dispatcher = rotary.ActionDispatcher(deliver, max_in_flight=1, max_queue=len(trace) + 16)
+    client.scheduler.start()
+    client.dispatcher.start()
+    controls = rotary.RotaryInput(client, settings)
+    controls.reset_encoder(*trace.meta.get("initial", [0, 0]))
+    replay(trace, controls.on_edge, speed=speed)
+    # Let a pending click window or hold deadline close before stopping.
+    time.sleep(max(settings.sw_multi_click_window_s, settings.sw_hold_time_s) + 0.1)
+    client.dispatcher.stop()
+    client.scheduler.stop()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    show = commands.add_parser("info", help="summarise a trace")
+    show.add_argument("trace")
+    play = commands.add_parser("replay", help="replay a trace through a client's input handling")
+    play.add_argument("trace")
+    play.add_argument("--client", choices=("daemon", "rotary"), required=True)
+    play.add_argument("--speed", type=float, default=1.0, help="1 = recorded pace, 10 = ten times faster, 0 = no waits")
+    play.add_argument("--expect", help="JSON lines from an earlier replay; exit 1 if the output differs")
+    args = parser.parse_args(argv)
+
+    trace = load_trace(args.trace)
+    if args.command == "info":
+        print(json.dumps(info(trace), indent=2))
+        return 0
+
+    produced: list[dict] = []
+
+    def emit(record: dict) -> None:
+        produced.append(record)
+        if not args.expect:
+            print(json.dumps(record, separators=(",", ":")), flush=True)
+
+    if args.client == "daemon":
+        replay_daemon(trace, args.speed, emit)
+    else:
+        replay_rotary(trace, args.speed, emit)
+
+    if not args.expect:
+        return 0
+    with open(args.expect, encoding="utf-8") as handle:
+        expected = [json.loads(line) for line in handle if line.strip()]
+    # Timing varies run to run; fixtures compare what was produced, in order.
+    strip = [{key: value for key, value in record.items() if key != "atMs"} for record in produced]
+    wanted = [{key: value for key, value in record.items() if key != "atMs"} for record in expected]
+    if strip == wanted:
+        print(f"ok: {len(strip)} records match {os.path.basename(args.expect)}")
+        return 0
+    for index, (got, want) in enumerate(zip(strip, wanted)):
+        if got != want:
+            print(f"FAIL at record {index}: expected {want}, got {got}")
+            break
+    else:
+        print(f"FAIL: expected {len(wanted)} records, got {len(strip)}")
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
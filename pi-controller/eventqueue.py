@@ -0,0 +1,229 @@
+"""Priority-class staging queue between the controller's inputs and its outbox.
+
+Events wait here until the spooler gives them a sequence number. Each event
+kind belongs to a class, served in priority order: PRESS, then ROTATE, then
+SENSOR. Each class has its own bound, so a flood of one kind cannot push
+out another.
+
+When the spool gate is closed (the outbox already holds ``spool_ahead``
+unacknowledged events), ROTATE and SENSOR events stay here. A PRESS is
+always spooled straight away, so it waits behind at most ``spool_ahead``
+records instead of the whole backlog. Presses are also fsynced, so they
+survive a crash. A press never overtakes a rotation queued before it: a
+confirm must act on the selection the packer saw. Instead, the rotations
+ahead of a press are spooled with it, gate or no gate, folded into one net
+ROTATE per run of the same shift state (CW and CCW steps cancel). A press
+therefore waits behind one rotation frame, or one per shift toggle, however
+long the held backlog was.
+
+While held, a ROTATE with the same direction and shift as the newest queued
+rotation is folded into it. A newer SENSOR reading replaces the one queued
+for the same sensor.
+When a class is full, its policy drops the oldest or the newest event.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+from collections import deque
+from typing import Callable
+
+LOGGER = logging.getLogger("flss-pi-controller.eventqueue")
+
+CLASSES = ("PRESS", "ROTATE", "SENSOR")
+EVENT_CLASS = {"PRESS": "PRESS", "HOLD": "PRESS", "ROTATE": "ROTATE", "SENSOR": "SENSOR"}
+POLICIES = ("drop-oldest", "drop-newest")
+
+
+class _EventClass:
+    __slots__ = ("name", "capacity", "policy", "entries", "enqueued", "merged", "dropped", "peak")
+
+    def __init__(self, name: str, capacity: int, policy: str) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"unknown {name} queue policy {policy!r}; expected one of {', '.join(POLICIES)}")
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.policy = policy
+        # [arrival, event, edge_ns, enqueued_ns]
+        self.entries: deque[list] = deque()
+        self.enqueued = 0
+        self.merged = 0
+        self.dropped = 0
+        self.peak = 0
+
+
+class PriorityEventQueue:
+    """Bounded per-class queues of ``(event, edge_ns, enqueued_ns)`` with a shared ``get``."""
+
+    def __init__(
+        self,
+        *,
+        capacities: dict[str, int] | None = None,
+        policies: dict[str, str] | None = None,
+        gate: Callable[[], bool] | None = None,
+    ) -> None:
+        capacities = capacities or {}
+        policies = policies or {}
+        self.classes = {
+            name: _EventClass(name, capacities.get(name, 1024), policies.get(name, "drop-oldest")) for name in CLASSES
+        }
+        self._press = self.classes["PRESS"]
+        self._rotate = self.classes["ROTATE"]
+        self._sensor = self.classes["SENSOR"]
+        self.gate = gate
+        # Times the gate closed on queued ROTATE/SENSOR events (transitions, not re-checks).
+        self.held = 0
+        self._gate_closed = False
+        self._arrivals = itertools.count()
+        self._changed = asyncio.Event()
+
+    def qsize(self) -> int:
+        return sum(len(cls.entries) for cls in self.classes.values())
+
+    def empty(self) -> bool:
+        return not (self._press.entries or self._rotate.entries or self._sensor.entries)
+
+    @property
+    def dropped(self) -> int:
+        return sum(cls.dropped for cls in self.classes.values())
+
+    def wake(self) -> None:
+        """Re-check the gate; call when the outbox backlog may have shrunk."""
+        self._changed.set()
+
+    def put_nowait(self, item: tuple[dict, int, int]) -> bool:
+        """Queue an event; returns ``False`` if its class policy dropped it."""
+        event, edge_ns, enqueued_ns = item
+        kind = event.get("event")
+        cls = self.classes[EVENT_CLASS.get(kind, "ROTATE")]
+        cls.enqueued += 1
+        if self._merge(cls, event):
+            return True
+        if len(cls.entries) >= cls.capacity:
+            cls.dropped += 1
+            if cls.policy == "drop-newest":
+                LOGGER.warning("%s queue full (%s); dropped %s %s", cls.name, cls.capacity, kind, event.get("data"))
+                return False
+            oldest = cls.entries.popleft()
+            LOGGER.warning("%s queue full (%s); dropped oldest %s", cls.name, cls.capacity, oldest[1].get("event"))
+        cls.entries.append([next(self._arrivals), event, edge_ns, enqueued_ns])
+        cls.peak = max(cls.peak, len(cls.entries))
+        self._changed.set()
+        return True
+
+    def _merge(self, cls: _EventClass, event: dict) -> bool:
+        if not cls.entries:
+            return False
+        if cls is self._sensor:
+            # Only each sensor's latest reading matters; keep the older timing so its wait is still measured.
+            sensor = (event.get("data") or {}).get("sensor")
+            for entry in cls.entries:
+                if (entry[1].get("data") or {}).get("sensor") == sensor:
+                    entry[1] = event
+                    cls.merged += 1
+                    return True
+            return False
+        newest = cls.entries[-1]
+        queued = newest[1]
+        if cls is not self._rotate or event.get("event") != "ROTATE" or queued.get("event") != "ROTATE":
+            return False
+        if self._press.entries and self._press.entries[-1][0] > newest[0]:
+            return False  # a press came in between; merging would move these steps ahead of it
+        data, queued_data = event.get("data") or {}, queued["data"]
+        if data.get("dir") != queued_data.get("dir") or bool(data.get("shift")) != bool(queued_data.get("shift")):
+            return False
+        queued_data["steps"] = int(queued_data.get("steps", 0)) + int(data.get("steps", 0))
+        queued["ts"] = event.get("ts", queued.get("ts"))
+        cls.merged += 1
+        return True
+
+    def _pop(self, force: bool = False) -> tuple[dict, int, int] | None:
+        press, rotate, sensor = self._press.entries, self._rotate.entries, self._sensor.entries
+        if press:
+            entry = self._net_rotation(press[0][0]) if rotate else None
+            if entry is None:
+                entry = press.popleft()
+            return entry[1], entry[2], entry[3]
+        if not (rotate or sensor):
+            return None
+        if not force and self.gate is not None and not self.gate():
+            if not self._gate_closed:
+                self._gate_closed = True
+                self.held += 1
+            return None
+        self._gate_closed = False
+        entry = (rotate or sensor).popleft()
+        return entry[1], entry[2], entry[3]
+
+    def _net_rotation(self, before: int) -> list | None:
+        """Pop the rotations queued before arrival ``before`` as one net ROTATE per same-shift run."""
+        rotate = self._rotate.entries
+        while rotate and rotate[0][0] < before:
+            first = rotate.popleft()
+            data = first[1]["data"]
+            shift = bool(data.get("shift"))
+            net = _signed_steps(data)
+            while rotate and rotate[0][0] < before and bool(rotate[0][1]["data"].get("shift")) == shift:
+                folded = rotate.popleft()[1]
+                net += _signed_steps(folded["data"])
+                first[1]["ts"] = folded.get("ts", first[1].get("ts"))
+                self._rotate.merged += 1
+            if net:
+                # Keep the first entry's timing, so the wait of the oldest detent is still measured.
+                data["dir"], data["steps"] = ("CW" if net > 0 else "CCW"), abs(net)
+                return first
+            self._rotate.merged += 1  # the run cancelled out
+        return None
+
+    def get_nowait(self) -> tuple[dict, int, int]:
+        item = self._pop()
+        if item is None:
+            raise asyncio.QueueEmpty
+        return item
+
+    async def get(self) -> tuple[dict, int, int]:
+        while True:
+            item = self._pop()
+            if item is not None:
+                return item
+            self._changed.clear()
+            await self._changed.wait()
+
+    def drain(self) -> list[tuple[dict, int, int]]:
+        """Everything still queued, gate ignored, in serving order (used at shutdown)."""
+        items = []
+        while (item := self._pop(force=True)) is not None:
+            items.append(item)
+        return items
+
+    def snapshot(self) -> dict:
+        return {
+            "depth": self.qsize(),
+            "held": self.held,
+            "classes": {
+                name: {
+                    "depth": len(cls.entries),
+                    "capacity": cls.capacity,
+                    "policy": cls.policy,
+                    "enqueued": cls.enqueued,
+                    "merged": cls.merged,
+                    "dropped": cls.dropped,
+                    "peak": cls.peak,
+                }
+                for name, cls in self.classes.items()
+            },
+        }
+
+    def report_lines(self) -> list[str]:
+        return [
+            f"{name} depth={len(cls.entries)}/{cls.capacity} peak={cls.peak} enqueued={cls.enqueued}"
+            f" merged={cls.merged} dropped={cls.dropped} ({cls.policy})"
+            for name, cls in self.classes.items()
+        ]
+
+
+def _signed_steps(data: dict) -> int:
+    steps = int(data.get("steps", 0))
+    return steps if data.get("dir") == "CW" else -steps
@@ -0,0 +1,89 @@
+"""Thread-safe GPIO edge handoff into an asyncio event loop.
+
+gpiozero runs callbacks on its own threads, where asyncio APIs are not
+allowed. ``EdgeIngress.push`` only writes ``(pin, level, monotonic_ns)`` into
+preallocated ``array`` columns under a short lock and, when the buffer goes
+from idle to non-empty, wakes the loop once via ``call_soon_threadsafe``. A
+single consumer task then drains every queued edge in one pass.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from array import array
+from typing import Callable
+
+LEVEL_RELEASED = 0
+LEVEL_PRESSED = 1
+LEVEL_HELD = 2
+
+
+class EdgeIngress:
+    def __init__(self, capacity: int = 1024) -> None:
+        size = 1
+        while size < max(2, capacity):
+            size <<= 1
+        self.capacity = size
+        self._mask = size - 1
+        self._pins = array("H", bytes(2 * size))
+        self._levels = array("B", bytes(size))
+        self._ts = array("Q", bytes(8 * size))
+        self._head = 0
+        self._tail = 0
+        self._lock = threading.Lock()
+        self._wake_pending = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._ready: asyncio.Event | None = None
+        self.overruns = 0
+        self.wakeups = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._ready = asyncio.Event()
+
+    def depth(self) -> int:
+        return self._head - self._tail
+
+    def push(self, pin: int, level: int, ts_ns: int | None = None) -> None:
+        """Record one edge. Safe to call from any thread."""
+        if ts_ns is None:
+            ts_ns = time.monotonic_ns()
+        with self._lock:
+            if self._head - self._tail >= self.capacity:
+                self.overruns += 1
+                return
+            index = self._head & self._mask
+            self._pins[index] = pin
+            self._levels[index] = level
+            self._ts[index] = ts_ns
+            self._head += 1
+            wake = not self._wake_pending
+            self._wake_pending = True
+        if wake and self._loop is not None:
+            self.wakeups += 1
+            self._loop.call_soon_threadsafe(self._ready.set)
+
+    async def wait(self, timeout: float | None = None) -> None:
+        """Wait until edges are queued or ``timeout`` expires (loop thread only)."""
+        if self.depth() == 0:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._ready.clear()
+
+    def drain(self, handler: Callable[[int, int, int], None]) -> int:
+        """Pass every queued edge to ``handler(pin, level, ts_ns)`` in arrival order."""
+        with self._lock:
+            head = self._head
+            tail = self._tail
+            self._wake_pending = False
+        pins, levels, stamps, mask = self._pins, self._levels, self._ts, self._mask
+        for position in range(tail, head):
+            index = position & mask
+            handler(pins[index], levels[index], stamps[index])
+        with self._lock:
+            self._tail = head
+        return head - tail
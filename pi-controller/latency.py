@@ -0,0 +1,180 @@
+"""Fixed-memory latency histograms and server clock-offset estimation.
+
+Both Pi clients stamp every input with the ``monotonic_ns`` of its GPIO edge
+and record how long it spent in each stage (edge -> enqueue -> send ->
+response/ack). ``LatencyHistogram`` is an HDR-style log-linear histogram: each
+power of two is split into ``2**sub_bits`` linear buckets, so the reported
+percentiles are within ``1 / 2**sub_bits`` of the true value while memory
+stays one preallocated ``array`` no matter how many samples arrive.
+
+``ClockOffset`` estimates ``server clock - local clock`` the way NTP does,
+from the send/receive wall times of a request and the server time it
+reports, keeping the sample with the smallest round trip. With it the
+one-way uplink latency (send -> server) can be separated from the return
+leg.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from array import array
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Mapping
+
+STAGES = ("input", "queue", "rtt", "uplink", "total")
+
+
+class LatencyHistogram:
+    """Log-linear histogram of latencies in microseconds, 1us .. ``max_us``."""
+
+    def __init__(self, *, sub_bits: int = 5, max_us: int = 60_000_000) -> None:
+        self.sub_bits = sub_bits
+        self._sub = 1 << sub_bits
+        self.max_us = max(self._sub * 2, max_us)
+        self._counts = array("I", bytes(4 * (self._index(self.max_us) + 1)))
+        self.count = 0
+        self.total_us = 0
+        self.max_seen_us = 0
+
+    def _index(self, value_us: int) -> int:
+        if value_us < self._sub * 2:
+            return value_us
+        shift = value_us.bit_length() - self.sub_bits - 1
+        return shift * self._sub + (value_us >> shift)
+
+    def _upper(self, index: int) -> int:
+        if index < self._sub * 2:
+            return index
+        shift = index // self._sub - 1
+        return ((index - shift * self._sub + 1) << shift) - 1
+
+    def record_ns(self, elapsed_ns: int) -> None:
+        value_us = max(0, int(elapsed_ns) // 1000)
+        if value_us > self.max_seen_us:
+            self.max_seen_us = value_us
+        self._counts[self._index(min(value_us, self.max_us))] += 1
+        self.count += 1
+        self.total_us += value_us
+
+    def percentile_us(self, percent: float) -> int:
+        """Highest value equivalent to the ``percent``-th sample (0 when empty)."""
+        if not self.count:
+            return 0
+        rank = max(1, int(self.count * percent / 100.0 + 0.999999))
+        seen = 0
+        for index, bucket in enumerate(self._counts):
+            seen += bucket
+            if seen >= rank:
+                return min(self._upper(index), self.max_seen_us)
+        return self.max_seen_us
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "p50Ms": self.percentile_us(50) / 1000.0,
+            "p99Ms": self.percentile_us(99) / 1000.0,
+            "maxMs": self.max_seen_us / 1000.0,
+            "meanMs": (self.total_us / self.count / 1000.0) if self.count else 0.0,
+        }
+
+
+class ClockOffset:
+    """Estimate of ``server_wall - local_wall`` from request/response pairs."""
+
+    def __init__(self, window: int = 32) -> None:
+        self._samples: deque[tuple[int, int]] = deque(maxlen=max(1, window))
+        self._lock = threading.Lock()
+        self.offset_ns: int | None = None
+        self.rtt_ns: int | None = None
+
+    def observe(self, sent_wall_ns: int, received_wall_ns: int, server_ms: float | None) -> None:
+        if server_ms is None or received_wall_ns < sent_wall_ns:
+            return
+        rtt_ns = received_wall_ns - sent_wall_ns
+        offset_ns = int(server_ms * 1_000_000) - (sent_wall_ns + rtt_ns // 2)
+        with self._lock:
+            self._samples.append((rtt_ns, offset_ns))
+            # The fastest exchange had the least room for asymmetric delay.
+            self.rtt_ns, self.offset_ns = min(self._samples)
+
+    def one_way_ns(self, sent_wall_ns: int, server_ms: float | None) -> int | None:
+        """Send -> server latency of one exchange, or ``None`` before the first estimate."""
+        offset_ns = self.offset_ns
+        if offset_ns is None or server_ms is None:
+            return None
+        return max(0, int(server_ms * 1_000_000) - offset_ns - sent_wall_ns)
+
+
+def server_time_ms(headers: Mapping[str, str]) -> float | None:
+    """Server wall time from ``X-Server-Time`` (epoch ms), else the 1s-resolution ``Date`` header."""
+    raw = headers.get("X-Server-Time")
+    if raw:
+        try:
+            return float(raw)
+        except ValueError:
+            pass
+    date = headers.get("Date")
+    if date:
+        try:
+            return parsedate_to_datetime(date).timestamp() * 1000.0
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+class LatencyRecorder:
+    """Thread-safe set of histograms keyed by ``(kind, stage)``."""
+
+    def __init__(self, *, sub_bits: int = 5) -> None:
+        self.sub_bits = sub_bits
+        self.clock = ClockOffset()
+        self._histograms: dict[tuple[str, str], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+
+    def record(self, kind: str, stage: str, elapsed_ns: int) -> None:
+        key = (kind, stage)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram(sub_bits=self.sub_bits)
+            histogram.record_ns(elapsed_ns)
+
+    def record_uplink(self, kind: str, sent_wall_ns: int, received_wall_ns: int, server_ms: float | None) -> None:
+        """Feed the clock estimate and, once it exists, record the one-way send -> server leg."""
+        self.clock.observe(sent_wall_ns, received_wall_ns, server_ms)
+        one_way_ns = self.clock.one_way_ns(sent_wall_ns, server_ms)
+        if one_way_ns is not None:
+            self.record(kind, "uplink", one_way_ns)
+
+    def snapshot(self) -> dict[str, dict[str, dict[str, float]]]:
+        with self._lock:
+            items = [(kind, stage, histogram.summary()) for (kind, stage), histogram in self._histograms.items()]
+        result: dict[str, dict[str, dict[str, float]]] = {}
+        for kind, stage, summary in sorted(items):
+            result.setdefault(kind, {})[stage] = summary
+        return result
+
+    def report_lines(self) -> list[str]:
+        lines = []
+        for kind, stages in self.snapshot().items():
+            parts = []
+            for stage in STAGES:
+                summary = stages.get(stage)
+                if summary:
+                    parts.append(
+                        f"{stage} p50={summary['p50Ms']:.1f} p99={summary['p99Ms']:.1f} max={summary['maxMs']:.1f}"
+                    )
+            count = max(int(summary["count"]) for summary in stages.values())
+            lines.append(f"{kind} n={count}: " + " | ".join(parts) + " ms")
+        offset_ns, rtt_ns = self.clock.offset_ns, self.clock.rtt_ns
+        if offset_ns is not None and rtt_ns is not None:
+            lines.append(f"server clock offset {offset_ns / 1e6:+.1f}ms (best rtt {rtt_ns / 1e6:.1f}ms)")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+        self.started_at = time.monotonic()
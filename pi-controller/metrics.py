@@ -0,0 +1,237 @@
+"""Prometheus text exposition for the Pi station clients.
+
+Nothing is instrumented on the hot path. Each scrape calls a ``collect``
+function that reads the counters the clients already keep (queues, outbox,
+retries, sockets, sensors, latency histograms) into a ``MetricsWriter``. An
+idle station therefore pays nothing between scrapes, and a scrape costs one
+pass over those counters plus one read of ``/proc/self/statm``.
+
+``MetricsServer`` answers ``GET /metrics`` and ``GET /healthz`` on a
+localhost TCP port (``127.0.0.1:9464``) or a Unix socket
+(``unix:/run/flss/controller.sock``), on a daemon thread with a short
+socket timeout. ``on_loop`` runs an asyncio client's ``collect`` on its own
+loop, so the scrape thread never reads loop-owned state mid-update.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import http.server
+import logging
+import os
+import socketserver
+import threading
+import time
+from typing import Callable
+
+LOGGER = logging.getLogger("flss-pi-controller.metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PROCESS_STARTED = time.time()
+_PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024 if hasattr(os, "sysconf") else 4
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, object] | None) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float | int | bool) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class MetricsWriter:
+    """Builds one exposition; ``HELP``/``TYPE`` are written the first time each family appears."""
+
+    def __init__(self, prefix: str) -> None:
+        self.prefix = prefix
+        self._lines: list[str] = []
+        self._declared: set[str] = set()
+
+    def _sample(self, kind: str, name: str, help_text: str, value, labels: dict[str, object] | None) -> None:
+        if value is None:
+            return
+        family = f"{self.prefix}_{name}"
+        if family not in self._declared:
+            self._declared.add(family)
+            self._lines.append(f"# HELP {family} {help_text}")
+            self._lines.append(f"# TYPE {family} {kind}")
+        self._lines.append(f"{family}{_format_labels(labels)} {_format_value(value)}")
+
+    def gauge(self, name: str, help_text: str, value, labels: dict[str, object] | None = None) -> None:
+        self._sample("gauge", name, help_text, value, labels)
+
+    def counter(self, name: str, help_text: str, value, labels: dict[str, object] | None = None) -> None:
+        # Callers pass the full family name, _total suffix included.
+        self._sample("counter", name, help_text, value, labels)
+
+    def latency(self, name: str, help_text: str, snapshot: dict[str, dict[str, dict[str, float]]], kind_label: str) -> None:
+        """One summary per ``(kind, stage)`` from a ``LatencyRecorder.snapshot()``."""
+        family = f"{self.prefix}_{name}"
+        if snapshot and family not in self._declared:
+            self._declared.add(family)
+            self._lines.append(f"# HELP {family} {help_text}")
+            self._lines.append(f"# TYPE {family} summary")
+        for kind, stages in snapshot.items():
+            for stage, summary in stages.items():
+                labels = {kind_label: kind, "stage": stage}
+                for quantile, key in (("0.5", "p50Ms"), ("0.99", "p99Ms")):
+                    self._lines.append(
+                        f"{family}{_format_labels({**labels, 'quantile': quantile})} {summary[key] / 1000.0!r}"
+                    )
+                count = int(summary["count"])
+                self._lines.append(f"{family}_sum{_format_labels(labels)} {summary['meanMs'] * count / 1000.0!r}")
+                self._lines.append(f"{family}_count{_format_labels(labels)} {count}")
+        # A family's samples must stay together, so the maxima follow as their own family.
+        for kind, stages in snapshot.items():
+            for stage, summary in stages.items():
+                self.gauge(
+                    f"{name}_max",
+                    "Slowest sample seen, in seconds.",
+                    summary["maxMs"] / 1000.0,
+                    {kind_label: kind, "stage": stage},
+                )
+
+    def extend(self, other: MetricsWriter) -> None:
+        """Append another writer's samples; the two must use different prefixes."""
+        self._lines.extend(other._lines)
+        self._declared |= other._declared
+
+    def render(self) -> bytes:
+        return ("\n".join(self._lines) + "\n").encode("utf-8")
+
+
+def process_metrics(writer: MetricsWriter) -> None:
+    """Resident memory, CPU time, thread count and start time of this process."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as handle:
+            resident_pages = int(handle.read().split()[1])
+        writer.gauge("process_resident_memory_bytes", "Resident set size.", resident_pages * _PAGE_KB * 1024)
+    except (OSError, IndexError, ValueError):
+        pass
+    writer.counter("process_cpu_seconds_total", "User and system CPU time.", time.process_time())
+    writer.gauge("process_threads", "Live Python threads.", threading.active_count())
+    writer.gauge("process_start_time_seconds", "Process start, Unix time.", PROCESS_STARTED)
+
+
+def histogram_gauges(writer: MetricsWriter, name: str, help_text: str, summary: dict[str, float]) -> None:
+    """p50/p99/max of one ``LatencyHistogram.summary()`` as a labelled gauge, in seconds."""
+    for quantile, key in (("0.5", "p50Ms"), ("0.99", "p99Ms"), ("1", "maxMs")):
+        writer.gauge(name, help_text, summary[key] / 1000.0, {"quantile": quantile})
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    server_version = "flss-metrics"
+    protocol_version = "HTTP/1.0"
+    # A stuck scraper must not pin a thread.
+    timeout = 5.0
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server naming
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            try:
+                writer = self.server.collect()
+                body, status = writer.render(), 200
+            except Exception as exc:
+                LOGGER.warning("Metrics collection failed: %s", exc)
+                body, status = f"collection failed: {exc}\n".encode("utf-8"), 500
+            content_type = CONTENT_TYPE
+        elif path == "/healthz":
+            healthy, detail = self.server.health()
+            body, status = (detail + "\n").encode("utf-8"), 200 if healthy else 503
+            content_type = "text/plain; charset=utf-8"
+        else:
+            body, status, content_type = b"not found\n", 404, "text/plain; charset=utf-8"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002 - http.server signature
+        pass
+
+
+class _TCPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        conn, _address = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) pair.
+        return conn, ("unix", 0)
+
+
+class MetricsServer:
+    """``/metrics`` and ``/healthz`` for one process, served off the caller's threads."""
+
+    def __init__(
+        self,
+        address: str,
+        collect: Callable[[], MetricsWriter],
+        health: Callable[[], tuple[bool, str]] | None = None,
+    ) -> None:
+        self.address = address
+        self.collect = collect
+        self.health = health or (lambda: (True, "ok"))
+        self._server: socketserver.BaseServer | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> bool:
+        try:
+            if self.address.startswith("unix:"):
+                path = self.address[len("unix:") :]
+                if os.path.exists(path):
+                    os.unlink(path)
+                server: socketserver.BaseServer = _UnixServer(path, _Handler)
+            else:
+                host, _, port = self.address.rpartition(":")
+                server = _TCPServer((host or "127.0.0.1", int(port)), _Handler)
+        except (OSError, ValueError) as exc:
+            LOGGER.warning("Metrics endpoint %s unavailable: %s", self.address, exc)
+            return False
+        server.collect = self.collect
+        server.health = self.health
+        self._server = server
+        self._thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        server = self._server
+        if server is None:
+            return
+        server.shutdown()
+        server.server_close()
+        if self.address.startswith("unix:"):
+            try:
+                os.unlink(self.address[len("unix:") :])
+            except OSError:
+                pass
+        self._server = None
+
+
+def on_loop(loop, collect: Callable[[], MetricsWriter], timeout_s: float = 2.0) -> Callable[[], MetricsWriter]:
+    """Wrap ``collect`` so it runs on ``loop``'s thread, where asyncio-owned state is consistent."""
+
+    async def run() -> MetricsWriter:
+        return collect()
+
+    def collect_on_loop() -> MetricsWriter:
+        return asyncio.run_coroutine_threadsafe(run(), loop).result(timeout_s)
+
+    return collect_on_loop
+
@@ -0,0 +1,292 @@
+"""Durable, size-capped event outbox for the FLSS station controller.
+
+Events are appended to segment files as ``<seq>\\t<json>\\n`` lines. Sequence
+numbers increase monotonically across restarts; the highest sequence the
+server has acknowledged is kept in a small ``acked`` file, and a reconnect
+replays everything after it. Fully acknowledged segments are deleted, and
+when the log exceeds ``max_bytes`` the oldest segment is dropped even if it
+still holds unacknowledged events, so disk and memory stay bounded during
+long outages.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+LOGGER = logging.getLogger("flss-pi-controller.outbox")
+
+SEGMENT_SUFFIX = ".seg"
+ACK_FILE = "acked"
+STREAM_FILE = "stream-id"
+
+
+@dataclass
+class _Segment:
+    first_seq: int
+    path: str
+    size: int
+
+
+class Outbox:
+    def __init__(
+        self,
+        directory: str,
+        *,
+        segment_bytes: int = 256 * 1024,
+        max_bytes: int = 4 * 1024 * 1024,
+        sync_events: frozenset[str] = frozenset({"PRESS"}),
+        ack_flush_s: float = 1.0,
+    ) -> None:
+        self.directory = directory
+        self.segment_bytes = max(4096, segment_bytes)
+        self.max_bytes = max(self.segment_bytes * 2, max_bytes)
+        self.sync_events = sync_events
+        self.ack_flush_s = ack_flush_s
+
+        self.stream_id = ""
+        self.last_seq = 0
+        self.acked_seq = 0
+        self.dropped = 0
+
+        self._segments: list[_Segment] = []
+        self._write_fd: int | None = None
+        # One read handle, kept open while replay walks a segment instead of reopening it per read().
+        self._read_handle = None
+        self._read_path = ""
+        self._persisted_ack = 0
+        self._ack_persisted_at = 0.0
+
+        self._read_cursor = 0
+        self._read_index = 0
+        self._read_offset = 0
+
+    # -- lifecycle -----------------------------------------------------------------
+
+    def open(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self.stream_id = self._load_stream_id()
+        self.acked_seq = self._load_acked()
+        self._persisted_ack = self.acked_seq
+
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                first_seq = int(name[: -len(SEGMENT_SUFFIX)])
+            except ValueError:
+                continue
+            self._segments.append(_Segment(first_seq, path, os.path.getsize(path)))
+
+        self.last_seq = self.acked_seq
+        if self._segments:
+            self.last_seq = max(self.last_seq, self._recover_tail(self._segments[-1]))
+            self._open_writer(self._segments[-1])
+        self._compact()
+        # A spool left by a crash or a larger configured cap is trimmed before it is replayed.
+        self._enforce_cap()
+        self.rewind()
+        LOGGER.info(
+            "Outbox %s opened: stream=%s last_seq=%s acked=%s pending=%s",
+            self.directory,
+            self.stream_id,
+            self.last_seq,
+            self.acked_seq,
+            self.pending(),
+        )
+
+    def close(self) -> None:
+        self._persist_ack(force=True)
+        self._close_reader()
+        if self._write_fd is not None:
+            os.close(self._write_fd)
+            self._write_fd = None
+
+    # -- writing -------------------------------------------------------------------
+
+    def append(self, event: dict, encoded: str) -> int:
+        """Append an already JSON-encoded event and return its sequence number."""
+        seq = self.last_seq + 1
+        line = f"{seq}\t{encoded}\n".encode("utf-8")
+
+        segment = self._segments[-1] if self._segments else None
+        if segment is None or segment.size + len(line) > self.segment_bytes:
+            segment = _Segment(seq, os.path.join(self.directory, f"{seq:020d}{SEGMENT_SUFFIX}"), 0)
+            self._segments.append(segment)
+            self._open_writer(segment)
+
+        os.write(self._write_fd, line)
+        if event.get("event") in self.sync_events:
+            os.fsync(self._write_fd)
+        segment.size += len(line)
+        self.last_seq = seq
+        self._enforce_cap()
+        return seq
+
+    # -- acknowledgement -----------------------------------------------------------
+
+    def ack(self, seq: int) -> None:
+        """Record a cumulative acknowledgement: every event up to ``seq`` is delivered."""
+        seq = min(int(seq), self.last_seq)
+        if seq <= self.acked_seq:
+            return
+        self.acked_seq = seq
+        self._compact()
+        self._persist_ack()
+
+    def pending(self) -> int:
+        return self.last_seq - self.acked_seq
+
+    def unacked_in_flight(self) -> int:
+        return self._read_cursor - self.acked_seq
+
+    # -- reading -------------------------------------------------------------------
+
+    def rewind(self) -> None:
+        """Restart reading right after the last acknowledged event (used on reconnect)."""
+        self._read_cursor = self.acked_seq
+        self._read_index = 0
+        self._read_offset = 0
+        target = self.acked_seq + 1
+        for index, segment in enumerate(self._segments):
+            if segment.first_seq <= target:
+                self._read_index = index
+
+    def read(self, limit: int) -> list[tuple[int, str]]:
+        """Return up to ``limit`` unread ``(seq, json)`` records in sequence order."""
+        records: list[tuple[int, str]] = []
+        while len(records) < limit and self._read_index < len(self._segments):
+            segment = self._segments[self._read_index]
+            handle = self._reader(segment)
+            if handle is not None:
+                # Seeking inside the buffer is free; it also discards a torn line read past last time.
+                handle.seek(self._read_offset)
+                while len(records) < limit:
+                    raw = handle.readline()
+                    if not raw.endswith(b"\n"):
+                        break
+                    self._read_offset += len(raw)
+                    seq_raw, _, payload = raw.rstrip(b"\n").partition(b"\t")
+                    seq = int(seq_raw)
+                    if seq <= self._read_cursor:
+                        continue
+                    self._read_cursor = seq
+                    records.append((seq, payload.decode("utf-8")))
+            if len(records) >= limit or self._read_index == len(self._segments) - 1:
+                break
+            self._read_index += 1
+            self._read_offset = 0
+        return records
+
+    # -- internals -----------------------------------------------------------------
+
+    def _open_writer(self, segment: _Segment) -> None:
+        if self._write_fd is not None:
+            os.close(self._write_fd)
+        self._write_fd = os.open(segment.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def _reader(self, segment: _Segment):
+        if self._read_path != segment.path:
+            self._close_reader()
+            try:
+                self._read_handle = open(segment.path, "rb")
+            except FileNotFoundError:
+                return None
+            self._read_path = segment.path
+        return self._read_handle
+
+    def _close_reader(self) -> None:
+        if self._read_handle is not None:
+            self._read_handle.close()
+        self._read_handle = None
+        self._read_path = ""
+
+    def _recover_tail(self, segment: _Segment) -> int:
+        """Return the last complete sequence in ``segment``, truncating a torn final line."""
+        last_seq = segment.first_seq - 1
+        good_bytes = 0
+        with open(segment.path, "rb") as handle:
+            for raw in handle:
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    last_seq = int(raw.partition(b"\t")[0])
+                except ValueError:
+                    break
+                good_bytes += len(raw)
+        if good_bytes != segment.size:
+            LOGGER.warning("Outbox segment %s had a torn tail; truncating to %s bytes", segment.path, good_bytes)
+            with open(segment.path, "r+b") as handle:
+                handle.truncate(good_bytes)
+            segment.size = good_bytes
+        return last_seq
+
+    def _enforce_cap(self) -> None:
+        total = sum(segment.size for segment in self._segments)
+        while total > self.max_bytes and len(self._segments) > 1:
+            oldest = self._segments[0]
+            last_in_oldest = self._segments[1].first_seq - 1
+            lost = last_in_oldest - max(oldest.first_seq - 1, self.acked_seq)
+            if lost > 0:
+                self.dropped += lost
+                LOGGER.warning("Outbox full; dropped %s unacknowledged events up to seq %s", lost, last_in_oldest)
+                self.acked_seq = last_in_oldest
+                self._persist_ack(force=True)
+            total -= oldest.size
+            self._remove_oldest_segment()
+        if self._read_cursor < self.acked_seq:
+            self.rewind()
+
+    def _compact(self) -> None:
+        while len(self._segments) > 1 and self._segments[1].first_seq - 1 <= self.acked_seq:
+            self._remove_oldest_segment()
+
+    def _remove_oldest_segment(self) -> None:
+        oldest = self._segments.pop(0)
+        if self._read_path == oldest.path:
+            self._close_reader()
+        try:
+            os.remove(oldest.path)
+        except FileNotFoundError:
+            pass
+        if self._read_index > 0:
+            self._read_index -= 1
+        else:
+            self._read_offset = 0
+
+    def _persist_ack(self, *, force: bool = False) -> None:
+        if self.acked_seq == self._persisted_ack:
+            return
+        now = time.monotonic()
+        if not force and now - self._ack_persisted_at < self.ack_flush_s:
+            return
+        path = os.path.join(self.directory, ACK_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            handle.write(str(self.acked_seq))
+        os.replace(tmp_path, path)
+        self._persisted_ack = self.acked_seq
+        self._ack_persisted_at = now
+
+    def _load_acked(self) -> int:
+        try:
+            with open(os.path.join(self.directory, ACK_FILE), encoding="utf-8") as handle:
+                return max(0, int(handle.read().strip() or 0))
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _load_stream_id(self) -> str:
+        path = os.path.join(self.directory, STREAM_FILE)
+        try:
+            with open(path, encoding="utf-8") as handle:
+                stream_id = handle.read().strip()
+            if stream_id:
+                return stream_id
+        except FileNotFoundError:
+            pass
+        stream_id = os.urandom(8).hex()
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(stream_id)
+        return stream_id
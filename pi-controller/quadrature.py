@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Table-driven quadrature decoder shared by the FLSS Pi clients.
+
+The decoder looks at both encoder pins on every edge. ``state = (a << 1) | b``
+and the 16-entry table indexed by ``(previous << 2) | current`` yields +1/-1
+for a valid Gray-code quarter step and 0 for "no change" or an invalid jump
+(both pins flipped at once, i.e. a missed edge). Contact bounce on one pin
+produces +1/-1 pairs that cancel, so no time-based debounce is needed.
+
+Levels are logical: 1 means the pin is active (pulled to GND on KY-040/EC11
+modules, i.e. gpiozero ``is_pressed``). Clockwise is CLK/A trailing DT/B:
+00 -> 01 -> 11 -> 10 -> 00.
+
+The edge traces live in ``tests/test_quadrature.py``; run
+``python3 quadrature.py bench`` for a CPython edges-per-second figure.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+# Index: (previous_state << 2) | current_state.
+_CW_SEQUENCE = (0b00, 0b01, 0b11, 0b10)
+TRANSITIONS = [0] * 16
+for _index, _state in enumerate(_CW_SEQUENCE):
+    _next = _CW_SEQUENCE[(_index + 1) % 4]
+    TRANSITIONS[(_state << 2) | _next] = 1
+    TRANSITIONS[(_next << 2) | _state] = -1
+INVALID = frozenset((prev << 2) | (prev ^ 0b11) for prev in range(4))
+
+
+class QuadratureDecoder:
+    def __init__(
+        self,
+        *,
+        steps_per_detent: int = 4,
+        accel_max: int = 1,
+        accel_slow_ms: float = 60.0,
+        accel_fast_ms: float = 15.0,
+        reverse: bool = False,
+    ) -> None:
+        self.steps_per_detent = max(1, steps_per_detent)
+        self.accel_max = max(1, accel_max)
+        self.accel_slow_ns = int(max(accel_slow_ms, accel_fast_ms + 1.0) * 1_000_000)
+        self.accel_fast_ns = int(max(0.0, accel_fast_ms) * 1_000_000)
+        self.direction = -1 if reverse else 1
+
+        self.state = 0
+        self.accumulator = 0
+        self.last_detent_ns: int | None = None
+        self.edges = 0
+        self.invalid = 0
+        self.detents = 0
+
+    def reset(self, a: int, b: int) -> None:
+        self.state = (a << 1) | b
+        self.accumulator = 0
+
+    def update(self, a: int, b: int, ts_ns: int) -> int:
+        """Feed the current pin levels; return signed lines to move (0 when mid-detent)."""
+        current = (a << 1) | b
+        index = (self.state << 2) | current
+        self.state = current
+        self.edges += 1
+        if index in INVALID:
+            self.invalid += 1
+            return 0
+        self.accumulator += TRANSITIONS[index]
+        if -self.steps_per_detent < self.accumulator < self.steps_per_detent:
+            return 0
+
+        sign = 1 if self.accumulator > 0 else -1
+        self.accumulator = 0
+        self.detents += 1
+        return sign * self.direction * self._acceleration(ts_ns)
+
+    def _acceleration(self, ts_ns: int) -> int:
+        previous_ns, self.last_detent_ns = self.last_detent_ns, ts_ns
+        if previous_ns is None or self.accel_max == 1:
+            return 1
+        interval_ns = ts_ns - previous_ns
+        if interval_ns >= self.accel_slow_ns:
+            return 1
+        if interval_ns <= self.accel_fast_ns:
+            return self.accel_max
+        # Linear ramp between the slow and fast detent intervals.
+        span = self.accel_slow_ns - self.accel_fast_ns
+        return 1 + round((self.accel_max - 1) * (self.accel_slow_ns - interval_ns) / span)
+
+
+CW_DETENT = [0b01, 0b11, 0b10, 0b00]
+
+
+def bench(edge_count: int = 1_000_000) -> int:
+    states = CW_DETENT * (edge_count // len(CW_DETENT))
+    decoder = QuadratureDecoder(accel_max=4)
+    update = decoder.update
+    started = time.perf_counter()
+    ts_ns = 0
+    for state in states:
+        ts_ns += 250_000
+        update(state >> 1, state & 1, ts_ns)
+    elapsed = time.perf_counter() - started
+    print(f"{len(states)} edges in {elapsed:.3f}s: {len(states) / elapsed:,.0f} edges/s on {sys.implementation.name} {sys.version.split()[0]}")
+    return 0
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "bench"]
+    raise SystemExit(bench(int(args[0]) if args else 1_000_000))
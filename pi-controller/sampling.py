@@ -0,0 +1,182 @@
+"""Off-loop DHT sampling with glitch filtering and an adaptive interval.
+
+A DHT11 read bit-bangs the sensor's pulse train. With ``use_pulseio=False``
+it can hold the calling thread for a long time, so ``SensorSampler`` runs
+every read on a daemon thread and waits for it with a hard timeout. The
+asyncio loop, and every GPIO edge queued behind it, never waits on the
+sensor. A read that overruns is abandoned rather than cancelled (a thread
+cannot be interrupted), and further reads are skipped until it returns
+because the driver is not reentrant. A stuck read does not hold up process
+exit either.
+
+Accepted readings go through a ``MedianFilter`` per channel: a single
+reading far from the recent median is treated as a glitch, but the same
+jump seen ``confirm`` times in a row (the outliers agreeing with each other)
+is a real change and is taken. A glitch on either channel holds back the
+whole read, so temperature and humidity windows never drift apart.
+``AdaptiveInterval`` stretches the sampling period while the filtered
+values hold still and snaps back to the minimum when they move.
+
+Samplers polled together can share ``slots``, a semaphore bounding how many
+read threads run at once; a stuck read keeps its slot until it returns.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import statistics
+import threading
+from collections import deque
+from typing import Callable
+
+LOGGER = logging.getLogger("flss-pi-controller.sampling")
+
+
+class MedianFilter:
+    """Median of the last ``window`` accepted values, rejecting isolated jumps over ``max_jump``."""
+
+    def __init__(self, *, window: int = 5, max_jump: float = 5.0, confirm: int = 3) -> None:
+        self.max_jump = max_jump
+        self.confirm = max(1, confirm)
+        self.rejected = 0
+        self._samples: deque[float] = deque(maxlen=max(1, window))
+        self._suspects: list[float] = []
+
+    def value(self) -> float | None:
+        return statistics.median(self._samples) if self._samples else None
+
+    def _suspect_run(self, value: float) -> int:
+        """0 if ``value`` is near the median, else how many agreeing outliers in a row it makes."""
+        median = self.value()
+        if median is None or abs(value - median) <= self.max_jump:
+            return 0
+        if all(abs(value - suspect) <= self.max_jump for suspect in self._suspects):
+            return len(self._suspects) + 1
+        return 1  # outliers jumping different ways are not one step; start a new run
+
+    def is_glitch(self, value: float) -> bool:
+        """Whether ``update(value)`` would hold ``value`` back."""
+        return 0 < self._suspect_run(value) < self.confirm
+
+    def update(self, value: float) -> float | None:
+        """Add a raw value; returns the new median, or ``None`` if the value was held back as a glitch."""
+        run = self._suspect_run(value)
+        if run:
+            if run == 1:
+                self._suspects.clear()
+            self._suspects.append(value)
+            if run < self.confirm:
+                self.rejected += 1
+                return None
+            # The same jump several reads running is a real step: restart from it.
+            self._samples.clear()
+            self._samples.extend(self._suspects)
+        else:
+            self._samples.append(value)
+        self._suspects.clear()
+        return self.value()
+
+
+class AdaptiveInterval:
+    """Sampling period that grows by ``growth`` while readings are stable, up to ``max_s``."""
+
+    def __init__(self, min_s: float, max_s: float, *, start_s: float | None = None, growth: float = 1.5) -> None:
+        self.min_s = min_s
+        self.max_s = max(min_s, max_s)
+        self.growth = max(1.0, growth)
+        self.current_s = min(self.max_s, max(min_s, start_s if start_s is not None else min_s))
+
+    def next(self, changed: bool) -> float:
+        self.current_s = self.min_s if changed else min(self.max_s, self.current_s * self.growth)
+        return self.current_s
+
+
+class SensorSampler:
+    """Runs blocking ``read() -> (temp_c, humidity)`` calls off the loop and filters the results."""
+
+    def __init__(
+        self,
+        read: Callable[[], tuple[float | None, float | None]],
+        *,
+        name: str = "DHT",
+        slots: asyncio.Semaphore | None = None,
+        timeout_s: float = 3.0,
+        window: int = 5,
+        max_jump_c: float = 5.0,
+        max_jump_pct: float = 15.0,
+        confirm: int = 3,
+    ) -> None:
+        self.read = read
+        self.name = name
+        self.slots = slots
+        self.timeout_s = timeout_s
+        self.temperature = MedianFilter(window=window, max_jump=max_jump_c, confirm=confirm)
+        self.humidity = MedianFilter(window=window, max_jump=max_jump_pct, confirm=confirm)
+        self.timeouts = 0
+        self.read_errors = 0
+        self.busy_skips = 0
+        self._pending: asyncio.Future | None = None
+
+    def _start_read(self, loop: asyncio.AbstractEventLoop) -> asyncio.Future:
+        future = loop.create_future()
+
+        def settle(result, exc) -> None:
+            if future.done():
+                return
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+        def run() -> None:
+            result, error = None, None
+            try:
+                result = self.read()
+            except Exception as exc:
+                error = exc
+            try:
+                loop.call_soon_threadsafe(settle, result, error)
+            except RuntimeError:
+                pass  # loop already closed during shutdown
+
+        threading.Thread(target=run, name=f"{self.name}-read", daemon=True).start()
+        return future
+
+    async def sample(self) -> dict[str, float] | None:
+        """One filtered ``{"temp_c", "humidity"}`` reading, or ``None`` if nothing usable came back."""
+        if self._pending is not None and not self._pending.done():
+            self.busy_skips += 1
+            return None
+        if self.slots is not None:
+            await self.slots.acquire()
+        self._pending = self._start_read(asyncio.get_running_loop())
+        if self.slots is not None:
+            # Released when the thread finishes, not on timeout, so stuck reads stay counted.
+            self._pending.add_done_callback(lambda _future: self.slots.release())
+        try:
+            # shield: a timeout abandons the read but keeps tracking it as pending.
+            temp, humidity = await asyncio.wait_for(asyncio.shield(self._pending), self.timeout_s)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            LOGGER.warning("%s read exceeded %.1fs; skipping reads until it returns", self.name, self.timeout_s)
+            return None
+        except RuntimeError:
+            # DHT11 checksum and timing errors are routine; the next read usually succeeds.
+            self.read_errors += 1
+            return None
+        except Exception as exc:
+            self.read_errors += 1
+            LOGGER.warning("%s read failed: %s", self.name, exc)
+            return None
+        if temp is None or humidity is None:
+            self.read_errors += 1
+            return None
+        channels = ((self.temperature, float(temp)), (self.humidity, float(humidity)))
+        if any(channel.is_glitch(value) for channel, value in channels):
+            # Only the glitching channel records its outlier; the other skips this read entirely.
+            for channel, value in channels:
+                if channel.is_glitch(value):
+                    channel.update(value)
+            return None
+        return {"temp_c": self.temperature.update(channels[0][1]), "humidity": self.humidity.update(channels[1][1])}
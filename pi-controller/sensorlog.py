@@ -0,0 +1,323 @@
+"""Fixed-size, array-backed history of environment readings.
+
+Raw samples go into a ring of ``array`` columns: float64 wall-clock
+timestamps plus float32 temperature and humidity, with NaN for a missing
+value. Each sample is also folded into the current minute's min/max/mean.
+When the minute rolls over, it is closed into a second ring of per-minute
+rollups. A rollup is 30 bytes, so a week of minutes fits in about 300 KB.
+
+Rollups the server has not acknowledged are the backfill backlog.
+``unsent`` returns them oldest first, and ``mark_sent`` moves past them once
+an upload succeeds. Only that backlog is written to disk. ``save`` replaces
+one small binary file whenever the backlog changes, so an outage survives a
+restart, and a station that is online writes a few hundred bytes a minute.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+
+LOGGER = logging.getLogger("flss-pi-controller.sensorlog")
+
+_MAGIC = b"FLSH"
+_VERSION = 1
+# magic, version, row count
+_HEADER = struct.Struct("<4sHI")
+_NAN = float("nan")
+# Per-minute columns, in file order; "i" is the minute since the epoch, "H" the sample count.
+_ROLLUP_COLUMNS = (
+    ("minute", "i"),
+    ("samples", "H"),
+    ("temp_min", "f"),
+    ("temp_max", "f"),
+    ("temp_mean", "f"),
+    ("hum_min", "f"),
+    ("hum_max", "f"),
+    ("hum_mean", "f"),
+)
+
+
+def _column(typecode: str, size: int, fill: float | int) -> array:
+    return array(typecode, [fill]) * size
+
+
+def _value(raw: float) -> float | None:
+    return None if math.isnan(raw) else raw
+
+
+class SampleRing:
+    """The last ``capacity`` raw samples as ``(ts, temperature, humidity)`` columns."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self.ts = _column("d", self.capacity, 0.0)
+        self.temperature = _column("f", self.capacity, _NAN)
+        self.humidity = _column("f", self.capacity, _NAN)
+        self._next = 0
+        self.count = 0
+
+    def append(self, ts: float, temperature: float | None, humidity: float | None) -> None:
+        index = self._next
+        self.ts[index] = ts
+        self.temperature[index] = _NAN if temperature is None else temperature
+        self.humidity[index] = _NAN if humidity is None else humidity
+        self._next = (index + 1) % self.capacity
+        self.count = min(self.capacity, self.count + 1)
+
+    def latest(self, limit: int | None = None) -> list[tuple[float, float | None, float | None]]:
+        """Newest samples, oldest first."""
+        count = self.count if limit is None else min(self.count, max(0, limit))
+        start = (self._next - count) % self.capacity
+        rows = []
+        for offset in range(count):
+            index = (start + offset) % self.capacity
+            rows.append((self.ts[index], _value(self.temperature[index]), _value(self.humidity[index])))
+        return rows
+
+
+class _MinuteAccumulator:
+    __slots__ = ("minute", "samples", "temp", "hum")
+
+    def __init__(self, minute: int) -> None:
+        self.minute = minute
+        self.samples = 0
+        # [count, min, max, sum] per field
+        self.temp = [0, math.inf, -math.inf, 0.0]
+        self.hum = [0, math.inf, -math.inf, 0.0]
+
+    @staticmethod
+    def _fold(stats: list, value: float | None) -> None:
+        if value is None:
+            return
+        stats[0] += 1
+        stats[1] = min(stats[1], value)
+        stats[2] = max(stats[2], value)
+        stats[3] += value
+
+    def add(self, temperature: float | None, humidity: float | None) -> None:
+        self.samples += 1
+        self._fold(self.temp, temperature)
+        self._fold(self.hum, humidity)
+
+    @staticmethod
+    def summary(stats: list) -> tuple[float, float, float]:
+        count, low, high, total = stats
+        return (low, high, total / count) if count else (_NAN, _NAN, _NAN)
+
+
+class SensorHistory:
+    """Raw sample ring plus per-minute rollups with a persisted upload backlog.
+
+    Thread-safe: one sensor thread calls ``record`` while an uplink job calls
+    ``unsent``/``mark_sent``.
+    """
+
+    def __init__(self, path: str = "", *, samples: int = 720, minutes: int = 10080) -> None:
+        self.path = path
+        self.raw = SampleRing(samples)
+        self.capacity = max(1, minutes)
+        self._columns = {
+            name: _column(code, self.capacity, _NAN if code == "f" else 0) for name, code in _ROLLUP_COLUMNS
+        }
+        self._next = 0
+        self._rows = 0
+        # Rows closed since the ring was created; row ``closed - 1`` is the newest.
+        self._closed = 0
+        self._sent = 0
+        self._current: _MinuteAccumulator | None = None
+        self._lock = threading.Lock()
+        self.samples = 0
+        self.overwritten = 0
+        self.saves = 0
+
+    # -- recording -----------------------------------------------------------------
+
+    def record(self, temperature: float | None, humidity: float | None, ts: float | None = None) -> None:
+        if ts is None:
+            ts = time.time()
+        minute = int(ts // 60)
+        closed = False
+        with self._lock:
+            self.samples += 1
+            self.raw.append(ts, temperature, humidity)
+            current = self._current
+            # A clock step backwards also starts a new row rather than reopening an old minute.
+            if current is not None and current.minute != minute:
+                self._close_locked()
+                current, closed = None, True
+            if current is None:
+                current = self._current = _MinuteAccumulator(minute)
+            current.add(temperature, humidity)
+        if closed:
+            self.save()
+
+    def flush(self, ts: float | None = None) -> bool:
+        """Close the current minute once it has ended; returns whether a row was closed."""
+        minute = int((time.time() if ts is None else ts) // 60)
+        with self._lock:
+            if self._current is None or self._current.minute == minute:
+                return False
+            self._close_locked()
+        self.save()
+        return True
+
+    def _close_locked(self) -> None:
+        current = self._current
+        self._current = None
+        if current is None or not current.samples:
+            return
+        if self._rows == self.capacity and self._closed - self._rows >= self._sent:
+            # The oldest row is about to be overwritten before it reached the server.
+            self.overwritten += 1
+        index = self._next
+        columns = self._columns
+        columns["minute"][index] = current.minute
+        columns["samples"][index] = min(current.samples, 0xFFFF)
+        columns["temp_min"][index], columns["temp_max"][index], columns["temp_mean"][index] = current.summary(current.temp)
+        columns["hum_min"][index], columns["hum_max"][index], columns["hum_mean"][index] = current.summary(current.hum)
+        self._next = (index + 1) % self.capacity
+        self._rows = min(self.capacity, self._rows + 1)
+        self._closed += 1
+        self._sent = max(self._sent, self._closed - self._rows)
+
+    # -- backlog -------------------------------------------------------------------
+
+    def backlog(self) -> int:
+        with self._lock:
+            return self._closed - self._sent
+
+    def _row(self, seq: int) -> dict[str, object]:
+        index = (self._next - (self._closed - seq)) % self.capacity
+        columns = self._columns
+        return {
+            "ts": columns["minute"][index] * 60,
+            "samples": columns["samples"][index],
+            "temperature": tuple(_value(columns[key][index]) for key in ("temp_min", "temp_max", "temp_mean")),
+            "humidity": tuple(_value(columns[key][index]) for key in ("hum_min", "hum_max", "hum_mean")),
+        }
+
+    def unsent(self, limit: int) -> list[dict[str, object]]:
+        """Up to ``limit`` closed rollups the server has not acknowledged, oldest first.
+
+        Each row is ``{"ts", "samples", "temperature": (min, max, mean), "humidity": (...)}``
+        with ``ts`` the minute's start in epoch seconds.
+        """
+        self.flush()
+        with self._lock:
+            end = min(self._closed, self._sent + max(0, limit))
+            return [self._row(seq) for seq in range(self._sent, end)]
+
+    def mark_sent(self, count: int) -> None:
+        """Drop the oldest ``count`` rows from the backlog after the server accepted them."""
+        with self._lock:
+            self._sent = min(self._closed, self._sent + max(0, count))
+        self.save()
+
+    def recent(self, limit: int) -> list[dict[str, object]]:
+        """The newest closed rollups, sent or not, oldest first."""
+        with self._lock:
+            count = min(self._rows, max(0, limit))
+            return [self._row(seq) for seq in range(self._closed - count, self._closed)]
+
+    # -- persistence ---------------------------------------------------------------
+
+    def save(self) -> None:
+        """Write the unsent rows to ``path`` (atomically); remove it when there are none."""
+        if not self.path:
+            return
+        with self._lock:
+            count = self._closed - self._sent
+            chunks = []
+            if count:
+                first = (self._next - count) % self.capacity
+                for name, _code in _ROLLUP_COLUMNS:
+                    column = self._columns[name]
+                    if first + count <= self.capacity:
+                        part = column[first : first + count]
+                    else:
+                        part = column[first:] + column[: first + count - self.capacity]
+                    if sys.byteorder != "little":
+                        part.byteswap()
+                    chunks.append(part.tobytes())
+        try:
+            if not count:
+                if os.path.exists(self.path):
+                    os.unlink(self.path)
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as handle:
+                handle.write(_HEADER.pack(_MAGIC, _VERSION, count))
+                for chunk in chunks:
+                    handle.write(chunk)
+            os.replace(tmp_path, self.path)
+            self.saves += 1
+        except OSError as exc:
+            LOGGER.warning("Could not save sensor history to %s: %s", self.path, exc)
+
+    def load(self) -> int:
+        """Restore a saved backlog as unsent rows; returns how many were loaded."""
+        if not self.path:
+            return 0
+        try:
+            with open(self.path, "rb") as handle:
+                data = handle.read()
+        except FileNotFoundError:
+            return 0
+        except OSError as exc:
+            LOGGER.warning("Could not read sensor history %s: %s", self.path, exc)
+            return 0
+        try:
+            magic, version, count = _HEADER.unpack_from(data)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"unrecognised header {magic!r} v{version}")
+            offset = _HEADER.size
+            columns = {}
+            for name, code in _ROLLUP_COLUMNS:
+                column = array(code)
+                size = column.itemsize * count
+                column.frombytes(data[offset : offset + size])
+                if len(column) != count:
+                    raise ValueError("truncated")
+                if sys.byteorder != "little":
+                    column.byteswap()
+                columns[name] = column
+                offset += size
+        except (struct.error, ValueError) as exc:
+            LOGGER.warning("Ignoring unreadable sensor history %s: %s", self.path, exc)
+            return 0
+        # Keep the newest rows if the saved backlog is larger than this ring.
+        skip = max(0, count - self.capacity)
+        with self._lock:
+            for row in range(skip, count):
+                index = self._next
+                for name, _code in _ROLLUP_COLUMNS:
+                    self._columns[name][index] = columns[name][row]
+                self._next = (index + 1) % self.capacity
+                self._rows = min(self.capacity, self._rows + 1)
+                self._closed += 1
+            self.overwritten += skip
+        return count - skip
+
+    def close(self) -> None:
+        """Close the partial current minute and save, so a restart loses no samples."""
+        with self._lock:
+            self._close_locked()
+        self.save()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "samples": self.samples,
+                "rollups": self._closed,
+                "backlog": self._closed - self._sent,
+                "overwritten": self.overwritten,
+                "saves": self.saves,
+            }
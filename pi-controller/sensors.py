@@ -0,0 +1,383 @@
+"""Sensor registry and one poller for every environment sensor on a station.
+
+Sensors are declared, not coded. ``SENSORS`` holds a JSON list, or
+``SENSORS_FILE`` names a JSON file holding one::
+
+    [
+      {"id": "packing", "driver": "dht22", "pin": 4, "interval_s": 10},
+      {"id": "cold-room", "driver": "dht11", "pin": 17, "interval_s": 30,
+       "timeout_s": 3, "filter": {"window": 5, "max_jump_c": 3}},
+      {"id": "sim-1", "driver": "simulated", "latency_s": 0.8, "failure_rate": 0.2}
+    ]
+
+Every key other than the ones ``SensorSpec`` knows is passed to the driver.
+A driver factory in ``DRIVERS`` turns those options into a blocking
+``read() -> (temp_c, humidity)``. ``"filter": null`` turns the median
+filter off for that sensor.
+
+``SensorPoller`` gives each sensor a ``SensorSampler`` and an
+``AdaptiveInterval`` and runs them from one scheduler coroutine. A heap of
+due times decides which sensor reads next. Due sensors are read
+concurrently, with at most ``workers`` read threads across all of them. A
+sensor whose previous read is stuck is skipped rather than stacked, but
+its thread keeps a worker until it returns. Set ``workers`` above the number
+of sensors that might hang at once. Every
+attempt, failed or not, is passed to ``on_result(state, payload)``, with
+``payload`` ``None`` when nothing usable came back. ``start_thread`` runs the
+poller on its own loop for threaded clients.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from sampling import AdaptiveInterval, SensorSampler
+
+LOGGER = logging.getLogger("flss-pi-controller.sensors")
+
+_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+class SensorConfigError(ValueError):
+    """A sensor list that cannot be used as written."""
+
+
+@dataclass(frozen=True)
+class SensorSpec:
+    id: str
+    driver: str
+    interval_s: float = 10.0
+    # Adaptive cadence: MIN while readings move, growing towards MAX while stable. Both default to interval_s.
+    min_interval_s: float | None = None
+    max_interval_s: float | None = None
+    timeout_s: float = 3.0
+    # None disables the median filter.
+    filter: dict[str, float] | None = field(default_factory=dict)
+    stable_c: float = 0.5
+    stable_pct: float = 1.0
+    options: dict[str, object] = field(default_factory=dict)
+
+
+_SPEC_KEYS = {"id", "driver", "interval_s", "min_interval_s", "max_interval_s", "timeout_s", "filter", "stable_c", "stable_pct"}
+_FILTER_KEYS = {"window", "max_jump_c", "max_jump_pct", "confirm"}
+
+
+def parse_specs(raw: object) -> list[SensorSpec]:
+    """Validate a decoded JSON sensor list into specs."""
+    if not isinstance(raw, list):
+        raise SensorConfigError("sensor config must be a JSON list")
+    specs: list[SensorSpec] = []
+    seen: set[str] = set()
+    for index, entry in enumerate(raw):
+        if not isinstance(entry, dict):
+            raise SensorConfigError(f"sensor #{index} must be an object")
+        sensor_id = str(entry.get("id", "")).strip()
+        if not _ID_PATTERN.match(sensor_id):
+            raise SensorConfigError(f"sensor #{index} needs an id of letters, digits, '.', '_' or '-'")
+        if sensor_id in seen:
+            raise SensorConfigError(f"duplicate sensor id {sensor_id!r}")
+        seen.add(sensor_id)
+        driver = str(entry.get("driver", "")).strip().lower()
+        if driver not in DRIVERS:
+            raise SensorConfigError(f"sensor {sensor_id!r}: unknown driver {driver!r}; expected one of {', '.join(sorted(DRIVERS))}")
+        filter_conf = entry.get("filter", {})
+        if filter_conf is not None:
+            if not isinstance(filter_conf, dict) or set(filter_conf) - _FILTER_KEYS:
+                raise SensorConfigError(f"sensor {sensor_id!r}: filter takes {', '.join(sorted(_FILTER_KEYS))} or null")
+            filter_conf = {key: float(value) for key, value in filter_conf.items()}
+        try:
+            interval_s = max(0.1, float(entry.get("interval_s", 10.0)))
+            spec = SensorSpec(
+                id=sensor_id,
+                driver=driver,
+                interval_s=interval_s,
+                min_interval_s=float(entry["min_interval_s"]) if "min_interval_s" in entry else None,
+                max_interval_s=float(entry["max_interval_s"]) if "max_interval_s" in entry else None,
+                timeout_s=max(0.05, float(entry.get("timeout_s", 3.0))),
+                filter=filter_conf,
+                stable_c=float(entry.get("stable_c", 0.5)),
+                stable_pct=float(entry.get("stable_pct", 1.0)),
+                options={key: value for key, value in entry.items() if key not in _SPEC_KEYS},
+            )
+        except (TypeError, ValueError) as exc:
+            raise SensorConfigError(f"sensor {sensor_id!r}: {exc}") from exc
+        specs.append(spec)
+    return specs
+
+
+def load_specs(raw_json: str, path: str, default: list[SensorSpec]) -> list[SensorSpec]:
+    """Specs from ``SENSORS`` (JSON text) or ``SENSORS_FILE``, else ``default``."""
+    if raw_json.strip():
+        source, text = "SENSORS", raw_json
+    elif path.strip():
+        source = path
+        try:
+            with open(path, encoding="utf-8") as handle:
+                text = handle.read()
+        except OSError as exc:
+            raise SensorConfigError(f"cannot read {path}: {exc}") from exc
+    else:
+        return default
+    try:
+        decoded = json.loads(text)
+    except json.JSONDecodeError as exc:
+        raise SensorConfigError(f"{source} is not valid JSON: {exc}") from exc
+    return parse_specs(decoded)
+
+
+# -- drivers -----------------------------------------------------------------------
+
+
+class SensorUnavailable(RuntimeError):
+    """The driver cannot run on this host (missing library or pin)."""
+
+
+def _dht_driver(model: str) -> Callable[[dict], Callable[[], tuple[float | None, float | None]]]:
+    def build(options: dict) -> Callable[[], tuple[float | None, float | None]]:
+        try:
+            import adafruit_dht
+            import board
+        except Exception as exc:
+            raise SensorUnavailable("install adafruit-circuitpython-dht and libgpiod2") from exc
+        pin_number = int(options.get("pin", 4))
+        pin = getattr(board, f"D{pin_number}", None)
+        if pin is None:
+            raise SensorUnavailable(f"board pin D{pin_number} not available")
+        cls = getattr(adafruit_dht, model)
+        try:
+            device = cls(pin, use_pulseio=bool(options.get("use_pulseio", False)))
+        except TypeError:
+            device = cls(pin)
+        return lambda: (device.temperature, device.humidity)
+
+    return build
+
+
+class SimulatedDriver:
+    """Stand-in sensor with configurable latency, failures and hangs, for tests and the bench.
+
+    Options: ``latency_s`` (+/- ``jitter_s``) per read, ``failure_rate`` of reads
+    raising ``RuntimeError`` like a DHT checksum error, ``hang_rate`` of reads
+    blocking for ``hang_s``, and a random walk of ``drift_c``/``drift_pct`` per read
+    around ``temp_c``/``humidity``. ``seed`` makes a run repeatable.
+    """
+
+    def __init__(self, options: dict) -> None:
+        self.latency_s = max(0.0, float(options.get("latency_s", 0.25)))
+        self.jitter_s = max(0.0, float(options.get("jitter_s", 0.0)))
+        self.failure_rate = min(1.0, max(0.0, float(options.get("failure_rate", 0.0))))
+        self.hang_rate = min(1.0, max(0.0, float(options.get("hang_rate", 0.0))))
+        self.hang_s = max(0.0, float(options.get("hang_s", 30.0)))
+        self.drift_c = float(options.get("drift_c", 0.1))
+        self.drift_pct = float(options.get("drift_pct", 0.3))
+        self.temp_c = float(options.get("temp_c", 21.0))
+        self.humidity = float(options.get("humidity", 50.0))
+        self._random = random.Random(options.get("seed"))
+        self._lock = threading.Lock()
+        self.reads = 0
+
+    def read(self) -> tuple[float, float]:
+        with self._lock:
+            self.reads += 1
+            roll = self._random.random()
+            delay = self.latency_s + self._random.uniform(-self.jitter_s, self.jitter_s)
+            if roll < self.hang_rate:
+                delay = self.hang_s
+            failed = roll >= 1.0 - self.failure_rate
+            self.temp_c += self._random.uniform(-self.drift_c, self.drift_c)
+            self.humidity = min(100.0, max(0.0, self.humidity + self._random.uniform(-self.drift_pct, self.drift_pct)))
+            reading = (round(self.temp_c, 2), round(self.humidity, 2))
+        time.sleep(max(0.0, delay))
+        if failed:
+            raise RuntimeError("simulated checksum error")
+        return reading
+
+
+DRIVERS: dict[str, Callable[[dict], Callable[[], tuple[float | None, float | None]]]] = {
+    "dht11": _dht_driver("DHT11"),
+    "dht22": _dht_driver("DHT22"),
+    "simulated": lambda options: SimulatedDriver(options).read,
+}
+
+
+# -- polling -----------------------------------------------------------------------
+
+
+class SensorState:
+    """One configured sensor: its sampler, cadence and latest filtered reading."""
+
+    def __init__(self, spec: SensorSpec, read: Callable[[], tuple], slots: asyncio.Semaphore | None) -> None:
+        self.spec = spec
+        self.id = spec.id
+        filter_conf = spec.filter
+        if filter_conf is None:
+            # window 1 and an infinite jump: every reading is taken as is.
+            filter_conf = {"window": 1, "max_jump_c": math.inf, "max_jump_pct": math.inf, "confirm": 1}
+        self.sampler = SensorSampler(
+            read,
+            name=spec.id,
+            slots=slots,
+            timeout_s=spec.timeout_s,
+            window=int(filter_conf.get("window", 5)),
+            max_jump_c=filter_conf.get("max_jump_c", 5.0),
+            max_jump_pct=filter_conf.get("max_jump_pct", 15.0),
+            confirm=int(filter_conf.get("confirm", 3)),
+        )
+        min_s = spec.min_interval_s if spec.min_interval_s is not None else spec.interval_s
+        max_s = spec.max_interval_s if spec.max_interval_s is not None else spec.interval_s
+        self.interval = AdaptiveInterval(max(0.1, min_s), max_s, start_s=spec.interval_s)
+        self.last: dict[str, float] | None = None
+        self.last_ok_at: float | None = None
+        self.attempts = 0
+        self._last_change: dict[str, float] | None = None
+
+    def next_delay(self, payload: dict[str, float] | None) -> float:
+        if payload is None:
+            # Failed, timed out or filtered out: try again soon without touching the cadence.
+            return self.interval.min_s
+        previous = self._last_change
+        changed = (
+            previous is None
+            or abs(payload["temp_c"] - previous["temp_c"]) >= self.spec.stable_c
+            or abs(payload["humidity"] - previous["humidity"]) >= self.spec.stable_pct
+        )
+        if changed:
+            # Compare against the last change, not the last sample, so slow drift still counts.
+            self._last_change = payload
+        return self.interval.next(changed)
+
+
+class SensorPoller:
+    """Polls every configured sensor from one coroutine with ``workers`` reads in flight at most."""
+
+    def __init__(
+        self,
+        specs: list[SensorSpec],
+        on_result: Callable[[SensorState, dict[str, float] | None], None],
+        *,
+        workers: int = 2,
+    ) -> None:
+        self.specs = list(specs)
+        self.on_result = on_result
+        self.workers = max(1, workers)
+        self.sensors: dict[str, SensorState] = {}
+        self.unavailable: dict[str, str] = {}
+        self._stop = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+
+    def _build(self) -> None:
+        # Built on the loop that polls, so the shared semaphore belongs to it.
+        slots = asyncio.Semaphore(self.workers)
+        for spec in self.specs:
+            try:
+                read = DRIVERS[spec.driver](spec.options)
+            except SensorUnavailable as exc:
+                self.unavailable[spec.id] = str(exc)
+                LOGGER.warning("Sensor %s (%s) unavailable: %s", spec.id, spec.driver, exc)
+                continue
+            except Exception as exc:
+                self.unavailable[spec.id] = str(exc)
+                LOGGER.warning("Sensor %s (%s) failed to start: %s", spec.id, spec.driver, exc)
+                continue
+            self.sensors[spec.id] = SensorState(spec, read, slots)
+
+    async def run(self) -> None:
+        self._build()
+        if not self.sensors:
+            return
+        loop = self._loop = asyncio.get_running_loop()
+        now = loop.time()
+        due: list[tuple[float, int, str]] = []
+        for order, sensor_id in enumerate(self.sensors):
+            heapq.heappush(due, (now, order, sensor_id))
+        order_of = {sensor_id: order for order, sensor_id in enumerate(self.sensors)}
+        wake = asyncio.Event()
+        tasks: set[asyncio.Task] = set()
+
+        async def poll(state: SensorState) -> None:
+            payload = await state.sampler.sample()
+            state.attempts += 1
+            if payload is not None:
+                state.last = payload
+                state.last_ok_at = time.time()
+            try:
+                self.on_result(state, payload)
+            except Exception:
+                LOGGER.exception("Sensor %s result handler failed", state.id)
+            heapq.heappush(due, (loop.time() + state.next_delay(payload), order_of[state.id], state.id))
+            wake.set()
+
+        try:
+            while not self._stop.is_set():
+                now = loop.time()
+                while due and due[0][0] <= now:
+                    _when, _order, sensor_id = heapq.heappop(due)
+                    task = asyncio.create_task(poll(self.sensors[sensor_id]))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                wake.clear()
+                timeout = max(0.0, due[0][0] - loop.time()) if due else None
+                stop_wait = asyncio.ensure_future(self._stop.wait())
+                wake_wait = asyncio.ensure_future(wake.wait())
+                try:
+                    await asyncio.wait({stop_wait, wake_wait}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    stop_wait.cancel()
+                    wake_wait.cancel()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self) -> None:
+        """Stop polling; safe to call from any thread. A read already running is abandoned."""
+        loop = self._loop
+        if loop is None:
+            self._stop.set()
+            return
+        try:
+            loop.call_soon_threadsafe(self._stop.set)
+        except RuntimeError:
+            pass  # loop already closed
+
+    def start_thread(self) -> None:
+        """Run the poller on a private event loop in a daemon thread (for threaded clients)."""
+
+        def main() -> None:
+            loop = asyncio.new_event_loop()
+            self._loop = loop
+            try:
+                loop.run_until_complete(self.run())
+            finally:
+                loop.close()
+
+        self._thread = threading.Thread(target=main, name="sensor-poller", daemon=True)
+        self._thread.start()
+
+    def join(self, timeout_s: float = 2.0) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout_s)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {
+            sensor_id: {
+                "attempts": state.attempts,
+                "timeouts": state.sampler.timeouts,
+                "readErrors": state.sampler.read_errors,
+                "busySkips": state.sampler.busy_skips,
+                "rejected": state.sampler.temperature.rejected + state.sampler.humidity.rejected,
+                "intervalS": state.interval.current_s,
+            }
+            for sensor_id, state in self.sensors.items()
+        }
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""One process for a whole FLSS station: controller events, remote actions and sensors.
+
+A Pi that runs ``controller_daemon.py`` and ``scripts/rotary-pi-wired.py``
+side by side pays for two interpreters, two gpiozero pin factories, two DHT
+pollers on the same pin and two connections to FLSS. ``StationRuntime`` is
+the daemon with the rotary client's action pipeline mounted on it:
+
+- One asyncio loop. The controller outbox, sensor polling and the rotary
+  client's timers all run on it. The timers cover LED flashes, click/hold
+  and rotation windows, retries and the periodic jobs. The ``controller``
+  profile's edges go through the daemon's ingress as usual. The ``rotary``
+  profile's edges are decoded on gpiozero's threads, as in the rotary
+  client, so a fast spin never wakes the loop per edge.
+- One GPIO layer. The selected input profile's pins, the RGB LED and the DHT
+  pins are claimed up front. Two roles on one pin stop the runtime before
+  any pin is opened.
+- One ``SensorPoller``. Each reading becomes a SENSOR event and an
+  environment reading with history, as the two scripts produced separately.
+- One ``/ws/controller`` socket. Sequenced controller events and the rotary
+  client's remote commands (actions, heartbeats, telemetry) share it. The
+  rotary client's HTTP fallback is unchanged for when the socket is down.
+
+``STATION_INPUT_PROFILE`` picks how the encoder and buttons behave.
+``rotary`` (the default) sends dispatch actions like the rotary client.
+``controller`` emits ROTATE/PRESS events like the daemon. Both scripts'
+settings keep their names. ``ROTARY_WS_URL`` and ``ROTARY_METRICS_ADDR``
+are unused, because the socket and ``/metrics`` are the daemon's. Remote actions are still delivered on the rotary client's
+sender threads, and the optional dispatch mirror still holds its own event
+stream.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from dataclasses import replace
+from typing import Callable
+
+from gpiozero import RGBLED
+
+from controller_daemon import ControllerDaemon
+from metrics import MetricsWriter
+from sensors import SensorSpec, SensorState
+
+LOGGER = logging.getLogger("flss-pi-controller.station")
+
+ROTARY_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "rotary-pi-wired.py")
+PROFILES = ("rotary", "controller")
+_DHT_DRIVERS = {"dht11", "dht22"}
+
+
+class StationConfigError(ValueError):
+    """A station configuration that cannot run as written."""
+
+
+def load_rotary():
+    """Import ``scripts/rotary-pi-wired.py`` (not a valid module name) as ``rotary_pi_wired``."""
+    if "rotary_pi_wired" in sys.modules:
+        return sys.modules["rotary_pi_wired"]
+    spec = importlib.util.spec_from_file_location("rotary_pi_wired", ROTARY_SCRIPT)
+    rotary = importlib.util.module_from_spec(spec)
+    sys.modules["rotary_pi_wired"] = rotary
+    spec.loader.exec_module(rotary)
+    return rotary
+
+
+def claim_pins(claims: list[tuple[str, int]]) -> dict[int, str]:
+    """Map each BCM pin to its role; two roles on one pin raise ``StationConfigError``."""
+    owners: dict[int, str] = {}
+    for role, pin in claims:
+        if pin in owners:
+            raise StationConfigError(f"GPIO{pin} is assigned to both {owners[pin]} and {role}")
+        owners[pin] = role
+    return owners
+
+
+class LoopTimers:
+    """The rotary client's ``TimerScheduler`` interface on the runtime's event loop.
+
+    ``call_later`` may be called from any thread. Callbacks run on the loop
+    and, as on the timer thread they replace, must be short and never block.
+    """
+
+    def __init__(self, handle_factory: Callable) -> None:
+        self._handle_factory = handle_factory
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        self._lock = threading.Lock()
+        self._armed: set = set()
+        self._stopped = False
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Attach to ``loop``; call from the loop's own thread."""
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+
+    def start(self) -> None:
+        self._stopped = False
+
+    def stop(self, timeout_s: float = 1.0) -> None:
+        self._stopped = True
+
+    def call_later(self, delay_s: float, callback: Callable[..., None], *args):
+        handle = self._handle_factory(time.monotonic() + max(0.0, delay_s), callback, args)
+        with self._lock:
+            self._armed.add(handle)
+        if threading.get_ident() == self._loop_thread:
+            self._arm(handle)
+        else:
+            try:
+                self._loop.call_soon_threadsafe(self._arm, handle)
+            except RuntimeError:
+                pass  # loop already closed during shutdown
+        return handle
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(1 for handle in self._armed if not handle.cancelled)
+
+    def _arm(self, handle) -> None:
+        self._loop.call_later(max(0.0, handle.when - time.monotonic()), self._fire, handle)
+
+    def _fire(self, handle) -> None:
+        with self._lock:
+            self._armed.discard(handle)
+        if handle.cancelled or self._stopped:
+            return
+        try:
+            handle.callback(*handle.args)
+        except Exception:
+            LOGGER.exception("Timer callback %s failed", getattr(handle.callback, "__name__", handle.callback))
+
+
+class LoopRemoteSocket:
+    """The rotary client's ``RemoteSocket`` interface over the runtime's controller socket.
+
+    ``request`` runs on the client's sender threads. It hands the frame to the
+    loop and waits for the ``remote-result`` with the same id. It returns
+    ``None`` while the socket is down, or after ``timeout_s`` with no reply,
+    so the client falls back to HTTP as it does with its own socket.
+    """
+
+    def __init__(self, runtime: StationRuntime, timeout_s: float) -> None:
+        self.runtime = runtime
+        self.timeout_s = timeout_s
+        self._pending: dict[str, list] = {}
+        self._pending_lock = threading.Lock()
+        self.requests = 0
+        self.fallbacks = 0
+
+    @property
+    def connects(self) -> int:
+        return self.runtime.ws_connects
+
+    def start(self) -> None:
+        pass
+
+    def stop(self, timeout_s: float = 2.0) -> None:
+        self.fail_pending()
+
+    def is_connected(self) -> bool:
+        return self.runtime.remote_ready
+
+    def request(self, kind: str, request_id: str, body: dict[str, object]) -> tuple[int, object, float | None] | None:
+        runtime = self.runtime
+        if not runtime.remote_ready:
+            self.fallbacks += 1
+            return None
+        waiter: list = [threading.Event(), None]
+        with self._pending_lock:
+            self._pending[request_id] = waiter
+        try:
+            frame = json.dumps({"type": kind, "id": request_id, "body": body})
+            # Fire and forget: a failed send releases the waiter, so the sender blocks only once.
+            runtime.loop.call_soon_threadsafe(runtime.send_remote, frame, request_id)
+            if not waiter[0].wait(self.timeout_s):
+                LOGGER.warning("%s %s: no WebSocket reply in %gs; retrying over HTTP", kind, request_id, self.timeout_s)
+        except Exception as exc:
+            LOGGER.warning("%s: WebSocket send failed: %s", kind, exc)
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+        self.requests += 1
+        if waiter[1] is None:
+            self.fallbacks += 1
+        return waiter[1]
+
+    def route(self, payload: dict) -> None:
+        """Hand a ``remote-result`` to the sender waiting on its id (loop thread)."""
+        with self._pending_lock:
+            waiter = self._pending.get(str(payload.get("id")))
+        if waiter is not None:
+            waiter[1] = (int(payload.get("status") or 0), payload.get("body"), payload.get("serverTime"))
+            waiter[0].set()
+
+    def fail(self, request_id: str) -> None:
+        """Release one sender without a result, so it falls back to HTTP now."""
+        with self._pending_lock:
+            waiter = self._pending.get(request_id)
+        if waiter is not None:
+            waiter[0].set()
+
+    def fail_pending(self) -> None:
+        with self._pending_lock:
+            waiters = list(self._pending.values())
+        for waiter in waiters:
+            waiter[0].set()
+
+
+class StationRuntime(ControllerDaemon):
+    """The controller daemon plus the rotary client, sharing one loop, socket, poller and GPIO layer."""
+
+    def __init__(self, profile: str = "rotary") -> None:
+        if profile not in PROFILES:
+            raise StationConfigError(f"STATION_INPUT_PROFILE must be one of {', '.join(PROFILES)}, not {profile!r}")
+        super().__init__()
+        self.profile = profile
+        self.rotary = load_rotary()
+        settings = self.settings = self.rotary.load_settings()
+        # Remote commands on the shared socket are authorised like the rotary client's own socket.
+        self.ws_token = self.ws_token or settings.remote_token
+        self.edge_trace_path = self.edge_trace_path or settings.edge_trace_path
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.remote_ready = False
+        self._ws = None
+        self.stopping = asyncio.Event()
+
+        # Checked before any device is created, so a clash never leaves a pin half-configured.
+        self.pins = claim_pins(self._pin_claims())
+        self.timers = LoopTimers(self.rotary.TimerHandle)
+        self.remote = LoopRemoteSocket(self, settings.request_timeout_s) if settings.remote_transport == "ws" else None
+        self.led = RGBLED(settings.rgb_red_pin, settings.rgb_green_pin, settings.rgb_blue_pin)
+        self.led.off()
+        self.client = self.rotary.RotaryFlssClient(settings, self.led, scheduler=self.timers, remote_socket=self.remote)
+        self.environment = self.rotary.EnvironmentMonitor(settings, self.client.telemetry, poller=self.sensor_poller)
+        self.controls = None
+        self._executor = None
+        self._jobs: list = []
+
+    def _default_sensor(self) -> SensorSpec:
+        # The rotary client's DHT_PIN wins over the daemon's fixed pin map.
+        spec = super()._default_sensor()
+        return replace(spec, options={**spec.options, "pin": int(os.getenv("DHT_PIN", str(self.pin_map.dht)))})
+
+    def _pin_claims(self) -> list[tuple[str, int]]:
+        settings = self.settings
+        claims = [
+            ("LED red", settings.rgb_red_pin),
+            ("LED green", settings.rgb_green_pin),
+            ("LED blue", settings.rgb_blue_pin),
+        ]
+        if self.profile == "rotary":
+            claims += [
+                ("encoder CLK", settings.cw_pin),
+                ("encoder DT", settings.ccw_pin),
+                ("encoder switch", settings.sw_pin),
+                ("print button", settings.print_btn_pin),
+                ("fulfill button", settings.fulfill_btn_pin),
+            ]
+        else:
+            pin_map = self.pin_map
+            claims += [
+                ("encoder CLK", pin_map.enc_clk),
+                ("encoder DT", pin_map.enc_dt),
+                ("encoder switch", pin_map.enc_sw),
+            ]
+            claims += [(f"{name} button", getattr(pin_map, name.lower())) for name in self.BUTTON_NAMES]
+        for spec in self.sensor_poller.specs:
+            if spec.driver in _DHT_DRIVERS:
+                claims.append((f"sensor {spec.id}", int(spec.options.get("pin", 4))))
+        return claims
+
+    # -- inputs --------------------------------------------------------------------
+
+    def setup_gpio(self) -> None:
+        if self.profile == "controller":
+            super().setup_gpio()
+            return
+        # RotaryInput takes edges on gpiozero's threads under its own lock, as in the rotary client.
+        # Routing them through the ingress would wake the loop for every encoder edge; only the
+        # resulting timers and frames reach the loop.
+        self.controls = self.rotary.open_controls(self.client, self.settings)
+
+    def start_edge_trace(self) -> None:
+        if self.controls is None:
+            super().start_edge_trace()
+        else:
+            self.controls.start_edge_trace(self.edge_trace_path)
+
+    def _on_sensor_result(self, state: SensorState, payload: dict[str, float] | None) -> None:
+        super()._on_sensor_result(state, payload)
+        self.environment.on_result(state, payload)
+
+    # -- shared socket -------------------------------------------------------------
+
+    def send_remote(self, frame: str, request_id: str) -> None:
+        """Write a remote command on the controller socket (loop thread)."""
+        ws = self._ws
+        if ws is None:
+            self.remote.fail(request_id)
+            return
+        task = asyncio.ensure_future(ws.send(frame))
+        task.add_done_callback(lambda done: self._remote_sent(done, request_id))
+
+    def _remote_sent(self, task: asyncio.Task, request_id: str) -> None:
+        error = None if task.cancelled() else task.exception()
+        if task.cancelled() or error is not None:
+            LOGGER.warning("Remote command %s not sent: %s", request_id, error or "cancelled")
+            self.remote.fail(request_id)
+
+    async def recv_loop(self, ws) -> None:
+        self._ws = ws
+        try:
+            await super().recv_loop(ws)
+        finally:
+            self._ws = None
+            self.remote_ready = False
+            if self.remote is not None:
+                self.remote.fail_pending()
+
+    def handle_frame(self, channel: str | None, payload: dict) -> None:
+        if channel == "ready":
+            self.remote_ready = self.remote is not None and bool(payload.get("remoteCommands"))
+            if self.remote is not None and not self.remote_ready:
+                LOGGER.warning("FLSS does not accept remote commands over WebSocket; actions use HTTP")
+        elif channel == "remote-result" and self.remote is not None:
+            self.remote.route(payload)
+
+    # -- metrics -------------------------------------------------------------------
+
+    def collect_metrics(self) -> MetricsWriter:
+        writer = super().collect_metrics()
+        writer.extend(self.client.collect_metrics(self.environment))
+        return writer
+
+    def report_latency(self) -> None:
+        super().report_latency()
+        self.client.report_latency()
+
+    def metrics_health(self) -> tuple[bool, str]:
+        healthy, detail = super().metrics_health()
+        return healthy, f"{detail} profile={self.profile} remote_ready={int(self.remote_ready)}"
+
+    # -- lifecycle -----------------------------------------------------------------
+
+    def shutdown(self) -> None:
+        """Begin an orderly stop (loop thread)."""
+        self.stopping.set()
+
+    async def run(self) -> None:
+        loop = self.loop = asyncio.get_running_loop()
+        self.timers.bind(loop)
+        self.client.start()
+        self.environment.start()
+        self._executor, self._jobs = self.rotary.start_jobs(self.client, self.environment, self.settings)
+        # The auth probe is a blocking HTTP call that only reports and flashes the LED.
+        loop.run_in_executor(None, self.client.probe_auth)
+        daemon_task = asyncio.create_task(super().run())
+        stopping_task = asyncio.ensure_future(self.stopping.wait())
+        await asyncio.wait({daemon_task, stopping_task}, return_when=asyncio.FIRST_COMPLETED)
+        stopping_task.cancel()
+        # Actions still in flight need the socket, so the rotary side winds down before the daemon's teardown.
+        await loop.run_in_executor(None, self._stop_rotary)
+        self.stop.set()
+        await daemon_task
+
+    def _stop_rotary(self) -> None:
+        self.sensor_poller.stop()
+        for job in self._jobs:
+            job.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self.environment.stop()
+        if self.controls is not None and self.controls.recorder is not None:
+            self.controls.recorder.close()
+        self.client.close()
+        self.led.off()
+
+
+def main() -> int:
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        runtime = StationRuntime(os.getenv("STATION_INPUT_PROFILE", "rotary").strip().lower())
+    except ValueError as exc:
+        LOGGER.error("Station not started: %s", exc)
+        return 2
+
+    settings = runtime.settings
+    LOGGER.info(
+        "Station %s: profile=%s ws=%s remote_id=%s transport=%s",
+        runtime.source,
+        runtime.profile,
+        runtime.ws_url,
+        settings.remote_id,
+        settings.remote_transport,
+    )
+    LOGGER.info("Pins: %s", ", ".join(f"GPIO{pin}={role}" for pin, role in sorted(runtime.pins.items())))
+    specs = runtime.sensor_poller.specs
+    LOGGER.info(
+        "Sensors: %s; %s read worker(s)",
+        ", ".join(f"{spec.id} ({spec.driver})" for spec in specs) or "none",
+        runtime.sensor_poller.workers,
+    )
+
+    def shutdown(*_args):
+        loop.call_soon_threadsafe(runtime.shutdown)
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    # `kill -USR1 <pid>` logs both sides' latency, loop lag and queue counters.
+    signal.signal(signal.SIGUSR1, lambda *_args: loop.call_soon_threadsafe(runtime.report_latency))
+
+    loop.run_until_complete(runtime.run())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
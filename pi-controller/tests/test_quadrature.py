@@ -0,0 +1,68 @@
+"""Replay recorded-style edge traces through the quadrature decoder."""
+
+from __future__ import annotations
+
+import unittest
+
+from quadrature import QuadratureDecoder
+
+CW_DETENT = [0b01, 0b11, 0b10, 0b00]
+CCW_DETENT = [0b10, 0b11, 0b01, 0b00]
+
+
+def trace(states: list[int], gap_ms: float) -> list[tuple[int, int, int]]:
+    gap_ns = int(gap_ms * 1_000_000)
+    return [(state >> 1, state & 1, (index + 1) * gap_ns) for index, state in enumerate(states)]
+
+
+def replay(edges: list[tuple[int, int, int]], **kwargs) -> tuple[int, QuadratureDecoder]:
+    decoder = QuadratureDecoder(**kwargs)
+    total = 0
+    for a, b, ts_ns in edges:
+        total += decoder.update(a, b, ts_ns)
+    return total, decoder
+
+
+# name -> (edges, decoder kwargs, expected total signed lines)
+TRACES: dict[str, tuple[list[tuple[int, int, int]], dict, int]] = {
+    "cw-3-detents": (trace(CW_DETENT * 3, 20), {}, 3),
+    "ccw-2-detents": (trace(CCW_DETENT * 2, 20), {}, -2),
+    "cw-with-bounce-on-a": (trace([0b01, 0b11, 0b01, 0b11, 0b01, 0b11, 0b10, 0b00], 1), {}, 1),
+    "missed-edge-rejected": (trace([0b01, 0b10, 0b00, 0b01, 0b11, 0b10, 0b00], 20), {}, 1),
+    "reverse-mid-detent": (trace([0b01, 0b11, 0b01, 0b00] + CCW_DETENT, 20), {}, -1),
+    "half-step-encoder": (trace([0b01, 0b11, 0b10, 0b00], 20), {"steps_per_detent": 2}, 2),
+    "slow-spin-no-accel": (trace(CW_DETENT * 4, 30), {"accel_max": 4}, 4),
+    "fast-spin-accelerates": (trace(CW_DETENT * 4, 2), {"accel_max": 4}, 1 + 4 * 3),
+    "reversed-wiring": (trace(CW_DETENT * 2, 20), {"reverse": True}, -2),
+}
+
+
+class QuadratureTraceTest(unittest.TestCase):
+    def test_traces(self) -> None:
+        for name, (edges, kwargs, expected) in TRACES.items():
+            with self.subTest(name):
+                self.assertEqual(replay(edges, **kwargs)[0], expected)
+
+    def test_missed_edge_is_counted_not_decoded(self) -> None:
+        edges, kwargs, _ = TRACES["missed-edge-rejected"]
+        _, decoder = replay(edges, **kwargs)
+        self.assertEqual(decoder.invalid, 1)
+        self.assertEqual(decoder.detents, 1)
+
+    def test_bounce_does_not_emit_extra_detents(self) -> None:
+        edges, kwargs, _ = TRACES["cw-with-bounce-on-a"]
+        _, decoder = replay(edges, **kwargs)
+        self.assertEqual(decoder.detents, 1)
+        self.assertEqual(decoder.invalid, 0)
+
+    def test_reset_discards_partial_detent(self) -> None:
+        decoder = QuadratureDecoder()
+        for a, b, ts_ns in trace([0b01, 0b11], 20):
+            decoder.update(a, b, ts_ns)
+        decoder.reset(0, 0)
+        self.assertEqual(sum(decoder.update(a, b, ts) for a, b, ts in trace([0b01, 0b11, 0b10], 20)), 0)
+        self.assertEqual(decoder.accumulator, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+"""Median glitch filter and joint temperature/humidity rejection."""
+
+from __future__ import annotations
+
+import unittest
+
+from sampling import MedianFilter, SensorSampler
+
+
+def settled(values: list[float], **kwargs) -> MedianFilter:
+    median = MedianFilter(window=5, max_jump=5.0, confirm=3, **kwargs)
+    for value in values:
+        median.update(value)
+    return median
+
+
+class MedianFilterTest(unittest.TestCase):
+    def test_isolated_jump_is_held_back(self) -> None:
+        median = settled([20.0, 20.0, 20.0])
+        self.assertIsNone(median.update(40.0))
+        self.assertEqual(median.update(20.5), 20.0)
+        self.assertEqual(median.rejected, 1)
+
+    def test_agreeing_jumps_are_a_real_step(self) -> None:
+        median = settled([20.0, 20.0, 20.0])
+        self.assertEqual([median.update(value) for value in (40.0, 41.0, 42.0)], [None, None, 41.0])
+
+    def test_outliers_jumping_different_ways_do_not_confirm(self) -> None:
+        median = settled([20.0, 20.0, 20.0])
+        self.assertEqual([median.update(value) for value in (40.0, 0.0, 40.0)], [None, None, None])
+        self.assertEqual(median.value(), 20.0)
+        self.assertEqual([median.update(value) for value in (41.0, 42.0)], [None, 41.0])
+
+
+class SensorSamplerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_a_glitch_on_one_channel_holds_back_both(self) -> None:
+        reads = iter([(20.0, 50.0), (20.0, 50.0), (20.0, 50.0), (60.0, 52.0), (20.0, 52.0)])
+        sampler = SensorSampler(lambda: next(reads), window=5, max_jump_c=5.0, max_jump_pct=15.0, confirm=3)
+        for _ in range(3):
+            await sampler.sample()
+
+        self.assertIsNone(await sampler.sample())
+        self.assertEqual(sampler.temperature.rejected, 1)
+        self.assertEqual(sampler.humidity.rejected, 0)
+        # The humidity of the rejected read never entered its window.
+        self.assertEqual(await sampler.sample(), {"temp_c": 20.0, "humidity": 50.0})
+        self.assertEqual(len(sampler.humidity._samples), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
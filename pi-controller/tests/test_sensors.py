@@ -0,0 +1,134 @@
+"""Sensor registry validation and SensorPoller scheduling, driven by SimulatedDriver."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+import sensors
+from sensors import SensorConfigError, SensorPoller, SensorUnavailable, SimulatedDriver, load_specs, parse_specs
+
+
+def simulated(sensor_id: str, **options) -> dict:
+    # filter null and a fixed interval, so scheduling does not depend on the readings.
+    return {"id": sensor_id, "driver": "simulated", "latency_s": 0, "filter": None, "seed": 1, **options}
+
+
+class ParseSpecsTest(unittest.TestCase):
+    def assert_config_error(self, raw: object, message: str) -> None:
+        with self.assertRaises(SensorConfigError) as caught:
+            parse_specs(raw)
+        self.assertIn(message, str(caught.exception))
+
+    def test_rejects_unusable_lists(self) -> None:
+        self.assert_config_error({"id": "a"}, "must be a JSON list")
+        self.assert_config_error(["a"], "sensor #0 must be an object")
+        self.assert_config_error([{"id": "no spaces", "driver": "simulated"}], "needs an id")
+        self.assert_config_error([{"id": "a", "driver": "simulated"}, {"id": "a", "driver": "simulated"}], "duplicate sensor id 'a'")
+        self.assert_config_error([{"id": "a", "driver": "bmp280"}], "unknown driver 'bmp280'")
+        self.assert_config_error([{"id": "a", "driver": "simulated", "filter": {"span": 3}}], "filter takes")
+        self.assert_config_error([{"id": "a", "driver": "simulated", "interval_s": "often"}], "sensor 'a'")
+
+    def test_passes_driver_options_through(self) -> None:
+        [spec] = parse_specs([{"id": "cold-room", "driver": "DHT11", "pin": 17, "interval_s": 0.01, "filter": None}])
+        self.assertEqual(spec.driver, "dht11")
+        self.assertEqual(spec.options, {"pin": 17})
+        self.assertEqual(spec.interval_s, 0.1)
+        self.assertIsNone(spec.filter)
+
+    def test_load_specs_falls_back_and_reports_bad_json(self) -> None:
+        default = parse_specs([simulated("default")])
+        self.assertIs(load_specs("", "", default), default)
+        with self.assertRaises(SensorConfigError):
+            load_specs("[{", "", default)
+        with self.assertRaises(SensorConfigError):
+            load_specs("", "/nonexistent/sensors.json", default)
+
+
+class SensorPollerTest(unittest.IsolatedAsyncioTestCase):
+    async def poll_for(self, raw: list[dict], seconds: float, *, workers: int = 2) -> tuple[SensorPoller, list]:
+        results: list[tuple[str, dict | None]] = []
+        poller = SensorPoller(parse_specs(raw), lambda state, payload: results.append((state.id, payload)), workers=workers)
+        task = asyncio.create_task(poller.run())
+        await asyncio.sleep(seconds)
+        poller.stop()
+        await asyncio.wait_for(task, 2.0)
+        return poller, results
+
+    async def test_each_sensor_keeps_its_own_interval(self) -> None:
+        poller, results = await self.poll_for(
+            [simulated("fast", interval_s=0.1), simulated("slow", interval_s=0.4)], 0.85
+        )
+        attempts = {sensor_id: stats["attempts"] for sensor_id, stats in poller.stats().items()}
+        self.assertIn(attempts["fast"], range(7, 11))
+        self.assertIn(attempts["slow"], range(2, 4))
+        self.assertTrue(all(payload is not None for _sensor, payload in results))
+
+    async def test_reads_never_exceed_the_worker_bound(self) -> None:
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def counting(options: dict):
+            read = SimulatedDriver(options).read
+
+            def wrapped():
+                with lock:
+                    running[0] += 1
+                    peak[0] = max(peak[0], running[0])
+                try:
+                    return read()
+                finally:
+                    with lock:
+                        running[0] -= 1
+
+            return wrapped
+
+        with mock.patch.dict(sensors.DRIVERS, {"simulated": counting}):
+            poller, _results = await self.poll_for(
+                [simulated(f"s{index}", latency_s=0.15, interval_s=0.1) for index in range(5)], 0.6, workers=2
+            )
+        self.assertEqual(peak[0], 2)
+        self.assertTrue(all(stats["attempts"] for stats in poller.stats().values()))
+
+    async def test_a_hung_read_times_out_without_stalling_other_sensors(self) -> None:
+        with self.assertLogs("flss-pi-controller.sampling", "WARNING") as logs:
+            poller, results = await self.poll_for(
+                [
+                    simulated("stuck", hang_rate=1.0, hang_s=1.0, timeout_s=0.1, interval_s=0.1),
+                    simulated("healthy", interval_s=0.1),
+                ],
+                0.6,
+            )
+        self.assertIn("stuck read exceeded", logs.output[0])
+        stats = poller.stats()
+        self.assertEqual(stats["stuck"]["timeouts"], 1)
+        self.assertGreaterEqual(stats["stuck"]["busySkips"], 1)
+        self.assertGreaterEqual(stats["healthy"]["attempts"], 4)
+        self.assertTrue(all(payload is None for sensor_id, payload in results if sensor_id == "stuck"))
+        self.assertIsNone(poller.sensors["stuck"].last)
+
+    async def test_failed_reads_are_counted_and_reported(self) -> None:
+        poller, results = await self.poll_for([simulated("flaky", failure_rate=1.0, interval_s=0.1)], 0.35)
+        stats = poller.stats()["flaky"]
+        self.assertGreaterEqual(stats["attempts"], 3)
+        self.assertEqual(stats["readErrors"], stats["attempts"])
+        self.assertEqual(len(results), stats["attempts"])
+        self.assertTrue(all(payload is None for _sensor, payload in results))
+
+    async def test_unavailable_driver_is_skipped(self) -> None:
+        def missing(_options: dict):
+            raise SensorUnavailable("install the driver")
+
+        with mock.patch.dict(sensors.DRIVERS, {"dht22": missing}), self.assertLogs("flss-pi-controller.sensors", "WARNING"):
+            poller, results = await self.poll_for(
+                [{"id": "packing", "driver": "dht22", "pin": 4}, simulated("sim", interval_s=0.1)], 0.15
+            )
+        self.assertEqual(poller.unavailable, {"packing": "install the driver"})
+        self.assertEqual({sensor_id for sensor_id, _payload in results}, {"sim"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,6 +12,8 @@ SYSTEMD_DIR="/etc/systemd/system"
 install -m 0644 "${REPO_DIR}/scripts/raspberry-pi/flss.service" "${SYSTEMD_DIR}/flss.service"
 install -m 0644 "${REPO_DIR}/scripts/raspberry-pi/flss-rotary.service" "${SYSTEMD_DIR}/flss-rotary.service"
 install -m 0644 "${REPO_DIR}/scripts/raspberry-pi/flss-kiosk.service" "${SYSTEMD_DIR}/flss-kiosk.service"
+# Installed but not enabled: it replaces flss-rotary (and flss-controller) when switched on.
+install -m 0644 "${REPO_DIR}/scripts/raspberry-pi/flss-station.service" "${SYSTEMD_DIR}/flss-station.service"
 
 systemctl daemon-reload
 systemctl enable flss.service flss-rotary.service flss-kiosk.service
@@ -5,8 +5,9 @@ Wired Raspberry Pi rotary encoder client for FLSS Dispatch Controller API.
 Endpoints used:
   POST /api/v1/dispatch/remote/action
   POST /api/v1/dispatch/remote/heartbeat
-  POST /api/v1/dispatch/environment
-  POST /api/v1/environment/ingest
+  POST /api/v1/dispatch/environment  (batched { "readings": [...] })
+  GET  /api/v1/dispatch/events       (SSE; local dispatch-state mirror)
+  POST /api/v1/environment/ingest    (backfilled per-minute DHT rollups)
   (optional fallback) POST /api/v1/dispatch/{next|prev|confirm|print|fulfill}
 
 Auth:
@@ -22,27 +23,45 @@ Wiring (default BCM pins):
 
 from __future__ import annotations
 
+import heapq
 import json
 import os
+import queue
 import random
 import re
+import selectors
 import shlex
 import signal
+import socket
 import subprocess
+import sys
 import threading
 import time
-from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from typing import Callable
+from urllib.parse import urlencode, urlsplit, urlunsplit
 
 import requests
+from requests.adapters import HTTPAdapter
 from gpiozero import Button, RGBLED
 
+# Helpers shared with the station controller daemon live in ../pi-controller.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pi-controller"))
+from edgetrace import EdgeRecorder  # noqa: E402
+from ingress import LEVEL_PRESSED  # noqa: E402
+from latency import LatencyRecorder, server_time_ms  # noqa: E402
+from metrics import MetricsServer, MetricsWriter, process_metrics  # noqa: E402
+from sensorlog import SensorHistory  # noqa: E402
+from sensors import SensorPoller, SensorSpec, SensorState, load_specs  # noqa: E402
+from quadrature import QuadratureDecoder  # noqa: E402
+
 try:
-    import adafruit_dht
-    import board
+    from websockets.sync.client import connect as ws_connect
 except Exception:
-    adafruit_dht = None
-    board = None
+    ws_connect = None
 
 
 @dataclass(frozen=True)
@@ -56,12 +75,18 @@ class Settings:
     heartbeat_interval_s: float
     telemetry_interval_s: float
     remote_legacy_fallback: bool
+    remote_transport: str
+    remote_ws_url: str
     env_sensor_cmd: str
+    env_sensor_mode: str
+    env_sensor_stall_s: float
     env_temperature_c: float | None
     env_humidity_pct: float | None
     dht_enabled: bool
     dht_pin: int
     dht_interval_s: float
+    sensors: tuple[SensorSpec, ...]
+    sensor_workers: int
     station_id: str
     request_timeout_s: float
     cw_pin: int
@@ -71,11 +96,47 @@ class Settings:
     fulfill_btn_pin: int
     sw_hold_time_s: float
     sw_multi_click_window_s: float
+    encoder_steps_per_detent: int
+    encoder_accel_max: int
+    encoder_reverse: bool
     rgb_red_pin: int
     rgb_green_pin: int
     rgb_blue_pin: int
     led_feedback_s: float
-    min_action_gap_s: float
+    action_rate_per_s: float
+    action_burst: float
+    action_max_wait_s: float
+    rotate_window_s: float
+    rotate_steps: bool
+    action_max_in_flight: int
+    action_queue_size: int
+    retry_capacity: int
+    retry_base_s: float
+    retry_max_delay_s: float
+    retry_expiry_s: float
+    dispatch_mirror: bool
+    env_deadband_temp_c: float
+    env_deadband_humidity_pct: float
+    env_max_interval_s: float
+    env_flush_s: float
+    env_batch_max: int
+    env_buffer_max: int
+    env_history_dir: str
+    env_history_minutes: int
+    env_history_samples: int
+    env_backfill_s: float
+    env_backfill_batch_max: int
+    job_jitter: float
+    latency_report_s: float
+    edge_trace_path: str
+    metrics_addr: str
+
+
+def _controller_ws_url(base_url: str, source: str) -> str:
+    """Map ``http://host:3000/api/v1`` to ``ws://host:3000/ws/controller?source=...``."""
+    parts = urlsplit(base_url)
+    scheme = "wss" if parts.scheme == "https" else "ws"
+    return urlunsplit((scheme, parts.netloc, "/ws/controller", urlencode({"source": source}), ""))
 
 
 def load_settings() -> Settings:
@@ -93,7 +154,18 @@ def load_settings() -> Settings:
         "no",
     }
 
+    # Remote commands go over one long-lived /ws/controller socket and fall back to HTTP while it is down.
+    remote_transport = os.getenv("ROTARY_TRANSPORT", "ws").strip().lower()
+    if remote_transport not in {"ws", "http"}:
+        remote_transport = "ws"
+    remote_ws_url = os.getenv("ROTARY_WS_URL", "").strip() or _controller_ws_url(base_url, source)
+
     env_sensor_cmd = os.getenv("ENV_SENSOR_CMD", "").strip()
+    # "oneshot" runs ENV_SENSOR_CMD per telemetry tick; "stream" keeps it running and reads NDJSON lines.
+    env_sensor_mode = os.getenv("ENV_SENSOR_MODE", "oneshot").strip().lower()
+    if env_sensor_mode not in {"oneshot", "stream"}:
+        env_sensor_mode = "oneshot"
+    env_sensor_stall_s = max(1.0, float(os.getenv("ENV_SENSOR_STALL_S", "30")))
 
     def _float_env(name: str) -> float | None:
         raw = os.getenv(name, "").strip()
@@ -106,6 +178,21 @@ def load_settings() -> Settings:
     dht_enabled = os.getenv("DHT11_ENABLED", "1").strip().lower() not in {"0", "false", "no"}
     dht_pin = int(os.getenv("DHT_PIN", "4"))
     dht_interval_s = float(os.getenv("DHT_POLL_INTERVAL_S", "5"))
+    # SENSORS / SENSORS_FILE list every sensor; without them, the single DHT11 on DHT_PIN, read
+    # at a fixed DHT_POLL_INTERVAL_S with no median filter, as before.
+    default_sensors = []
+    if dht_enabled:
+        default_sensors.append(
+            SensorSpec(
+                id=os.getenv("DHT_SENSOR_ID", "dht11").strip() or "dht11",
+                driver="dht11",
+                interval_s=max(1.0, dht_interval_s),
+                filter=None,
+                options={"pin": dht_pin},
+            )
+        )
+    sensors = tuple(load_specs(os.getenv("SENSORS", ""), os.getenv("SENSORS_FILE", ""), default_sensors))
+    sensor_workers = max(1, int(os.getenv("SENSOR_WORKERS", "2")))
     station_id = os.getenv("STATION_ID", "scan-station-01").strip() or "scan-station-01"
 
     request_timeout_s = float(os.getenv("ROTARY_HTTP_TIMEOUT_S", "2.5"))
@@ -123,14 +210,78 @@ def load_settings() -> Settings:
     sw_hold_time_s = float(os.getenv("ROTARY_SW_HOLD_TIME_S", "0.6"))
     sw_multi_click_window_s = float(os.getenv("ROTARY_SW_MULTI_CLICK_WINDOW_S", "0.45"))
 
+    # Quadrature decoding: KY-040/EC11 modules move through 4 states per detent.
+    encoder_steps_per_detent = int(os.getenv("ROTARY_ENCODER_STEPS_PER_DETENT", "4"))
+    encoder_accel_max = int(os.getenv("ROTARY_ENCODER_ACCEL_MAX", "3"))
+    encoder_reverse = os.getenv("ROTARY_ENCODER_REVERSE", "0").strip().lower() in {"1", "true", "yes"}
+
     # Common BCM defaults for a discrete RGB LED module.
     rgb_red_pin = int(os.getenv("ROTARY_RGB_RED_PIN", "18"))
     rgb_green_pin = int(os.getenv("ROTARY_RGB_GREEN_PIN", "23"))
     rgb_blue_pin = int(os.getenv("ROTARY_RGB_BLUE_PIN", "24"))
     led_feedback_s = float(os.getenv("ROTARY_LED_FEEDBACK_S", "0.25"))
 
-    # Client-side throttle to complement server debounce.
-    min_action_gap_s = float(os.getenv("ROTARY_MIN_ACTION_GAP_S", "0.18"))
+    # Request budget (token bucket). Requests over budget wait for a token instead of being dropped.
+    # Plain HTTP shares the server's 120 requests/min per-IP limit, so it gets a lower default.
+    action_rate_per_s = max(0.1, float(os.getenv("ROTARY_ACTION_RATE_PER_S", "5" if remote_transport == "ws" else "1.5")))
+    action_burst = max(1.0, float(os.getenv("ROTARY_ACTION_BURST", "4")))
+    # Optional cap: presses further over budget than this are dropped. 0 (default) never drops one.
+    action_max_wait_s = max(0.0, float(os.getenv("ROTARY_ACTION_MAX_WAIT_S", "0")))
+
+    # Detents are summed over this window (and while waiting for a token) into one action with `steps`.
+    rotate_window_s = max(0.0, float(os.getenv("ROTARY_ROTATE_WINDOW_S", "0.08")))
+    # 0 sends one action per line, for FLSS servers that predate the `steps` field.
+    rotate_steps = os.getenv("ROTARY_ROTATE_STEPS", "1").strip().lower() not in {"0", "false", "no"}
+
+    # Action dispatch: GPIO callbacks only enqueue; workers own the HTTP round trips.
+    # Keep a single in-flight request by default so next/prev arrive in order.
+    action_max_in_flight = max(1, int(os.getenv("ROTARY_ACTION_MAX_IN_FLIGHT", "1")))
+    action_queue_size = max(1, int(os.getenv("ROTARY_ACTION_QUEUE_SIZE", "64")))
+
+    # Actions that fail on the network or with a 5xx are re-sent with the same idempotency key,
+    # backing off from ROTARY_RETRY_BASE_S, until ROTARY_RETRY_EXPIRY_S after the press.
+    retry_capacity = max(0, int(os.getenv("ROTARY_RETRY_MAX", "32")))
+    retry_base_s = max(0.05, float(os.getenv("ROTARY_RETRY_BASE_S", "0.5")))
+    retry_max_delay_s = max(retry_base_s, float(os.getenv("ROTARY_RETRY_MAX_DELAY_S", "8")))
+    retry_expiry_s = max(0.0, float(os.getenv("ROTARY_RETRY_EXPIRY_S", "30")))
+
+    # Mirror dispatch state from /dispatch/events: skip known no-ops and light the LED before the reply.
+    dispatch_mirror = os.getenv("ROTARY_DISPATCH_MIRROR", "1").strip().lower() not in {"0", "false", "no"}
+
+    # Environment uplink: buffer readings that moved past the deadband and upload them in batches.
+    # Keep ENV_TELEMETRY_MAX_INTERVAL_S below the server's ENV_STALE_MS (60s by default).
+    env_deadband_temp_c = max(0.0, float(os.getenv("ENV_TELEMETRY_DEADBAND_C", "0.5")))
+    env_deadband_humidity_pct = max(0.0, float(os.getenv("ENV_TELEMETRY_DEADBAND_PCT", "2")))
+    env_max_interval_s = max(5.0, float(os.getenv("ENV_TELEMETRY_MAX_INTERVAL_S", "45")))
+    env_flush_s = max(1.0, float(os.getenv("ENV_TELEMETRY_FLUSH_S", "20")))
+    env_batch_max = max(1, int(os.getenv("ENV_TELEMETRY_BATCH_MAX", "50")))
+    env_buffer_max = max(1, int(os.getenv("ENV_TELEMETRY_BUFFER_MAX", "720")))
+
+    # Sensor history: raw samples and per-minute rollups kept on the Pi; unsent minutes survive
+    # restarts in ENV_HISTORY_DIR/<sensor id>.bin and are backfilled to /environment/ingest in bulk.
+    env_history_dir = os.getenv(
+        "ENV_HISTORY_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pi-controller", "history"),
+    ).strip()
+    env_history_minutes = max(0, int(os.getenv("ENV_HISTORY_MINUTES", "10080")))
+    env_history_samples = max(1, int(os.getenv("ENV_HISTORY_SAMPLES", "720")))
+    env_backfill_s = max(10.0, float(os.getenv("ENV_BACKFILL_S", "300")))
+    # The server's JSON body limit is 1 MB; a day of minutes is about 500 KB.
+    env_backfill_batch_max = max(1, int(os.getenv("ENV_BACKFILL_BATCH_MAX", "1440")))
+
+    # Periodic heartbeat/telemetry deadlines are spread by this fraction of their interval.
+    job_jitter = float(os.getenv("ROTARY_JOB_JITTER", "0.1"))
+
+    # Log p50/p99/max per action and stage this often; 0 logs only on SIGUSR1.
+    latency_report_s = max(0.0, float(os.getenv("ROTARY_LATENCY_REPORT_S", "0")))
+
+    # Record every raw GPIO edge here for `pi-controller/edgetrace.py replay`.
+    edge_trace_path = os.getenv("ROTARY_EDGE_TRACE", "").strip()
+
+    # Prometheus text on GET /metrics; host:port or unix:/path, empty or 0 to disable.
+    metrics_addr = os.getenv("ROTARY_METRICS_ADDR", "127.0.0.1:9465").strip()
+    if metrics_addr.lower() in {"0", "off", "false", "no"}:
+        metrics_addr = ""
 
     return Settings(
         base_url=base_url,
@@ -142,12 +293,18 @@ def load_settings() -> Settings:
         heartbeat_interval_s=heartbeat_interval_s,
         telemetry_interval_s=telemetry_interval_s,
         remote_legacy_fallback=remote_legacy_fallback,
+        remote_transport=remote_transport,
+        remote_ws_url=remote_ws_url,
         env_sensor_cmd=env_sensor_cmd,
+        env_sensor_mode=env_sensor_mode,
+        env_sensor_stall_s=env_sensor_stall_s,
         env_temperature_c=env_temperature_c,
         env_humidity_pct=env_humidity_pct,
         dht_enabled=dht_enabled,
         dht_pin=dht_pin,
         dht_interval_s=dht_interval_s,
+        sensors=sensors,
+        sensor_workers=sensor_workers,
         station_id=station_id,
         request_timeout_s=request_timeout_s,
         cw_pin=cw_pin,
@@ -157,138 +314,1450 @@ def load_settings() -> Settings:
         fulfill_btn_pin=fulfill_btn_pin,
         sw_hold_time_s=sw_hold_time_s,
         sw_multi_click_window_s=sw_multi_click_window_s,
+        encoder_steps_per_detent=encoder_steps_per_detent,
+        encoder_accel_max=encoder_accel_max,
+        encoder_reverse=encoder_reverse,
         rgb_red_pin=rgb_red_pin,
         rgb_green_pin=rgb_green_pin,
         rgb_blue_pin=rgb_blue_pin,
         led_feedback_s=led_feedback_s,
-        min_action_gap_s=min_action_gap_s,
+        action_rate_per_s=action_rate_per_s,
+        action_burst=action_burst,
+        action_max_wait_s=action_max_wait_s,
+        rotate_window_s=rotate_window_s,
+        rotate_steps=rotate_steps,
+        action_max_in_flight=action_max_in_flight,
+        action_queue_size=action_queue_size,
+        retry_capacity=retry_capacity,
+        retry_base_s=retry_base_s,
+        retry_max_delay_s=retry_max_delay_s,
+        retry_expiry_s=retry_expiry_s,
+        dispatch_mirror=dispatch_mirror,
+        env_deadband_temp_c=env_deadband_temp_c,
+        env_deadband_humidity_pct=env_deadband_humidity_pct,
+        env_max_interval_s=env_max_interval_s,
+        env_flush_s=env_flush_s,
+        env_batch_max=env_batch_max,
+        env_buffer_max=env_buffer_max,
+        env_history_dir=env_history_dir,
+        env_history_minutes=env_history_minutes,
+        env_history_samples=env_history_samples,
+        env_backfill_s=env_backfill_s,
+        env_backfill_batch_max=env_backfill_batch_max,
+        job_jitter=job_jitter,
+        latency_report_s=latency_report_s,
+        edge_trace_path=edge_trace_path,
+        metrics_addr=metrics_addr,
     )
 
 
-class DHT11Monitor:
-    def __init__(self, settings: Settings):
+class PeriodicJob:
+    """Run ``fn`` every ``interval_s`` on a worker pool, driven by the timer thread.
+
+    Each deadline is pushed back or forward by up to ``jitter`` of the interval
+    so stations started together do not hit FLSS in lockstep. A run never
+    overlaps the previous one: if it is still going at the next deadline that
+    tick is skipped, and a run that exceeds ``timeout_s`` is reported once.
+    Python threads cannot be cancelled, so the job's own I/O timeouts are what
+    actually bound it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[], None],
+        *,
+        interval_s: float,
+        timeout_s: float,
+        jitter: float,
+        scheduler: TimerScheduler,
+        executor: ThreadPoolExecutor,
+    ) -> None:
+        self.name = name
+        self.fn = fn
+        self.interval_s = interval_s
+        self.timeout_s = timeout_s
+        self.jitter = max(0.0, min(0.5, jitter))
+        self.scheduler = scheduler
+        self.executor = executor
+        self._lock = threading.Lock()
+        self._timer: TimerHandle | None = None
+        self._future: Future | None = None
+        self._started_at = 0.0
+        self._stopped = False
+        self.runs = 0
+        self.skipped = 0
+        self.overruns = 0
+
+    def start(self, first_delay_s: float = 0.0) -> None:
+        with self._lock:
+            self._stopped = False
+            self._timer = self.scheduler.call_later(first_delay_s, self._due)
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopped = True
+            if self._timer is not None:
+                self._timer.cancel()
+
+    def _next_delay(self) -> float:
+        return self.interval_s * (1.0 + random.uniform(-self.jitter, self.jitter))
+
+    def _due(self) -> None:
+        with self._lock:
+            if self._stopped:
+                return
+            if self._future is not None and not self._future.done():
+                self.skipped += 1
+            else:
+                self._started_at = time.monotonic()
+                self._future = self.executor.submit(self._run_once)
+                self.scheduler.call_later(self.timeout_s, self._check_timeout, self._future)
+            self._timer = self.scheduler.call_later(self._next_delay(), self._due)
+
+    def _run_once(self) -> None:
+        try:
+            self.fn()
+        except Exception as exc:
+            print(f"[ERR] {self.name} job failed: {exc}")
+        finally:
+            self.runs += 1
+
+    def _check_timeout(self, future: Future) -> None:
+        if not future.done():
+            self.overruns += 1
+            print(f"[WARN] {self.name} job still running after {self.timeout_s:g}s")
+
+
+class TelemetryUplink:
+    """Single pipeline for environment readings leaving the Pi.
+
+    Producers call ``offer``. A reading is buffered only when temperature or
+    humidity moved past the deadband, the status changed, or
+    ``env_max_interval_s`` passed since the last buffered reading from that
+    source. One thread uploads the buffer as a ``readings`` batch to
+    ``/dispatch/environment`` over the client's pooled session once the oldest
+    entry has waited ``env_flush_s``. Keep-alive and status-change readings are
+    sent straight away so the server never marks the station stale. Failed
+    uploads stay buffered, up to ``env_buffer_max`` readings.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        send: Callable[[dict[str, object]], tuple[int, object]],
+        on_delivered: Callable[[], None] | None = None,
+    ) -> None:
         self.settings = settings
-        self.flss_base_url = settings.base_url.rstrip("/")
-        self.station_id = settings.station_id
-        self.interval_s = max(1.0, settings.dht_interval_s)
-        self.pin = settings.dht_pin
-        self.request_timeout_s = settings.request_timeout_s
-
-        self.dht = None
-        self.last: dict[str, float] | None = None
-        self.last_ok_ts: datetime | None = None
-        self.read_errors = 0
-        self._stop = threading.Event()
+        self._send = send
+        self._on_delivered = on_delivered
+        # (buffered_at, reading); the head's timestamp drives the flush timer.
+        self._buffer: deque[tuple[float, dict[str, object]]] = deque(maxlen=settings.env_buffer_max)
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._urgent = False
+        self._last_by_source: dict[str, tuple[float, dict[str, object]]] = {}
         self._thread: threading.Thread | None = None
-        self._last_sent_status: str | None = None
+        self.offered = 0
+        self.buffered = 0
+        self.uploads = 0
+        self.dropped = 0
 
     def start(self) -> None:
-        if not self.settings.dht_enabled:
-            print("[INFO] DHT11 monitor disabled by DHT11_ENABLED=0")
-            return
+        self._thread = threading.Thread(target=self._run, name="rotary-telemetry", daemon=True)
+        self._thread.start()
 
-        if adafruit_dht is None or board is None:
-            print("[WARN] DHT11 monitor unavailable: install adafruit-circuitpython-dht and libgpiod2")
-            return
+    def stop(self, timeout_s: float = 2.0) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout_s)
 
-        board_pin = getattr(board, f"D{self.pin}", None)
-        if board_pin is None:
-            print(f"[WARN] DHT11 monitor disabled: unsupported board pin D{self.pin}")
-            return
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._buffer)
+
+    def offer(self, source: str, reading: dict[str, object]) -> bool:
+        """Buffer ``reading`` if it is worth sending; return whether it was kept."""
+        now = time.monotonic()
+        with self._cond:
+            self.offered += 1
+            previous = self._last_by_source.get(source)
+            keepalive = previous is not None and now - previous[0] >= self.settings.env_max_interval_s
+            status_changed = previous is None or previous[1].get("status") != reading.get("status")
+            if not (keepalive or status_changed or self._moved(previous[1], reading)):
+                return False
+            self._last_by_source[source] = (now, reading)
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append((now, reading))
+            self.buffered += 1
+            if keepalive or status_changed or len(self._buffer) >= self.settings.env_batch_max:
+                self._urgent = True
+                self._cond.notify()
+        return True
+
+    def _moved(self, previous: dict[str, object], reading: dict[str, object]) -> bool:
+        for key, deadband in (
+            ("temperatureC", self.settings.env_deadband_temp_c),
+            ("humidityPct", self.settings.env_deadband_humidity_pct),
+        ):
+            before, after = previous.get(key), reading.get(key)
+            if (before is None) != (after is None):
+                return True
+            if before is not None and abs(float(after) - float(before)) >= deadband:
+                return True
+        return False
+
+    def _run(self) -> None:
+        retry_at = 0.0
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    now = time.monotonic()
+                    if self._buffer and now >= retry_at:
+                        oldest_at = self._buffer[0][0]
+                        if self._urgent or now - oldest_at >= self.settings.env_flush_s:
+                            break
+                        self._cond.wait(oldest_at + self.settings.env_flush_s - now)
+                    elif self._buffer:
+                        self._cond.wait(retry_at - now)
+                    else:
+                        self._cond.wait()
+                if self._stopped and not self._buffer:
+                    return
+                batch = [self._buffer[index][1] for index in range(min(len(self._buffer), self.settings.env_batch_max))]
+                evicted_before = self.dropped
+                self._urgent = False
+                stopping = self._stopped
+
+            if self._upload(batch):
+                retry_at = 0.0
+                with self._cond:
+                    # Readings offered during the upload may have evicted part of the batch from the
+                    # head of a full buffer; only the sent entries still there are removed.
+                    still_buffered = max(0, len(batch) - (self.dropped - evicted_before))
+                    for _ in range(min(still_buffered, len(self._buffer))):
+                        self._buffer.popleft()
+                    # Drain a backlog left by an outage in consecutive batches.
+                    self._urgent = bool(self._buffer)
+            else:
+                retry_at = time.monotonic() + self.settings.env_flush_s
+            if stopping:
+                return
 
+    def _upload(self, batch: list[dict[str, object]]) -> bool:
         try:
-            self.dht = adafruit_dht.DHT11(board_pin, use_pulseio=False)
-        except TypeError:
-            self.dht = adafruit_dht.DHT11(board_pin)
-        except Exception as exc:
-            print(f"[WARN] DHT11 init failed: {exc}")
-            self.dht = None
-            return
+            status, data = self._send(
+                {
+                    "readings": batch,
+                    "remoteId": self.settings.remote_id,
+                    "firmware": self.settings.firmware_version,
+                }
+            )
+        except requests.RequestException as exc:
+            print(f"[NET] environment: {exc} ({len(batch)} readings buffered)")
+            return False
+        if status >= 500 or status in (401, 403, 404):
+            print(f"[WARN] environment HTTP {status}: {data}")
+            return False
+        if status != 200:
+            # The batch itself is invalid; retrying would fail the same way.
+            print(f"[WARN] environment HTTP {status}: {data} (dropped {len(batch)} readings)")
+            return True
+        self.uploads += 1
+        if self._on_delivered is not None:
+            self._on_delivered()
+        latest = batch[-1]
+        print(
+            f"[OK] environment telemetry sent: {len(batch)} readings "
+            f"(latest temp={latest.get('temperatureC')} humidity={latest.get('humidityPct')} "
+            f"status={latest.get('status')})"
+        )
+        return True
+
+
+class SensorCoprocess:
+    """Long-lived ``ENV_SENSOR_CMD`` that prints one JSON sample per line.
+
+    One supervisor thread starts the command, reads its stdout incrementally
+    through ``selectors`` and keeps the newest parsed sample. The command is
+    restarted with exponential backoff when it exits, and killed and restarted
+    when it prints nothing for ``stall_s``. ``latest`` returns an empty sample
+    once the newest one is older than ``stall_s``, so stale values are never
+    reported as current.
+    """
 
-        self._thread = threading.Thread(target=self._run, daemon=True)
+    def __init__(self, args: list[str], *, stall_s: float, parse: Callable[[str], dict[str, float | None]]) -> None:
+        self.args = args
+        self.stall_s = stall_s
+        self._parse = parse
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._proc: subprocess.Popen | None = None
+        self._sample: dict[str, float | None] = {}
+        self._sample_at = 0.0
+        self.samples = 0
+        self.restarts = 0
+        self.stalls = 0
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="rotary-sensor", daemon=True)
         self._thread.start()
-        print(f"[INFO] DHT11 monitor started on GPIO{self.pin} at {self.interval_s:.1f}s interval")
 
-    def stop(self) -> None:
+    def stop(self, timeout_s: float = 2.0) -> None:
         self._stop.set()
-        if self.dht is not None:
+        self._terminate()
+        if self._thread is not None:
+            self._thread.join(timeout_s)
+
+    def latest(self) -> dict[str, float | None]:
+        with self._lock:
+            if not self._sample or time.monotonic() - self._sample_at > self.stall_s:
+                return {}
+            return dict(self._sample)
+
+    def _run(self) -> None:
+        backoff_s = 1.0
+        while not self._stop.is_set():
+            started_at = time.monotonic()
             try:
-                self.dht.exit()
-            except Exception:
-                pass
+                self._proc = subprocess.Popen(self.args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, bufsize=0)
+            except Exception as exc:
+                print(f"[WARN] ENV_SENSOR_CMD failed to start: {exc}")
+            else:
+                print(f"[INFO] ENV_SENSOR_CMD streaming (pid {self._proc.pid})")
+                self._read_until_exit(self._proc)
+                self._terminate()
+                self._proc.stdout.close()
+            if self._stop.is_set():
+                return
+            # A process that ran for a while gets a fast restart; a crash loop backs off.
+            if time.monotonic() - started_at > 60.0:
+                backoff_s = 1.0
+            self.restarts += 1
+            print(f"[WARN] ENV_SENSOR_CMD stopped; restarting in {backoff_s:.0f}s")
+            self._stop.wait(backoff_s)
+            backoff_s = min(30.0, backoff_s * 2)
+
+    def _read_until_exit(self, proc: subprocess.Popen) -> None:
+        fd = proc.stdout.fileno()
+        pending = b""
+        with selectors.DefaultSelector() as selector:
+            selector.register(fd, selectors.EVENT_READ)
+            last_data_at = time.monotonic()
+            while not self._stop.is_set():
+                if not selector.select(timeout=min(1.0, self.stall_s)):
+                    if time.monotonic() - last_data_at > self.stall_s:
+                        self.stalls += 1
+                        print(f"[WARN] ENV_SENSOR_CMD silent for {self.stall_s:g}s; killing it")
+                        return
+                    continue
+                chunk = os.read(fd, 4096)
+                if not chunk:
+                    return
+                last_data_at = time.monotonic()
+                pending += chunk
+                *lines, pending = pending.split(b"\n")
+                for raw in lines:
+                    self._handle_line(raw)
+                if len(pending) > 65536:
+                    print("[WARN] ENV_SENSOR_CMD line too long; discarding")
+                    pending = b""
+
+    def _handle_line(self, raw: bytes) -> None:
+        line = raw.decode("utf-8", errors="replace").strip()
+        if not line:
+            return
+        sample = self._parse(line)
+        if not sample:
+            return
+        with self._lock:
+            self._sample = sample
+            self._sample_at = time.monotonic()
+            self.samples += 1
+
+    def _terminate(self) -> None:
+        proc = self._proc
+        if proc is None or proc.poll() is not None:
+            return
+        proc.terminate()
+        try:
+            proc.wait(timeout=2.0)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+class EnvironmentMonitor:
+    """Every configured environment sensor, polled by one ``SensorPoller`` thread.
+
+    Each attempt offers the sensor's latest reading to the uplink under its
+    sensor id, tagged with ``sensorId``. Good readings also go into that
+    sensor's history (``ENV_HISTORY_DIR/<id>.bin``) for backfill. A caller
+    that already runs a poller passes it in and routes its results to
+    ``on_result``; ``start``/``stop`` then leave the poller alone.
+    """
+
+    def __init__(self, settings: Settings, uplink: TelemetryUplink, poller: SensorPoller | None = None):
+        self.settings = settings
+        self.uplink = uplink
+        self.station_id = settings.station_id
+        self._owns_poller = poller is None
+        if poller is None:
+            poller = SensorPoller(list(settings.sensors), self.on_result, workers=settings.sensor_workers)
+        self.poller = poller
+        self.histories: dict[str, SensorHistory] = {}
+        if settings.env_history_minutes:
+            for spec in poller.specs:
+                path = os.path.join(settings.env_history_dir, f"{spec.id}.bin") if settings.env_history_dir else ""
+                history = SensorHistory(
+                    path,
+                    samples=settings.env_history_samples,
+                    minutes=settings.env_history_minutes,
+                )
+                restored = history.load()
+                if restored:
+                    print(f"[INFO] restored {restored} unsent minute(s) of {spec.id} history from {path}")
+                self.histories[spec.id] = history
+
+    def start(self) -> None:
+        if not self._owns_poller:
+            return
+        if not self.poller.specs:
+            print("[INFO] environment sensors disabled (DHT11_ENABLED=0 and no SENSORS)")
+            return
+        self.poller.start_thread()
+        listed = ", ".join(f"{spec.id} ({spec.driver}, {spec.interval_s:g}s)" for spec in self.poller.specs)
+        print(f"[INFO] sensor poller started: {listed}; {self.poller.workers} read worker(s)")
 
-    def get_cached(self) -> dict[str, object]:
-        status = self._calc_status()
+    def stop(self) -> None:
+        if self._owns_poller:
+            self.poller.stop()
+            self.poller.join()
+        for history in self.histories.values():
+            history.close()
+
+    def reading(self, state: SensorState) -> dict[str, object]:
+        last = state.last
+        last_ok = datetime.fromtimestamp(state.last_ok_at, timezone.utc) if state.last_ok_at else None
         return {
             "stationId": self.station_id,
+            "sensorId": state.id,
             "timestamp": datetime.now(timezone.utc).isoformat(),
-            "temperatureC": self.last["temperatureC"] if self.last else None,
-            "humidityPct": self.last["humidityPct"] if self.last else None,
-            "lastUpdated": self.last_ok_ts.isoformat() if self.last_ok_ts else None,
-            "status": status,
-            "readErrorsSinceBoot": self.read_errors,
+            "temperatureC": last["temp_c"] if last else None,
+            "humidityPct": last["humidity"] if last else None,
+            "lastUpdated": last_ok.isoformat() if last_ok else None,
+            "status": self._calc_status(state),
+            "readErrorsSinceBoot": state.sampler.read_errors + state.sampler.timeouts,
         }
 
-    def _calc_status(self) -> str:
-        if not self.last_ok_ts:
+    @staticmethod
+    def _calc_status(state: SensorState) -> str:
+        if not state.last_ok_at:
             return "offline"
-        age_s = (datetime.now(timezone.utc) - self.last_ok_ts).total_seconds()
-        if age_s < 15:
+        age_s = time.time() - state.last_ok_at
+        # A slow sensor is not stale just because its interval is longer than the old 5s DHT poll.
+        if age_s < max(15.0, 3 * state.interval.max_s):
             return "ok"
-        if age_s < 60:
+        if age_s < max(60.0, 6 * state.interval.max_s):
             return "degraded"
         return "offline"
 
-    def _post(self, payload: dict[str, object]) -> None:
+    def on_result(self, state: SensorState, payload: dict[str, float] | None) -> None:
+        # Runs on the poller's thread (or loop) after every attempt.
+        history = self.histories.get(state.id)
+        if payload is not None and history is not None:
+            history.record(payload["temp_c"], payload["humidity"])
+        # The uplink drops readings inside the deadband, so offering every attempt is cheap.
+        self.uplink.offer(state.id, self.reading(state))
+        if history is not None:
+            # Close the minute even when reads keep failing, so its rollup is not held back.
+            history.flush()
+
+
+@dataclass
+class QueuedAction:
+    action: str
+    idempotency_key: str
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # monotonic_ns of the GPIO edge that produced the action, and of its enqueue.
+    edge_ns: int = 0
+    enqueued_ns: int = field(default_factory=time.monotonic_ns)
+    # Signed lines for a batched rotation are sent as ``steps`` (always positive; the action gives the direction).
+    steps: int = 1
+    # Set by RetryJournal once a delivery has failed.
+    attempts: int = 0
+    expires_at: float = 0.0
+    # Already applied to the local dispatch mirror (and flashed green) when it was queued.
+    optimistic: bool = False
+
+
+class ActionDispatcher:
+    """Bounded FIFO of remote actions drained by a fixed pool of sender threads.
+
+    GPIO callbacks only call ``submit`` (a non-blocking ``put_nowait``); the HTTP
+    round trips happen on the worker threads, so a slow FLSS host delays feedback
+    but never stalls edge handling.
+    """
+
+    def __init__(self, deliver: Callable[[QueuedAction], None], *, max_in_flight: int, max_queue: int) -> None:
+        self._deliver = deliver
+        self._queue: queue.Queue[QueuedAction | None] = queue.Queue(maxsize=max_queue)
+        self._workers: list[threading.Thread] = []
+        self._max_in_flight = max(1, max_in_flight)
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.in_flight = 0
+        self.latency_by_action: dict[str, dict[str, float]] = {}
+
+    def start(self) -> None:
+        for index in range(self._max_in_flight):
+            worker = threading.Thread(target=self._run, name=f"rotary-action-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout_s: float = 2.0) -> None:
+        for _ in self._workers:
+            try:
+                self._queue.put(None, timeout=timeout_s)
+            except queue.Full:
+                break
+        deadline = time.monotonic() + timeout_s
+        for worker in self._workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+
+    def submit(self, item: QueuedAction) -> bool:
         try:
-            response = requests.post(
-                f"{self.flss_base_url}/environment/ingest",
-                json=payload,
-                timeout=self.request_timeout_s,
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            print(f"[WARN] action queue full; dropped {item.action}")
+            return False
+        with self._stats_lock:
+            self.submitted += 1
+        return True
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict[str, object]:
+        with self._stats_lock:
+            return {
+                "queueDepth": self._queue.qsize(),
+                "inFlight": self.in_flight,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "dropped": self.dropped,
+                "latencyByAction": {action: dict(values) for action, values in self.latency_by_action.items()},
+            }
+
+    def _record(self, action: str, queued_ms: float, total_ms: float) -> None:
+        with self._stats_lock:
+            self.completed += 1
+            entry = self.latency_by_action.setdefault(
+                action, {"count": 0, "lastMs": 0.0, "avgMs": 0.0, "maxMs": 0.0, "lastQueuedMs": 0.0}
             )
-            if response.status_code >= 300:
-                print(f"[WARN] DHT11 telemetry HTTP {response.status_code}: {response.text}")
-        except Exception:
-            # Keep the main controller resilient during network failures.
-            pass
+            entry["count"] += 1
+            entry["lastMs"] = total_ms
+            entry["lastQueuedMs"] = queued_ms
+            entry["avgMs"] += (total_ms - entry["avgMs"]) / entry["count"]
+            entry["maxMs"] = max(entry["maxMs"], total_ms)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            started_at = time.monotonic()
+            with self._stats_lock:
+                self.in_flight += 1
+            try:
+                self._deliver(item)
+            except Exception as exc:
+                # A failing delivery must never kill the worker.
+                print(f"[ERR] {item.action}: dispatch failed: {exc}")
+            finally:
+                finished_at = time.monotonic()
+                with self._stats_lock:
+                    self.in_flight -= 1
+                self._record(
+                    item.action,
+                    (started_at - item.enqueued_at) * 1000.0,
+                    (finished_at - item.enqueued_at) * 1000.0,
+                )
+
+
+LED_PRIORITY_OK = 0
+LED_PRIORITY_STATE = 1
+LED_PRIORITY_ERROR = 2
+
+RED = (1.0, 0.0, 0.0)
+GREEN = (0.0, 1.0, 0.0)
+BLUE = (0.0, 0.0, 1.0)
+
+
+class TimerHandle:
+    __slots__ = ("when", "callback", "args", "cancelled")
+
+    def __init__(self, when: float, callback: Callable[..., None], args: tuple) -> None:
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class TimerScheduler:
+    """Single thread that runs short callbacks at monotonic deadlines.
+
+    Deadlines live in a heap, so LED flashes and switch click/hold windows cost
+    one heap entry each instead of a sleeping thread. Cancelled handles stay in
+    the heap and are skipped when they come due. Callbacks run on the scheduler
+    thread and must not block; anything slow belongs on the action dispatcher.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, int, TimerHandle]] = []
+        self._counter = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="rotary-timers", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout_s: float = 1.0) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout_s)
+
+    def call_later(self, delay_s: float, callback: Callable[..., None], *args) -> TimerHandle:
+        handle = TimerHandle(time.monotonic() + max(0.0, delay_s), callback, args)
+        with self._cond:
+            self._counter += 1
+            heapq.heappush(self._heap, (handle.when, self._counter, handle))
+            # Only wake the thread when the new deadline is now the earliest one.
+            if self._heap[0][2] is handle:
+                self._cond.notify()
+        return handle
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(1 for _, _, handle in self._heap if not handle.cancelled)
 
     def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                if self._stopped:
+                    return
+                _, _, handle = heapq.heappop(self._heap)
+            if handle.cancelled:
+                continue
+            try:
+                handle.callback(*handle.args)
+            except Exception as exc:
+                print(f"[ERR] timer callback {getattr(handle.callback, '__name__', handle.callback)} failed: {exc}")
+
+
+class TokenBucket:
+    """Request budget of ``rate_per_s`` tokens per second, saving up to ``burst``.
+
+    ``reserve`` always takes a token and returns how long the caller must wait
+    for it. Work over budget is delayed, not discarded. ``wait_s`` only peeks.
+    """
+
+    def __init__(self, rate_per_s: float, burst: float) -> None:
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_s)
+        self._updated = now
+
+    def wait_s(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (1.0 - self._tokens) / self.rate_per_s)
+
+    def reserve(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1.0
+            return max(0.0, -self._tokens / self.rate_per_s)
+
+    def refund(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1.0)
+
+
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class RetryJournal:
+    """Bounded set of failed actions waiting to be re-sent with their original idempotency key.
+
+    Each retry is a timer on the client's scheduler. The delay doubles per
+    attempt (with +/-20% jitter) up to ``max_delay_s``. An action is given up
+    once its next attempt would land after ``expiry_s`` from the first try,
+    and at most ``capacity`` actions wait at once. The server dedupes on the
+    key, so a retry of a request that did land is answered without being
+    applied twice.
+
+    Press order is kept: while a retry is outstanding, the dispatcher parks
+    every later action behind it (``hold``). Once the retried action is
+    delivered the parked ones are sent one at a time, oldest first; if it is
+    given up they are discarded, because they were meant to follow it.
+    """
+
+    def __init__(
+        self,
+        scheduler: TimerScheduler,
+        resubmit: Callable[[QueuedAction], object],
+        *,
+        capacity: int,
+        base_s: float,
+        max_delay_s: float,
+        expiry_s: float,
+    ) -> None:
+        self.scheduler = scheduler
+        self.resubmit = resubmit
+        self.capacity = capacity
+        self.base_s = base_s
+        self.max_delay_s = max_delay_s
+        self.expiry_s = expiry_s
+        self._pending: dict[str, tuple[QueuedAction, TimerHandle]] = {}
+        # The action every later one waits behind, and the later ones in press order.
+        self._blocking: QueuedAction | None = None
+        self._held: deque[QueuedAction] = deque()
+        self._lock = threading.Lock()
+        self.retried = 0
+        self.recovered = 0
+        self.expired = 0
+        self.overflowed = 0
+        self.discarded = 0
+
+    def hold(self, item: QueuedAction) -> bool | None:
+        """Park ``item`` behind an outstanding retry.
+
+        Returns ``None`` when nothing is outstanding (send it now), ``True`` when
+        it was parked, and ``False`` when the journal is full and it must be dropped.
+        """
+        with self._lock:
+            if self._blocking is None or self._blocking is item:
+                return None
+            if len(self._held) >= self.capacity:
+                self.overflowed += 1
+                return False
+            self._held.append(item)
+            return True
+
+    def schedule(self, item: QueuedAction) -> float | None:
+        """Queue another attempt; returns its delay, or ``None`` if the action is given up."""
+        now = time.monotonic()
+        if not item.expires_at:
+            item.expires_at = item.enqueued_at + self.expiry_s
+        delay_s = min(self.max_delay_s, self.base_s * (2 ** item.attempts)) * random.uniform(0.8, 1.2)
+        with self._lock:
+            if now + delay_s > item.expires_at:
+                self.expired += 1
+                return None
+            if len(self._pending) >= self.capacity:
+                self.overflowed += 1
+                return None
+            item.attempts += 1
+            self.retried += 1
+            self._pending[item.idempotency_key] = (item, self.scheduler.call_later(delay_s, self._fire, item))
+            if self._blocking is None:
+                self._blocking = item
+        return delay_s
+
+    def settle(self, item: QueuedAction, delivered: bool) -> list[QueuedAction]:
+        """Record ``item``'s final outcome; returns the parked actions discarded because it failed."""
+        release = None
+        discarded: list[QueuedAction] = []
+        with self._lock:
+            if delivered and item.attempts:
+                self.recovered += 1
+            if item is not self._blocking:
+                return discarded
+            if delivered and self._held:
+                # The next parked action becomes the one the rest wait behind.
+                release = self._blocking = self._held.popleft()
+            else:
+                self._blocking = None
+                discarded = list(self._held)
+                self._held.clear()
+                self.discarded += len(discarded)
+        if release is not None:
+            self._requeue(release)
+        return discarded
+
+    def _fire(self, item: QueuedAction) -> None:
+        with self._lock:
+            if self._pending.pop(item.idempotency_key, None) is None:
+                return
+        self._requeue(item)
+
+    def _requeue(self, item: QueuedAction) -> None:
+        # Re-enter the normal queue; the queue stage is timed from here, the total from the edge.
+        item.enqueued_at = time.monotonic()
+        item.enqueued_ns = time.monotonic_ns()
+        self.resubmit(item)
+
+    def clear(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            held = len(self._held)
+            self._held.clear()
+            self._blocking = None
+        for _item, handle in pending.values():
+            handle.cancel()
+        return len(pending) + held
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "held": len(self._held),
+                "retried": self.retried,
+                "recovered": self.recovered,
+                "expired": self.expired,
+                "overflowed": self.overflowed,
+                "discarded": self.discarded,
+            }
+
+
+class LedFeedback:
+    """Colour flashes on the RGB LED, scheduled on the shared timer thread.
+
+    A flash pre-empts whatever is showing unless the current flash has a higher
+    priority and is still lit, so a red error is not immediately painted over
+    by the green of the next successful action. Only the newest flash may turn
+    the LED off.
+    """
+
+    def __init__(self, led: RGBLED, scheduler: TimerScheduler, default_s: float) -> None:
+        self.led = led
+        self.scheduler = scheduler
+        self.default_s = default_s
+        self._lock = threading.Lock()
+        self._priority = -1
+        self._off_timer: TimerHandle | None = None
+        self._generation = 0
+        self.preempted = 0
+        self.suppressed = 0
+
+    def flash(
+        self,
+        color: tuple[float, float, float],
+        duration_s: float | None = None,
+        priority: int = LED_PRIORITY_OK,
+    ) -> bool:
+        with self._lock:
+            if self._off_timer is not None:
+                if priority < self._priority:
+                    self.suppressed += 1
+                    return False
+                self._off_timer.cancel()
+                self.preempted += 1
+            self._priority = priority
+            self._generation += 1
+            self.led.color = color
+            self._off_timer = self.scheduler.call_later(
+                duration_s if duration_s is not None else self.default_s, self._expire, self._generation
+            )
+        return True
+
+    def off(self) -> None:
+        with self._lock:
+            if self._off_timer is not None:
+                self._off_timer.cancel()
+            self._off_timer = None
+            self._priority = -1
+            self._generation += 1
+            self.led.off()
+
+    def _expire(self, generation: int) -> None:
+        with self._lock:
+            # The timer may already have been popped when a newer flash cancelled it.
+            if generation != self._generation:
+                return
+            self._off_timer = None
+            self._priority = -1
+            self.led.off()
+
+
+class RemoteSocket:
+    """Long-lived, authenticated ``/ws/controller`` connection for remote commands.
+
+    ``request`` sends ``{"type", "id", "body"}`` and waits for the server's
+    ``remote-result`` carrying the same id (the idempotency key). It returns
+    ``None`` immediately while the socket is down, and after
+    ``request_timeout_s`` without a reply, so the caller can fall back to HTTP.
+    The server drops a repeated idempotency key, so a late socket reply plus
+    an HTTP retry cannot apply an action twice. One thread owns the connection,
+    reconnects with backoff and routes replies to waiting senders.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.url = settings.remote_ws_url
+        self.token = settings.remote_token
+        self.timeout_s = settings.request_timeout_s
+        self._conn = None
+        self._send_lock = threading.Lock()
+        self._pending: dict[str, list] = {}
+        self._pending_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.requests = 0
+        self.fallbacks = 0
+        self.connects = 0
+
+    def start(self) -> None:
+        if ws_connect is None:
+            print("[WARN] ROTARY_TRANSPORT=ws needs the websockets package (>=12); using HTTP")
+            return
+        self._thread = threading.Thread(target=self._run, name="rotary-socket", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout_s: float = 2.0) -> None:
+        self._stop.set()
+        conn = self._conn
+        if conn is not None:
+            conn.close()
+        if self._thread is not None:
+            self._thread.join(timeout_s)
+
+    def is_connected(self) -> bool:
+        return self._conn is not None
+
+    def request(self, kind: str, request_id: str, body: dict[str, object]) -> tuple[int, object, float | None] | None:
+        conn = self._conn
+        if conn is None:
+            self.fallbacks += 1
+            return None
+        waiter: list = [threading.Event(), None]
+        with self._pending_lock:
+            self._pending[request_id] = waiter
+        try:
+            with self._send_lock:
+                conn.send(json.dumps({"type": kind, "id": request_id, "body": body}))
+            if not waiter[0].wait(self.timeout_s):
+                print(f"[NET] {kind} {request_id}: no WebSocket reply in {self.timeout_s:g}s; retrying over HTTP")
+        except Exception as exc:
+            print(f"[NET] {kind}: WebSocket send failed: {exc}")
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+        self.requests += 1
+        if waiter[1] is None:
+            self.fallbacks += 1
+        return waiter[1]
+
+    def _headers(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+    def _run(self) -> None:
+        backoff_s = 1.0
         while not self._stop.is_set():
             try:
-                temperature_c = self.dht.temperature if self.dht is not None else None
-                humidity_pct = self.dht.humidity if self.dht is not None else None
-                if temperature_c is not None and humidity_pct is not None:
-                    self.last = {
-                        "temperatureC": float(temperature_c),
-                        "humidityPct": float(humidity_pct),
-                    }
-                    self.last_ok_ts = datetime.now(timezone.utc)
-            except RuntimeError:
-                # DHT11 read errors are common; keep previous valid value.
-                self.read_errors += 1
-            except Exception:
-                self.read_errors += 1
+                conn = ws_connect(
+                    self.url,
+                    additional_headers=self._headers(),
+                    open_timeout=self.timeout_s,
+                    close_timeout=1.0,
+                )
+            except Exception as exc:
+                print(f"[NET] remote WebSocket connect failed: {exc}; HTTP until it is back")
+                self._stop.wait(backoff_s)
+                backoff_s = min(30.0, backoff_s * 2)
+                continue
+            try:
+                ready = json.loads(conn.recv(timeout=self.timeout_s))
+                if not (ready.get("channel") == "ready" and (ready.get("payload") or {}).get("remoteCommands")):
+                    print("[WARN] FLSS does not accept remote commands over WebSocket; staying on HTTP")
+                    conn.close()
+                    self._stop.wait(300.0)
+                    continue
+                try:
+                    # Single small frames each way; do not let Nagle hold them back.
+                    conn.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                except (AttributeError, OSError):
+                    pass
+                self._conn = conn
+                self.connects += 1
+                backoff_s = 1.0
+                print(f"[OK] remote WebSocket connected: {self.url}")
+                for raw in conn:
+                    self._route(raw)
+            except Exception as exc:
+                if not self._stop.is_set():
+                    print(f"[NET] remote WebSocket dropped: {exc}")
+            finally:
+                self._conn = None
+                conn.close()
+                self._fail_pending()
+            self._stop.wait(backoff_s)
+            backoff_s = min(30.0, backoff_s * 2)
+
+    def _route(self, raw: str | bytes) -> None:
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return
+        if message.get("channel") != "remote-result":
+            return
+        payload = message.get("payload") or {}
+        with self._pending_lock:
+            waiter = self._pending.get(str(payload.get("id")))
+        if waiter is not None:
+            waiter[1] = (int(payload.get("status") or 0), payload.get("body"), payload.get("serverTime"))
+            waiter[0].set()
+
+    def _fail_pending(self) -> None:
+        with self._pending_lock:
+            waiters = list(self._pending.values())
+        for waiter in waiters:
+            waiter[0].set()
+
+
+class DispatchMirror:
+    """Local copy of the FLSS dispatch selection and quantity prompt, fed by ``/dispatch/events``.
+
+    One thread holds the server-sent event stream open. Each ``ready`` and
+    ``state-change`` event replaces the confirmed state. The client asks
+    ``check`` before spending a request. It gets a reason back when the
+    server would reject the action (no order selected) or leave state
+    unchanged: rotating a queue by a whole lap, or decreasing a quantity
+    already at 0. ``begin`` applies an accepted action to the local view
+    straight away, using the server's own selection rules, so the next
+    prediction already sees it. ``settle`` retires it once the action is
+    answered.
+
+    While actions are outstanding, server events only update the confirmed
+    state. When the last one settles, the view is rebased onto it if the
+    server has spoken since, or if an action failed. Otherwise the view
+    stays as predicted until the server's event arrives. While the stream
+    is down nothing is predicted, and the client sends everything as before.
+    """
+
+    def __init__(self, settings: Settings, session: requests.Session) -> None:
+        self.url = f"{settings.base_url}/dispatch/events"
+        self.token = settings.rotary_token
+        self.timeout_s = settings.request_timeout_s
+        # An action still unsettled after this long was lost on the way; stop waiting for it.
+        self.pending_expiry_s = settings.retry_expiry_s + 2 * settings.request_timeout_s
+        self.session = session
+        self._lock = threading.Lock()
+        self._confirmed: dict[str, object] | None = None
+        self._view: dict[str, object] | None = None
+        self._server_rev = 0
+        # idempotency key -> (server revision when sent, monotonic time when sent)
+        self._pending: dict[str, tuple[int, float]] = {}
+        self._diverged = False
+        self._response = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.events = 0
+        self.connects = 0
+        self.suppressed = 0
+        self.predicted = 0
+        self.rebased = 0
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="rotary-dispatch-events", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout_s: float = 2.0) -> None:
+        self._stop.set()
+        response = self._response
+        # Closing the response would wait on the reader's buffer lock; shutting the socket ends its read.
+        sock = getattr(getattr(getattr(response, "raw", None), "connection", None), "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout_s)
+
+    def is_synced(self) -> bool:
+        return self._view is not None
+
+    # -- predictions ---------------------------------------------------------------
+
+    def check(self, action: str, steps: int = 1) -> str | None:
+        """Why ``action`` would be rejected or change nothing on the server, or ``None`` to send it."""
+        with self._lock:
+            if self._view is None:
+                return None
+            view = _copy_dispatch_view(self._view)
+        before = _copy_dispatch_view(view)
+        reason = _apply_dispatch_action(view, action, steps)
+        if reason is None and action in {"next", "prev", "qty_increase", "qty_decrease"} and view == before:
+            reason = "no change"
+        if reason is not None:
+            with self._lock:
+                self.suppressed += 1
+        return reason
+
+    def begin(self, key: str, action: str, steps: int = 1) -> bool:
+        """Apply ``action`` to the local view ahead of the server; ``False`` when not synced."""
+        with self._lock:
+            if self._view is None:
+                return False
+            _apply_dispatch_action(self._view, action, steps)
+            self._pending[key] = (self._server_rev, time.monotonic())
+            self.predicted += 1
+        return True
+
+    def settle(self, key: str, ok: bool, data: object = None) -> None:
+        """Retire an action begun with ``begin`` once FLSS answered it (or it was given up)."""
+        with self._lock:
+            sent = self._pending.pop(key, None)
+            if sent is None:
+                return
+            if not ok:
+                self._diverged = True
+            elif self._view is not None and isinstance(data, dict) and "selectedOrderId" in data:
+                # The reply carries the selection the server ended on; trust it over the prediction.
+                reply = (data.get("selectedOrderId"), data.get("selectedLineItemKey"))
+                if reply != (self._view["selectedOrderId"], self._view["selectedLineItemKey"]):
+                    self._view["selectedOrderId"], self._view["selectedLineItemKey"] = reply
+                    self._diverged = True
+            if not self._pending and (self._diverged or self._server_rev > sent[0]):
+                self._rebase()
+
+    def _rebase(self) -> None:
+        # Caller holds _lock.
+        if self._view is not None and self._confirmed is not None and self._view != self._confirmed:
+            self.rebased += 1
+        self._view = _copy_dispatch_view(self._confirmed) if self._confirmed is not None else None
+        self._diverged = False
+
+    def _apply_server_state(self, state: dict) -> None:
+        with self._lock:
+            self.events += 1
+            self._server_rev += 1
+            self._confirmed = _dispatch_view_from_state(state)
+            now = time.monotonic()
+            for key, (_rev, sent_at) in list(self._pending.items()):
+                if now - sent_at > self.pending_expiry_s:
+                    del self._pending[key]
+            if not self._pending:
+                self._rebase()
+
+    def _desync(self) -> None:
+        with self._lock:
+            self._confirmed = None
+            self._view = None
+            self._pending.clear()
+            self._diverged = False
+
+    # -- stream --------------------------------------------------------------------
+
+    def _run(self) -> None:
+        backoff_s = 1.0
+        headers = {"Accept": "text/event-stream"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        while not self._stop.is_set():
+            try:
+                # The server writes a keepalive comment every 15 s; a silent minute means the link is gone.
+                response = self.session.get(self.url, headers=headers, stream=True, timeout=(self.timeout_s, 60.0))
+            except requests.RequestException as exc:
+                print(f"[NET] dispatch events: {exc}; sending actions unpredicted until it is back")
+                self._stop.wait(backoff_s)
+                backoff_s = min(30.0, backoff_s * 2)
+                continue
+            if response.status_code != 200:
+                response.close()
+                print(f"[WARN] dispatch events: HTTP {response.status_code}; no local dispatch mirror")
+                self._stop.wait(300.0)
+                continue
+            self._response = response
+            self.connects += 1
+            backoff_s = 1.0
+            try:
+                self._read(response)
+            except Exception as exc:
+                if not self._stop.is_set():
+                    print(f"[NET] dispatch events dropped: {exc}")
+            finally:
+                self._response = None
+                response.close()
+                self._desync()
+            self._stop.wait(backoff_s)
+            backoff_s = min(30.0, backoff_s * 2)
+
+    def _read(self, response: requests.Response) -> None:
+        event, data = "message", []
+        # text/event-stream is always UTF-8; requests would otherwise assume ISO-8859-1.
+        response.encoding = "utf-8"
+        for line in response.iter_lines(chunk_size=1024, decode_unicode=True):
+            if self._stop.is_set():
+                return
+            if line:
+                if line.startswith(":"):
+                    continue
+                field_name, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field_name == "event":
+                    event = value
+                elif field_name == "data":
+                    data.append(value)
+                continue
+            if data:
+                self._dispatch(event, "\n".join(data))
+            event, data = "message", []
 
-            payload = self.get_cached()
-            status = str(payload["status"])
-            has_valid_sample = payload["temperatureC"] is not None and payload["humidityPct"] is not None
+    def _dispatch(self, event: str, raw: str) -> None:
+        if event not in {"ready", "state-change"}:
+            return
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return
+        state = payload.get("state") if isinstance(payload, dict) else None
+        if isinstance(state, dict):
+            if event == "ready":
+                print("[OK] dispatch events connected; mirroring selection and quantities locally")
+            self._apply_server_state(state)
+
+
+def _dispatch_view_from_state(state: dict) -> dict[str, object]:
+    line_items = state.get("lineItemKeysByOrderId") or {}
+    return {
+        "queueOrderIds": [str(order_id) for order_id in state.get("queueOrderIds") or []],
+        "lineItemKeysByOrderId": {str(order_id): list(keys or []) for order_id, keys in line_items.items()},
+        "selectedOrderId": state.get("selectedOrderId"),
+        "selectedLineItemKey": state.get("selectedLineItemKey"),
+        "quantityPromptOpen": bool(state.get("quantityPromptOpen")),
+        "quantityPromptTargetLineItemKey": state.get("quantityPromptTargetLineItemKey"),
+        "quantityPromptQty": state.get("quantityPromptQty"),
+    }
 
-            if has_valid_sample or self._last_sent_status != status:
-                self._post(payload)
-                self._last_sent_status = status
 
-            self._stop.wait(self.interval_s)
+def _copy_dispatch_view(view: dict[str, object]) -> dict[str, object]:
+    # The queue and line-item lists are only ever replaced, never mutated, so a shallow copy is enough.
+    return dict(view)
+
+
+# The helpers below follow src/services/dispatchController.js step for step; keep them in sync.
+
+
+def _line_items(view: dict, order_id: object) -> list:
+    return view["lineItemKeysByOrderId"].get(order_id) or [] if order_id else []
+
+
+def _select_index(view: dict, index: int) -> object:
+    queue_ids = view["queueOrderIds"]
+    if not queue_ids:
+        view["selectedOrderId"] = None
+        return None
+    view["selectedOrderId"] = queue_ids[index % len(queue_ids)]
+    keys = _line_items(view, view["selectedOrderId"])
+    view["selectedLineItemKey"] = keys[0] if keys else None
+    return view["selectedOrderId"]
+
+
+def _selected_index(view: dict) -> int:
+    selected = view["selectedOrderId"]
+    return view["queueOrderIds"].index(selected) if selected in view["queueOrderIds"] else -1
+
+
+def _ensure_selection(view: dict) -> None:
+    queue_ids = view["queueOrderIds"]
+    if not queue_ids:
+        view["selectedOrderId"] = None
+        return
+    if _selected_index(view) == -1:
+        view["selectedOrderId"] = queue_ids[0]
+    keys = _line_items(view, view["selectedOrderId"])
+    if not keys:
+        view["selectedLineItemKey"] = None
+    elif view["selectedLineItemKey"] not in keys:
+        view["selectedLineItemKey"] = keys[0]
+
+
+def _step_forward(view: dict) -> None:
+    keys = _line_items(view, view["selectedOrderId"])
+    position = keys.index(view["selectedLineItemKey"]) if view["selectedLineItemKey"] in keys else -1
+    if 0 <= position < len(keys) - 1:
+        view["selectedLineItemKey"] = keys[position + 1]
+        return
+    index = _selected_index(view)
+    _select_index(view, 0 if index == -1 else index + 1)
+
+
+def _step_backward(view: dict) -> None:
+    keys = _line_items(view, view["selectedOrderId"])
+    position = keys.index(view["selectedLineItemKey"]) if view["selectedLineItemKey"] in keys else -1
+    if position > 0:
+        view["selectedLineItemKey"] = keys[position - 1]
+        return
+    index = _selected_index(view)
+    order_id = _select_index(view, 0 if index == -1 else index - 1)
+    previous_keys = _line_items(view, order_id)
+    view["selectedLineItemKey"] = previous_keys[-1] if previous_keys else None
+
+
+def _apply_dispatch_action(view: dict, action: str, steps: int = 1) -> str | None:
+    """Apply ``action`` to ``view`` in place; returns why the server would refuse it, if it would."""
+    if action in {"next", "prev"}:
+        if view["queueOrderIds"]:
+            _ensure_selection(view)
+            for _ in range(steps):
+                (_step_forward if action == "next" else _step_backward)(view)
+        return None
+    _ensure_selection(view)
+    if not view["selectedOrderId"]:
+        return "no order selected"
+    if action == "confirm_hold":
+        view["quantityPromptOpen"] = True
+        view["quantityPromptTargetLineItemKey"] = view["selectedLineItemKey"]
+        view["quantityPromptQty"] = None
+    elif action in {"qty_increase", "qty_decrease", "set_packed_qty"}:
+        target = view["quantityPromptTargetLineItemKey"] or view["selectedLineItemKey"]
+        if not target:
+            return "no line item selected"
+        qty = view["quantityPromptQty"]
+        current = float(qty) if isinstance(qty, (int, float)) and qty >= 0 else 0.0
+        if action == "set_packed_qty":
+            view["quantityPromptOpen"] = False
+            view["quantityPromptQty"] = current
+        else:
+            delta = steps if action == "qty_increase" else -steps
+            view["quantityPromptQty"] = max(0.0, round(current + delta, 3))
+        view["quantityPromptTargetLineItemKey"] = target
+    return None
 
 
 class RotaryFlssClient:
-    def __init__(self, settings: Settings, led: RGBLED) -> None:
+    def __init__(
+        self,
+        settings: Settings,
+        led: RGBLED,
+        *,
+        scheduler: TimerScheduler | None = None,
+        remote_socket: RemoteSocket | None = None,
+    ) -> None:
         self.settings = settings
         self.led = led
         self.session = requests.Session()
-        self.last_sent_at = 0.0
-        self.last_sent_by_action: dict[str, float] = {}
+        # Keep-alive pool sized to the dispatcher so concurrent senders reuse sockets.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(2, settings.action_max_in_flight + 1))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.action_nonce = 0
+        self.bucket = TokenBucket(settings.action_rate_per_s, settings.action_burst)
+        # Pending rotation: net signed lines, quantity mode, first edge, flush timer.
+        # Reentrant: rotations are handed on while it is held so they keep their order.
+        self._rotate_lock = threading.RLock()
+        self._rotate_lines = 0
+        self._rotate_qty_mode = False
+        self._rotate_edge_ns = 0
+        self._rotate_timer: TimerHandle | None = None
+        self._delayed_submits = 0
         self.lock = threading.Lock()
+        # Last time FLSS accepted anything from this remote; the server counts it as a heartbeat.
+        self.last_contact_at = 0.0
+        self.heartbeats_sent = 0
+        self.heartbeats_skipped = 0
+        # Final outcome per delivered action (retries settle once); read by /metrics.
+        self.outcomes = {"ok": 0, "deduped": 0, "conflict": 0, "auth": 0, "error": 0}
+        self.backfilled = 0
+        self.backfill_uploads = 0
+        self.latency = LatencyRecorder()
+        # The station runtime passes loop-backed timers and its own socket; standalone, both are built here.
+        self.scheduler = scheduler or TimerScheduler()
+        self.feedback = LedFeedback(led, self.scheduler, settings.led_feedback_s)
+        if remote_socket is None and settings.remote_transport == "ws":
+            remote_socket = RemoteSocket(settings)
+        self.remote_socket = remote_socket
+        # Own session: the event stream holds its connection for as long as it is open.
+        self.mirror = DispatchMirror(settings, requests.Session()) if settings.dispatch_mirror else None
+        self.telemetry = TelemetryUplink(
+            settings,
+            lambda payload: self._remote_call("remote-environment", "/dispatch/environment", payload),
+            on_delivered=self._mark_contact,
+        )
+        self.sensor_stream = self._build_sensor_stream()
+        self.dispatcher = ActionDispatcher(
+            self._deliver_action,
+            max_in_flight=settings.action_max_in_flight,
+            max_queue=settings.action_queue_size,
+        )
+        self.retries = RetryJournal(
+            self.scheduler,
+            self._resubmit,
+            capacity=settings.retry_capacity,
+            base_s=settings.retry_base_s,
+            max_delay_s=settings.retry_max_delay_s,
+            expiry_s=settings.retry_expiry_s,
+        )
+
+    def start(self) -> None:
+        self.scheduler.start()
+        if self.remote_socket is not None:
+            self.remote_socket.start()
+        if self.mirror is not None:
+            self.mirror.start()
+        self.dispatcher.start()
+        self.telemetry.start()
+        if self.sensor_stream is not None:
+            self.sensor_stream.start()
+
+    def close(self) -> None:
+        abandoned = self.retries.clear()
+        if abandoned:
+            print(f"[WARN] shutting down with {abandoned} action(s) still waiting to retry")
+        self.dispatcher.stop(timeout_s=self.settings.request_timeout_s)
+        self.telemetry.stop(timeout_s=self.settings.request_timeout_s)
+        if self.sensor_stream is not None:
+            self.sensor_stream.stop()
+        if self.remote_socket is not None:
+            self.remote_socket.stop()
+        if self.mirror is not None:
+            self.mirror.stop(timeout_s=1.0)
+            self.mirror.session.close()
+        self.feedback.off()
+        self.scheduler.stop()
+        self.session.close()
+
+    def _build_sensor_stream(self) -> SensorCoprocess | None:
+        if self.settings.env_sensor_mode != "stream" or not self.settings.env_sensor_cmd:
+            return None
+        try:
+            args = shlex.split(self.settings.env_sensor_cmd)
+        except ValueError as exc:
+            print(f"[WARN] ENV_SENSOR_CMD could not be parsed: {exc}")
+            return None
+        if not args:
+            return None
+        return SensorCoprocess(args, stall_s=self.settings.env_sensor_stall_s, parse=self._parse_sensor_output)
 
     def _read_env_sensor_sample(self) -> dict[str, float | None]:
         command = self.settings.env_sensor_cmd
@@ -330,7 +1799,9 @@ class RotaryFlssClient:
         if not stdout:
             print("[WARN] ENV_SENSOR_CMD returned empty stdout; expected JSON sample")
             return {}
+        return self._parse_sensor_output(stdout)
 
+    def _parse_sensor_output(self, stdout: str) -> dict[str, float | None]:
         try:
             payload = json.loads(stdout)
         except json.JSONDecodeError:
@@ -386,13 +1857,16 @@ class RotaryFlssClient:
                 pass
         return values
 
-    def _flash_led(self, color: tuple[float, float, float], duration_s: float | None = None) -> None:
-        def _worker() -> None:
-            self.led.color = color
-            time.sleep(duration_s if duration_s is not None else self.settings.led_feedback_s)
-            self.led.off()
+    def _flash_led(
+        self,
+        color: tuple[float, float, float],
+        duration_s: float | None = None,
+        priority: int = LED_PRIORITY_OK,
+    ) -> None:
+        self.feedback.flash(color, duration_s, priority)
 
-        threading.Thread(target=_worker, daemon=True).start()
+    def _mark_contact(self) -> None:
+        self.last_contact_at = time.monotonic()
 
     def _headers(self, token: str) -> dict[str, str]:
         headers = {"Content-Type": "application/json"}
@@ -414,6 +1888,41 @@ class RotaryFlssClient:
             timeout=self.settings.request_timeout_s,
         )
 
+    @staticmethod
+    def _response_data(response: requests.Response) -> object:
+        try:
+            return response.json()
+        except Exception:
+            return {"raw": response.text}
+
+    def _remote_call(
+        self,
+        kind: str,
+        path: str,
+        payload: dict[str, object],
+        request_id: str | None = None,
+        label: str | None = None,
+    ) -> tuple[int, object]:
+        """Send a remote command over the WebSocket when it is up, otherwise POST it to ``path``.
+
+        The round trip and, once the server clock offset is known, the one-way
+        send -> server time are recorded under ``label`` (default ``kind``).
+        Raises ``requests.RequestException`` only when the HTTP path fails.
+        """
+        label = label or kind
+        sent_ns, sent_wall_ns = time.monotonic_ns(), time.time_ns()
+        result = None
+        if self.remote_socket is not None:
+            result = self.remote_socket.request(kind, request_id or self._new_idempotency_key(kind), payload)
+        if result is not None:
+            status, data, server_ms = result
+        else:
+            response = self._post_json(path, payload, self.settings.remote_token)
+            status, data, server_ms = response.status_code, self._response_data(response), server_time_ms(response.headers)
+        self.latency.record(label, "rtt", time.monotonic_ns() - sent_ns)
+        self.latency.record_uplink(label, sent_wall_ns, time.time_ns(), server_ms)
+        return status, data
+
     def probe_auth(self) -> bool:
         """Check auth config early so Unauthorized errors are obvious before button presses."""
         url = f"{self.settings.base_url}/dispatch/remote/heartbeat"
@@ -431,12 +1940,13 @@ class RotaryFlssClient:
             )
         except requests.RequestException as exc:
             print(f"[NET] auth probe failed: {exc}")
-            self._flash_led((1.0, 0.0, 0.0), duration_s=0.5)
+            self._flash_led(RED, duration_s=0.5, priority=LED_PRIORITY_ERROR)
             return False
 
         if response.status_code == 200:
+            self._mark_contact()
             print("[OK] Auth probe passed.")
-            self._flash_led((0.0, 1.0, 0.0), duration_s=0.15)
+            self._flash_led(GREEN, duration_s=0.15)
             return True
 
         if response.status_code in (401, 403):
@@ -445,99 +1955,341 @@ class RotaryFlssClient:
                 f"HTTP {response.status_code}. Set REMOTE_TOKEN to match FLSS REMOTE_TOKEN "
                 "(or use the same value as ROTARY_TOKEN if REMOTE_TOKEN is unset)."
             )
-            self._flash_led((1.0, 0.0, 0.0), duration_s=0.6)
+            self._flash_led(RED, duration_s=0.6, priority=LED_PRIORITY_ERROR)
             return False
 
         print(f"[WARN] Auth probe got HTTP {response.status_code}; continuing anyway.")
-        self._flash_led((0.0, 0.0, 1.0), duration_s=0.4)
+        self._flash_led(BLUE, duration_s=0.4, priority=LED_PRIORITY_STATE)
         return True
 
-    def send_action(self, action: str, *, force: bool = False) -> None:
-        now = time.monotonic()
-        with self.lock:
-            if not force:
-                if now - self.last_sent_at < self.settings.min_action_gap_s:
-                    return
-                if action in {"next", "prev"}:
-                    last_for_action = self.last_sent_by_action.get(action, 0.0)
-                    if now - last_for_action < self.settings.min_action_gap_s:
-                        return
-                    opposite = "prev" if action == "next" else "next"
-                    last_opposite = self.last_sent_by_action.get(opposite, 0.0)
-                    if now - last_opposite < self.settings.min_action_gap_s:
-                        return
-            self.last_sent_at = now
-            self.last_sent_by_action[action] = now
+    def rotate(self, lines: int, quantity_mode: bool, edge_ns: int | None = None) -> None:
+        """Add signed encoder lines to the pending rotation; it is sent after ``rotate_window_s``."""
+        with self._rotate_lock:
+            pending = self._rotate_lines
+            # Like the daemon's encoder batch: a reversal or mode change must not cancel out earlier lines.
+            if pending and ((pending > 0) != (lines > 0) or quantity_mode != self._rotate_qty_mode):
+                self._send_rotation()
+            if not self._rotate_lines:
+                # A batched rotation is timed from the first detent that went into it.
+                self._rotate_edge_ns = edge_ns or time.monotonic_ns()
+            self._rotate_lines += lines
+            self._rotate_qty_mode = quantity_mode
+            if self._rotate_timer is None:
+                self._rotate_timer = self.scheduler.call_later(self.settings.rotate_window_s, self._flush_rotation_due)
+
+    def _flush_rotation_due(self) -> None:
+        with self._rotate_lock:
+            self._rotate_timer = None
+            if not self._rotate_lines:
+                return
+            wait_s = self.bucket.wait_s()
+            if wait_s > 0:
+                # Over budget: keep summing detents until a token is free instead of dropping any.
+                self._rotate_timer = self.scheduler.call_later(wait_s, self._flush_rotation_due)
+                return
+            self._send_rotation()
+
+    def flush_rotation(self) -> None:
+        """Send any pending rotation now, so it reaches FLSS before the press that follows it."""
+        with self._rotate_lock:
+            if self._rotate_timer is not None:
+                self._rotate_timer.cancel()
+                self._rotate_timer = None
+            if self._rotate_lines:
+                self._send_rotation()
+
+    def _send_rotation(self) -> None:
+        # Caller holds _rotate_lock.
+        lines, quantity_mode, edge_ns = self._rotate_lines, self._rotate_qty_mode, self._rotate_edge_ns
+        self._rotate_lines = 0
+        if quantity_mode:
+            action = "qty_increase" if lines > 0 else "qty_decrease"
+        else:
+            action = "next" if lines > 0 else "prev"
+        if self._known_noop(action, abs(lines)):
+            return
+        if self.settings.rotate_steps:
+            self._submit(action, edge_ns, self.bucket.reserve(), steps=abs(lines))
+        else:
+            # One request per line, so one token each.
+            for _ in range(abs(lines)):
+                self._submit(action, edge_ns, self.bucket.reserve())
+
+    def send_action(self, action: str, *, force: bool = False, edge_ns: int | None = None) -> None:
+        """Queue a press action behind any pending rotation, waiting for a request token if needed.
+
+        Presses are never dropped unless ``ROTARY_ACTION_MAX_WAIT_S`` is set: then one that would
+        wait longer than that is dropped, unless ``force``.
+        """
+        with self._rotate_lock:
+            self.flush_rotation()
+            if self._known_noop(action):
+                return
+            wait_s = self.bucket.reserve()
+            if self.settings.action_max_wait_s and wait_s > self.settings.action_max_wait_s and not force:
+                self.bucket.refund()
+                print(f"[WARN] {action}: over the request budget by {wait_s:.1f}s; dropped")
+                return
+            self._submit(action, edge_ns or time.monotonic_ns(), wait_s)
 
+    def _known_noop(self, action: str, steps: int = 1) -> bool:
+        """Skip an action the dispatch mirror knows FLSS would refuse or ignore, without spending a request."""
+        reason = self.mirror.check(action, steps) if self.mirror is not None else None
+        if reason is None:
+            return False
+        print(f"[STATE] {action}: not sent, {reason} (local dispatch state)")
+        self._flash_led(BLUE, priority=LED_PRIORITY_STATE)
+        return True
+
+    def _submit(self, action: str, edge_ns: int, wait_s: float, *, steps: int = 1) -> None:
+        item = QueuedAction(action=action, idempotency_key=self._new_idempotency_key(action), steps=steps)
+        item.edge_ns = edge_ns or item.enqueued_ns
+        self.latency.record(action, "input", item.enqueued_ns - item.edge_ns)
+        if self.mirror is not None and self.mirror.begin(item.idempotency_key, action, steps):
+            # Optimistic feedback; a 409 or an error still repaints the LED when the reply comes back.
+            item.optimistic = True
+            self._flash_led(GREEN)
+        if wait_s > 0:
+            with self._rotate_lock:
+                self._delayed_submits += 1
+            self.scheduler.call_later(wait_s, self._submit_delayed, item)
+        else:
+            self._hand_off(item)
+
+    def _submit_delayed(self, item: QueuedAction) -> None:
+        with self._rotate_lock:
+            self._delayed_submits -= 1
+        self._hand_off(item)
+
+    def _hand_off(self, item: QueuedAction) -> None:
+        if not self.dispatcher.submit(item) and item.optimistic:
+            self.mirror.settle(item.idempotency_key, False)
+
+    def _resubmit(self, item: QueuedAction) -> None:
+        # Retries and released actions already spent their request token.
+        if not self.dispatcher.submit(item):
+            self._settle_action(item, False, "error", None)
+
+    def pending_actions(self) -> int:
+        """Actions not yet handed to the dispatcher: a pending rotation, budget waits, retries and held actions."""
+        with self._rotate_lock:
+            waiting = self._delayed_submits + (1 if self._rotate_lines else 0)
+        retries = self.retries.stats()
+        return waiting + retries["pending"] + retries["held"]
+
+    def _deliver_action(self, item: QueuedAction) -> None:
+        action = item.action
         remote_payload = {
             "action": action,
             "remoteId": self.settings.remote_id,
-            "idempotencyKey": self._new_idempotency_key(action),
+            "idempotencyKey": item.idempotency_key,
             "source": self.settings.source,
+            "firmware": self.settings.firmware_version,
         }
-        legacy_payload = {"source": self.settings.source}
+        legacy_payload: dict[str, object] = {"source": self.settings.source}
+        if item.steps != 1:
+            remote_payload["steps"] = item.steps
+            legacy_payload["steps"] = item.steps
+
+        def latency() -> str:
+            retry = f" retry={item.attempts}" if item.attempts else ""
+            return f"{(time.monotonic() - item.enqueued_at) * 1000.0:.0f}ms depth={self.dispatcher.queue_depth()}{retry}"
+
+        retrying = False
+        delivered = False
+        outcome = "error"
+        data: object = None
+
+        def retry_later(reason: str) -> bool:
+            nonlocal retrying
+            delay_s = self.retries.schedule(item)
+            if delay_s is None:
+                return False
+            retrying = True
+            print(f"[NET] {action}: {reason}; retrying in {delay_s:.1f}s ({latency()})")
+            return True
+
+        held = self.retries.hold(item)
+        if held is not None:
+            # An earlier action is waiting to retry; this one must not overtake it.
+            if not held:
+                print(f"[WARN] {action}: retry journal full; dropped")
+                self._flash_led(RED, duration_s=0.5, priority=LED_PRIORITY_ERROR)
+                self._settle_action(item, False, "error", None)
+            return
 
+        self.latency.record(action, "queue", time.monotonic_ns() - item.enqueued_ns)
         try:
-            response = self._post_json(
+            status, data = self._remote_call(
+                "remote-action",
                 "/dispatch/remote/action",
                 remote_payload,
-                self.settings.remote_token,
+                item.idempotency_key,
+                label=action,
             )
-            if response.status_code in (404, 405, 500, 502, 503, 504) and self.settings.remote_legacy_fallback:
+            if status in (200, 409):
+                self._mark_contact()
+            # Only a server without the remote API gets the unkeyed legacy route; anything else is
+            # retried with the idempotency key, so a request that did land is never applied twice.
+            if status in (404, 405) and self.settings.remote_legacy_fallback:
                 response = self._post_json(
                     f"/dispatch/{action}",
                     legacy_payload,
                     self.settings.rotary_token,
                 )
-            try:
-                data = response.json()
-            except Exception:
-                data = {"raw": response.text}
-
-            if response.status_code == 200:
-                print(f"[OK] {action}: {data}")
-                self._flash_led((0.0, 1.0, 0.0))  # green
-            elif response.status_code in (401, 403):
-                print(f"[AUTH] {action}: HTTP {response.status_code} {data}")
-                self._flash_led((1.0, 0.0, 0.0), duration_s=0.5)  # red
-            elif response.status_code == 409:
-                print(f"[STATE] {action}: HTTP 409 {data}")
-                self._flash_led((0.0, 0.0, 1.0))  # blue
+                status, data = response.status_code, self._response_data(response)
+
+            if status == 200:
+                delivered = True
+                outcome = "deduped" if isinstance(data, dict) and data.get("deduped") else "ok"
+                print(f"[OK] {action}: {data} ({latency()})")
+                if not item.optimistic:
+                    self._flash_led(GREEN)
+            elif status in (401, 403):
+                outcome = "auth"
+                print(f"[AUTH] {action}: HTTP {status} {data} ({latency()})")
+                self._flash_led(RED, duration_s=0.5, priority=LED_PRIORITY_ERROR)
+            elif status == 409:
+                outcome = "conflict"
+                print(f"[STATE] {action}: HTTP 409 {data} ({latency()})")
+                self._flash_led(BLUE, priority=LED_PRIORITY_STATE)
+            elif status in RETRYABLE_STATUSES and retry_later(f"HTTP {status}"):
+                return
             else:
-                print(f"[ERR] {action}: HTTP {response.status_code} {data}")
-                self._flash_led((1.0, 0.0, 0.0), duration_s=0.5)  # red
+                print(f"[ERR] {action}: HTTP {status} {data} ({latency()})")
+                self._flash_led(RED, duration_s=0.5, priority=LED_PRIORITY_ERROR)
         except requests.RequestException as exc:
-            if self.settings.remote_legacy_fallback:
-                try:
-                    fallback = self._post_json(
-                        f"/dispatch/{action}",
-                        legacy_payload,
-                        self.settings.rotary_token,
-                    )
-                    if fallback.status_code == 200:
-                        print(f"[OK] {action}: remote API offline, fallback to legacy endpoint")
-                        self._flash_led((0.0, 1.0, 0.0))
-                        return
-                except requests.RequestException:
-                    pass
-            print(f"[NET] {action}: {exc}")
-            self._flash_led((1.0, 0.0, 0.0), duration_s=0.5)  # red
-
-    def send_remote_heartbeat(self) -> None:
+            if retry_later(str(exc)):
+                return
+            print(f"[NET] {action}: {exc} ({latency()})")
+            self._flash_led(RED, duration_s=0.5, priority=LED_PRIORITY_ERROR)
+        finally:
+            if not retrying:
+                self._settle_action(item, delivered, outcome, data)
+
+    def _settle_action(self, item: QueuedAction, delivered: bool, outcome: str, data: object) -> None:
+        """Record an action's final outcome and release or discard the actions held behind it."""
+        # Edge -> final outcome, so a retried action is recorded once, with its retries included.
+        self.latency.record(item.action, "total", time.monotonic_ns() - item.edge_ns)
+        with self.lock:
+            self.outcomes[outcome] += 1
+        if item.optimistic:
+            self.mirror.settle(item.idempotency_key, delivered, data)
+        discarded = self.retries.settle(item, delivered)
+        if discarded:
+            print(f"[WARN] {item.action}: not delivered; discarded {len(discarded)} later action(s) held behind it")
+            self._flash_led(RED, duration_s=0.5, priority=LED_PRIORITY_ERROR)
+            for later in discarded:
+                self._settle_action(later, False, "error", None)
+
+    def report_latency(self) -> None:
+        lines = self.latency.report_lines()
+        if not lines:
+            print("[INFO] latency: no actions recorded yet")
+        for line in lines:
+            print(f"[INFO] latency {line}")
+
+    def collect_metrics(self, environment: EnvironmentMonitor | None = None) -> MetricsWriter:
+        """Current counters as Prometheus text; called from the metrics thread."""
+        w = MetricsWriter("flss_rotary")
+        process_metrics(w)
+        stats = self.dispatcher.stats()
+        w.gauge("action_queue_depth", "Actions waiting for a dispatcher worker.", stats["queueDepth"])
+        w.gauge("actions_in_flight", "Actions being delivered.", stats["inFlight"])
+        w.gauge("actions_waiting", "Actions not yet handed to the dispatcher (rotation window, budget, retries).", self.pending_actions())
+        w.counter("actions_submitted_total", "Actions handed to the dispatcher.", stats["submitted"])
+        w.counter("actions_dropped_total", "Actions dropped by a full dispatcher queue.", stats["dropped"])
+        with self.lock:
+            outcomes = dict(self.outcomes)
+        for outcome, count in outcomes.items():
+            w.counter("action_outcomes_total", "Final outcome per action, retries included once.", count, {"outcome": outcome})
+        retries = self.retries.stats()
+        w.gauge("retries_pending", "Actions waiting to be retried.", retries["pending"])
+        w.gauge("retries_held", "Later actions held behind a retry to keep press order.", retries["held"])
+        w.counter("retries_total", "Retry attempts sent.", retries["retried"])
+        w.counter("retries_recovered_total", "Actions delivered after at least one retry.", retries["recovered"])
+        w.counter("retries_expired_total", "Actions abandoned after ROTARY_RETRY_EXPIRY_S.", retries["expired"])
+        w.counter("retries_overflowed_total", "Actions not retried or held because the journal was full.", retries["overflowed"])
+        w.counter("retries_discarded_total", "Held actions discarded because the action ahead of them failed.", retries["discarded"])
+        w.gauge("action_budget_wait_seconds", "Delay the next action would take from the token bucket.", self.bucket.wait_s())
+        if self.remote_socket is not None:
+            socket_ = self.remote_socket
+            w.gauge("ws_connected", "1 while the controller WebSocket is open.", socket_.is_connected())
+            w.counter("ws_connects_total", "Controller WebSocket connections opened.", socket_.connects)
+            w.counter("ws_requests_total", "Requests sent over the WebSocket.", socket_.requests)
+            w.counter("ws_fallbacks_total", "Requests that fell back to HTTP.", socket_.fallbacks)
+        if self.mirror is not None:
+            mirror = self.mirror
+            w.gauge("mirror_synced", "1 while the dispatch-state mirror follows /dispatch/events.", mirror.is_synced())
+            w.counter("mirror_connects_total", "Event-stream connections opened.", mirror.connects)
+            w.counter("mirror_events_total", "Dispatch events received.", mirror.events)
+            w.counter("mirror_suppressed_total", "Actions not sent because the mirror showed no effect.", mirror.suppressed)
+            w.counter("mirror_predicted_total", "Actions applied optimistically before the reply.", mirror.predicted)
+            w.counter("mirror_rebased_total", "Times the local view was reset to the server's.", mirror.rebased)
+        telemetry = self.telemetry
+        w.gauge("telemetry_buffer_depth", "Environment readings waiting to upload.", telemetry.depth())
+        w.counter("telemetry_offered_total", "Readings offered to the uplink.", telemetry.offered)
+        w.counter("telemetry_buffered_total", "Readings kept past the deadband.", telemetry.buffered)
+        w.counter("telemetry_uploads_total", "Batches uploaded.", telemetry.uploads)
+        w.counter("telemetry_dropped_total", "Readings lost to a full buffer.", telemetry.dropped)
+        if environment is not None:
+            sensor_stats = environment.poller.stats()
+            # Each family's samples must be contiguous, so iterate sensors per family.
+            for kind, name, help_text, key in (
+                ("counter", "sensor_reads_total", "Sensor read attempts.", "attempts"),
+                ("counter", "sensor_timeouts_total", "Reads abandoned after the sensor's timeout_s.", "timeouts"),
+                ("counter", "sensor_read_errors_total", "Reads that failed or returned nothing.", "readErrors"),
+                ("counter", "sensor_busy_skips_total", "Reads skipped while an earlier one was stuck.", "busySkips"),
+                ("gauge", "sensor_interval_seconds", "Current sampling period.", "intervalS"),
+            ):
+                write = w.gauge if kind == "gauge" else w.counter
+                for sensor_id, stats in sensor_stats.items():
+                    write(name, help_text, stats[key], {"sensor": sensor_id})
+            history_stats = {sensor_id: history.stats() for sensor_id, history in environment.histories.items()}
+            for sensor_id, history in history_stats.items():
+                w.gauge("history_backlog_minutes", "Closed minute rollups not yet backfilled.", history["backlog"], {"sensor": sensor_id})
+            for sensor_id, history in history_stats.items():
+                w.counter(
+                    "history_overwritten_total",
+                    "Unsent minutes lost to the history ring wrapping.",
+                    history["overwritten"],
+                    {"sensor": sensor_id},
+                )
+        w.counter("backfill_minutes_total", "Minute rollups uploaded to /environment/ingest.", self.backfilled)
+        w.counter("backfill_uploads_total", "Backfill requests accepted.", self.backfill_uploads)
+        w.counter("heartbeats_sent_total", "Standalone heartbeats sent.", self.heartbeats_sent)
+        w.counter("heartbeats_skipped_total", "Heartbeats skipped because other traffic reached FLSS.", self.heartbeats_skipped)
+        w.counter("led_preempted_total", "LED flashes cut short by a higher-priority one.", self.feedback.preempted)
+        w.counter("led_suppressed_total", "LED flashes dropped behind a higher-priority one.", self.feedback.suppressed)
+        w.gauge("timers_pending", "Deadlines waiting on the timer thread.", self.scheduler.pending())
+        w.latency("latency_seconds", "Edge -> queue -> delivery time per action and stage.", self.latency.snapshot(), "action")
+        return w
+
+    def send_remote_heartbeat(self, *, force: bool = False) -> None:
+        """Send a standalone heartbeat only when no action or upload reached FLSS for a full interval."""
+        if not force and time.monotonic() - self.last_contact_at < self.settings.heartbeat_interval_s:
+            self.heartbeats_skipped += 1
+            return
         payload = {
             "remoteId": self.settings.remote_id,
             "firmware": self.settings.firmware_version,
             "firmwareVersion": self.settings.firmware_version,
         }
         try:
-            response = self._post_json("/dispatch/remote/heartbeat", payload, self.settings.remote_token)
-            if response.status_code != 200:
-                print(f"[WARN] heartbeat HTTP {response.status_code}: {response.text}")
+            status, data = self._remote_call("remote-heartbeat", "/dispatch/remote/heartbeat", payload)
+            self.heartbeats_sent += 1
+            if status == 200:
+                self._mark_contact()
+            else:
+                print(f"[WARN] heartbeat HTTP {status}: {data}")
         except requests.RequestException as exc:
             print(f"[NET] heartbeat: {exc}")
 
     def send_environment_telemetry(self) -> None:
-        dynamic_sample = self._read_env_sensor_sample()
+        if self.sensor_stream is not None:
+            dynamic_sample = self.sensor_stream.latest()
+        else:
+            dynamic_sample = self._read_env_sensor_sample()
         temperature_c = dynamic_sample.get("temperatureC", self.settings.env_temperature_c)
         humidity_pct = dynamic_sample.get("humidityPct", self.settings.env_humidity_pct)
 
@@ -546,23 +2298,319 @@ class RotaryFlssClient:
                 print("[WARN] environment telemetry skipped: temperature/humidity missing from sensor payload")
             return
 
-        payload = {
-            "deviceId": self.settings.remote_id,
-            "temperatureC": temperature_c,
-            "humidityPct": humidity_pct,
-            "recordedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-        }
-        try:
-            response = self._post_json("/dispatch/environment", payload, self.settings.remote_token)
+        recorded_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.telemetry.offer(
+            "sensor-cmd",
+            {
+                "deviceId": self.settings.remote_id,
+                "stationId": self.settings.station_id,
+                "temperatureC": temperature_c,
+                "humidityPct": humidity_pct,
+                "recordedAt": recorded_at,
+                "timestamp": recorded_at,
+                "status": "ok",
+            },
+        )
+
+    def backfill_environment(self, histories: dict[str, SensorHistory]) -> None:
+        """Upload each sensor's closed per-minute rollups the server has not seen, oldest first.
+
+        One request carries up to ``env_backfill_batch_max`` minutes of one
+        sensor, so the history from an outage goes up in one or two requests
+        per sensor once FLSS is reachable again. A failed upload keeps the rows
+        for the next run.
+        """
+        for sensor_id, history in histories.items():
+            if not self._backfill_sensor(sensor_id, history):
+                # FLSS is unreachable or refusing; the other sensors wait for the next run too.
+                return
+
+    def _backfill_sensor(self, sensor_id: str, history: SensorHistory) -> bool:
+        """Backfill one sensor; returns False when an upload failed."""
+        while True:
+            rows = history.unsent(self.settings.env_backfill_batch_max)
+            if not rows:
+                return True
+            readings = []
+            for row in rows:
+                temp_min, temp_max, temp_mean = row["temperature"]
+                hum_min, hum_max, hum_mean = row["humidity"]
+                timestamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(row["ts"]))
+                readings.append(
+                    {
+                        "deviceId": self.settings.remote_id,
+                        "stationId": self.settings.station_id,
+                        "sensorId": sensor_id,
+                        "timestamp": timestamp,
+                        "recordedAt": timestamp,
+                        "periodS": 60,
+                        "samples": row["samples"],
+                        "temperatureC": None if temp_mean is None else round(temp_mean, 2),
+                        "temperatureMinC": temp_min,
+                        "temperatureMaxC": temp_max,
+                        "humidityPct": None if hum_mean is None else round(hum_mean, 2),
+                        "humidityMinPct": hum_min,
+                        "humidityMaxPct": hum_max,
+                        "status": "ok",
+                    }
+                )
+            try:
+                response = self._post_json("/environment/ingest", {"readings": readings}, self.settings.remote_token)
+            except requests.RequestException as exc:
+                print(f"[NET] environment backfill {sensor_id}: {exc}; {history.backlog()} minute(s) kept")
+                return False
             if response.status_code != 200:
-                print(f"[WARN] environment HTTP {response.status_code}: {response.text}")
+                print(f"[WARN] environment backfill {sensor_id} HTTP {response.status_code}: {self._response_data(response)}")
+                return False
+            history.mark_sent(len(rows))
+            self.backfilled += len(rows)
+            self.backfill_uploads += 1
+            if len(rows) > 1:
+                print(f"[OK] environment backfill {sensor_id}: {len(rows)} minute(s) uploaded")
+
+
+class RotaryInput:
+    """Maps encoder, switch and button edges onto dispatch actions.
+
+    Every gpiozero callback funnels into ``on_edge(pin, level, ts_ns)``, which
+    updates state under ``lock`` and hands actions to the client. The same
+    entry point replays recorded traces. The switch's multi-click window and
+    hold deadline are cancellable timers on the client's scheduler rather than
+    sleeping threads.
+    """
+
+    def __init__(self, client: RotaryFlssClient, settings: Settings) -> None:
+        self.client = client
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.quantity_mode = False
+        self.click_count = 0
+        self.sw_held = False
+        self._click_timer: TimerHandle | None = None
+        self._hold_timer: TimerHandle | None = None
+        # Switch edge times, so confirm latency is measured from the operator's press/release.
+        self._press_ns = 0
+        self._release_ns = 0
+        self.devices: tuple[Button, ...] = ()
+        self.recorder: EdgeRecorder | None = None
+        self._clk_level = 0
+        self._dt_level = 0
+        self.decoder = QuadratureDecoder(
+            steps_per_detent=settings.encoder_steps_per_detent,
+            accel_max=settings.encoder_accel_max,
+            reverse=settings.encoder_reverse,
+        )
+
+    def attach(self, clk: Button, dt: Button, sw: Button, print_btn: Button, fulfill_btn: Button) -> None:
+        # Keep the devices referenced; gpiozero closes a pin when its device is collected.
+        self.devices = (clk, dt, sw, print_btn, fulfill_btn)
+        self.reset_encoder(int(clk.is_pressed), int(dt.is_pressed))
+        # If direction is reversed, set ROTARY_ENCODER_REVERSE=1 or swap CLK/DT wiring.
+        for device in self.devices:
+            pin = device.pin.number
+            device.when_pressed = lambda p=pin: self.on_edge(p, 1)
+            device.when_released = lambda p=pin: self.on_edge(p, 0)
+
+    def reset_encoder(self, clk_level: int, dt_level: int) -> None:
+        with self.lock:
+            self._clk_level = clk_level
+            self._dt_level = dt_level
+            self.decoder.reset(clk_level, dt_level)
+
+    def start_edge_trace(self, path: str) -> None:
+        settings = self.settings
+        self.recorder = EdgeRecorder(
+            path,
+            {
+                "client": "rotary",
+                "source": settings.source,
+                "pins": {
+                    "clk": settings.cw_pin,
+                    "dt": settings.ccw_pin,
+                    "sw": settings.sw_pin,
+                    "print": settings.print_btn_pin,
+                    "fulfill": settings.fulfill_btn_pin,
+                },
+                "encoder": [settings.cw_pin, settings.ccw_pin],
+                "initial": [self._clk_level, self._dt_level],
+            },
+        )
+        print(f"[INFO] recording GPIO edges to {path}")
+
+    def on_edge(self, pin: int, level: int, ts_ns: int | None = None) -> None:
+        """Handle one raw edge; ``level`` is 1 when the input is active (pulled to GND)."""
+        if ts_ns is None:
+            ts_ns = time.monotonic_ns()
+        if self.recorder is not None:
+            self.recorder.record(pin, level, ts_ns)
+        settings = self.settings
+        if pin == settings.cw_pin or pin == settings.ccw_pin:
+            with self.lock:
+                if pin == settings.cw_pin:
+                    self._clk_level = level
+                else:
+                    self._dt_level = level
+                lines = self.decoder.update(self._clk_level, self._dt_level, ts_ns)
+                in_quantity_mode = self.quantity_mode
+            self._send_lines(lines, in_quantity_mode, ts_ns)
+        elif pin == settings.sw_pin:
+            if level == LEVEL_PRESSED:
+                self.on_sw_pressed(ts_ns)
             else:
-                print(
-                    "[OK] environment telemetry sent "
-                    f"(temp={temperature_c:.1f}C humidity={humidity_pct:.1f}% device={self.settings.remote_id})"
-                )
-        except requests.RequestException as exc:
-            print(f"[NET] environment: {exc}")
+                self.on_sw_released(ts_ns)
+        elif level == LEVEL_PRESSED and pin == settings.print_btn_pin:
+            self.client.send_action("print", edge_ns=ts_ns)
+        elif level == LEVEL_PRESSED and pin == settings.fulfill_btn_pin:
+            self.client.send_action("fulfill", edge_ns=ts_ns)
+
+    def on_encoder_pins(self, clk_level: int, dt_level: int, ts_ns: int | None = None) -> None:
+        if ts_ns is None:
+            ts_ns = time.monotonic_ns()
+        with self.lock:
+            self._clk_level = clk_level
+            self._dt_level = dt_level
+            lines = self.decoder.update(clk_level, dt_level, ts_ns)
+            in_quantity_mode = self.quantity_mode
+        self._send_lines(lines, in_quantity_mode, ts_ns)
+
+    def _send_lines(self, lines: int, in_quantity_mode: bool, ts_ns: int) -> None:
+        if not lines:
+            return
+        self.client.rotate(lines, in_quantity_mode, ts_ns)
+
+    def on_sw_pressed(self, ts_ns: int | None = None) -> None:
+        scheduler = self.client.scheduler
+        pressed_ns = ts_ns if ts_ns is not None else time.monotonic_ns()
+        with self.lock:
+            self._press_ns = pressed_ns
+            self._cancel_switch_timers()
+            if self.quantity_mode:
+                self.quantity_mode = False
+                self.click_count = 0
+                submit_qty = True
+            else:
+                self.click_count += 1
+                self.sw_held = False
+                submit_qty = False
+                self._hold_timer = scheduler.call_later(self.settings.sw_hold_time_s, self._on_sw_hold)
+        if submit_qty:
+            self.client.send_action("set_packed_qty", force=True, edge_ns=pressed_ns)
+
+    def on_sw_released(self, ts_ns: int | None = None) -> None:
+        released_ns = ts_ns if ts_ns is not None else time.monotonic_ns()
+        with self.lock:
+            self._release_ns = released_ns
+            if self._hold_timer is not None:
+                self._hold_timer.cancel()
+                self._hold_timer = None
+            if self.sw_held or self.quantity_mode or not self.click_count:
+                self.sw_held = False
+                return
+            self._click_timer = self.client.scheduler.call_later(
+                max(0.0, self.settings.sw_multi_click_window_s), self._on_click_window_closed
+            )
+
+    def _on_sw_hold(self) -> None:
+        with self.lock:
+            self._hold_timer = None
+            self.sw_held = True
+            self.click_count = 0
+            self.quantity_mode = True
+            pressed_ns = self._press_ns
+        self.client.send_action("confirm_hold", force=True, edge_ns=pressed_ns)
+
+    def _on_click_window_closed(self) -> None:
+        with self.lock:
+            self._click_timer = None
+            count, self.click_count = self.click_count, 0
+            enter_quantity_mode = count >= 3
+            if enter_quantity_mode:
+                self.quantity_mode = True
+            released_ns = self._release_ns
+        if enter_quantity_mode:
+            self.client.send_action("confirm_hold", force=True, edge_ns=released_ns)
+            return
+        self.client.send_action("confirm", edge_ns=released_ns)
+
+    def _cancel_switch_timers(self) -> None:
+        for handle in (self._click_timer, self._hold_timer):
+            if handle is not None:
+                handle.cancel()
+        self._click_timer = None
+        self._hold_timer = None
+
+
+def open_controls(client: RotaryFlssClient, settings: Settings) -> RotaryInput:
+    """Create the encoder/button devices on the configured pins and attach them to a ``RotaryInput``."""
+    # pull_up=True assumes switch/encoder outputs pull to GND when active.
+    # No bounce_time on the encoder: the quadrature decoder rejects bounce itself.
+    clk = Button(settings.cw_pin, pull_up=True, bounce_time=None)
+    dt = Button(settings.ccw_pin, pull_up=True, bounce_time=None)
+    sw = Button(settings.sw_pin, pull_up=True, bounce_time=0.05)
+    print_btn = Button(settings.print_btn_pin, pull_up=True, bounce_time=0.05)
+    fulfill_btn = Button(settings.fulfill_btn_pin, pull_up=True, bounce_time=0.05)
+
+    controls = RotaryInput(client, settings)
+    controls.attach(clk, dt, sw, print_btn, fulfill_btn)
+    return controls
+
+
+def start_jobs(
+    client: RotaryFlssClient, environment: EnvironmentMonitor, settings: Settings
+) -> tuple[ThreadPoolExecutor, list[PeriodicJob]]:
+    """Start the heartbeat, telemetry, backfill and latency-report jobs on the client's timers."""
+    # Heartbeat, telemetry and backfill run side by side, so a hung heartbeat never delays a sample.
+    executor = ThreadPoolExecutor(max_workers=3 if environment.histories else 2, thread_name_prefix="rotary-job")
+    job_timeout_s = settings.request_timeout_s + 1.0
+    jobs = [
+        PeriodicJob(
+            "heartbeat",
+            client.send_remote_heartbeat,
+            # Checked at twice the rate so an idle remote is never silent for more than 1.5 intervals.
+            interval_s=max(2.5, settings.heartbeat_interval_s / 2),
+            timeout_s=job_timeout_s,
+            jitter=settings.job_jitter,
+            scheduler=client.scheduler,
+            executor=executor,
+        ),
+        PeriodicJob(
+            "environment",
+            client.send_environment_telemetry,
+            interval_s=max(5.0, settings.telemetry_interval_s),
+            timeout_s=job_timeout_s,
+            jitter=settings.job_jitter,
+            scheduler=client.scheduler,
+            executor=executor,
+        ),
+    ]
+    if environment.histories:
+        jobs.append(
+            PeriodicJob(
+                "backfill",
+                lambda: client.backfill_environment(environment.histories),
+                interval_s=settings.env_backfill_s,
+                # A long backlog takes several requests; only warn once a run outlasts its interval.
+                timeout_s=max(job_timeout_s, settings.env_backfill_s),
+                jitter=settings.job_jitter,
+                scheduler=client.scheduler,
+                executor=executor,
+            )
+        )
+    for job in jobs:
+        job.start()
+    if settings.latency_report_s > 0:
+        report_job = PeriodicJob(
+            "latency-report",
+            client.report_latency,
+            interval_s=settings.latency_report_s,
+            timeout_s=job_timeout_s,
+            jitter=0.0,
+            scheduler=client.scheduler,
+            executor=executor,
+        )
+        report_job.start(first_delay_s=settings.latency_report_s)
+        jobs.append(report_job)
+    return executor, jobs
 
 
 def main() -> int:
@@ -576,10 +2624,13 @@ def main() -> int:
     print(f"  REMOTE_HEARTBEAT_INTERVAL_S={settings.heartbeat_interval_s}")
     print(f"  ENV_TELEMETRY_INTERVAL_S={settings.telemetry_interval_s}")
     print(f"  ENV_SENSOR_CMD configured={'yes' if bool(settings.env_sensor_cmd) else 'no'}")
+    print(f"  ENV_SENSOR_MODE={settings.env_sensor_mode}")
     print(f"  STATION_ID={settings.station_id}")
     print(f"  DHT11_ENABLED={'yes' if settings.dht_enabled else 'no'}")
     print(f"  DHT_PIN={settings.dht_pin}")
     print(f"  DHT_POLL_INTERVAL_S={settings.dht_interval_s}")
+    print(f"  SENSORS={','.join(f'{spec.id}:{spec.driver}' for spec in settings.sensors) or 'none'}")
+    print(f"  SENSOR_WORKERS={settings.sensor_workers}")
     print(f"  Pins CLK/DT/SW={settings.cw_pin}/{settings.ccw_pin}/{settings.sw_pin}")
     print(f"  Push buttons Print/Fulfill={settings.print_btn_pin}/{settings.fulfill_btn_pin}")
     print(
@@ -589,82 +2640,52 @@ def main() -> int:
     print(f"  ROTARY_TOKEN configured={'yes' if bool(settings.rotary_token) else 'no'}")
     print(f"  REMOTE_TOKEN configured={'yes' if bool(settings.remote_token) else 'no'}")
     print(f"  ROTARY_SW_HOLD_TIME_S={settings.sw_hold_time_s}")
+    print(f"  ROTARY_SW_MULTI_CLICK_WINDOW_S={settings.sw_multi_click_window_s}")
+    print(f"  ROTARY_ACTION_MAX_IN_FLIGHT={settings.action_max_in_flight}")
+    print(f"  ROTARY_ACTION_QUEUE_SIZE={settings.action_queue_size}")
+    print(
+        "  ROTARY_ACTION rate/burst/max-wait="
+        f"{settings.action_rate_per_s}/s/{settings.action_burst}/{settings.action_max_wait_s}s"
+        f", rotate window {settings.rotate_window_s}s ({'steps' if settings.rotate_steps else 'one action per line'})"
+    )
+    print(
+        "  ROTARY_RETRY max/base/max-delay/expiry="
+        f"{settings.retry_capacity}/{settings.retry_base_s}s/{settings.retry_max_delay_s}s/{settings.retry_expiry_s}s"
+    )
+    print(f"  ROTARY_DISPATCH_MIRROR={'yes' if settings.dispatch_mirror else 'no'}")
+    print(f"  ROTARY_METRICS_ADDR={settings.metrics_addr or 'off'}")
+    print(
+        "  ENV_HISTORY minutes/backfill="
+        f"{settings.env_history_minutes}/{settings.env_backfill_s}s -> {settings.env_history_dir or 'memory only'}"
+    )
+    print(
+        "  ENV_TELEMETRY deadband/max-interval/flush="
+        f"{settings.env_deadband_temp_c}C,{settings.env_deadband_humidity_pct}%/"
+        f"{settings.env_max_interval_s}s/{settings.env_flush_s}s"
+    )
 
     led = RGBLED(settings.rgb_red_pin, settings.rgb_green_pin, settings.rgb_blue_pin)
     led.off()
 
     client = RotaryFlssClient(settings, led)
-    dht_monitor = DHT11Monitor(settings)
-    dht_monitor.start()
+    client.start()
+    environment = EnvironmentMonitor(settings, client.telemetry)
+    environment.start()
 
     if not client.probe_auth():
         print("Hint: export ROTARY_TOKEN=\"<same-token-as-server>\" before running this script.")
 
-    # pull_up=True assumes switch/encoder outputs pull to GND when active.
-    clk = Button(settings.cw_pin, pull_up=True, bounce_time=0.002)
-    dt = Button(settings.ccw_pin, pull_up=True, bounce_time=0.002)
-    sw = Button(settings.sw_pin, pull_up=True, bounce_time=0.05)
-    print_btn = Button(settings.print_btn_pin, pull_up=True, bounce_time=0.05)
-    fulfill_btn = Button(settings.fulfill_btn_pin, pull_up=True, bounce_time=0.05)
+    controls = open_controls(client, settings)
+    if settings.edge_trace_path:
+        controls.start_edge_trace(settings.edge_trace_path)
 
-    mode_lock = threading.Lock()
-    quantity_mode = False
-    sw_press_nonce = 0
-    sw_click_count = 0
-
-    def _send_rotary_turn(cw: bool) -> None:
-        with mode_lock:
-            in_quantity_mode = quantity_mode
-        if in_quantity_mode:
-            client.send_action("qty_increase" if cw else "qty_decrease")
-            return
-        client.send_action("next" if cw else "prev")
-
-    def _on_sw_pressed() -> None:
-        nonlocal quantity_mode, sw_press_nonce, sw_click_count
-
-        with mode_lock:
-            if quantity_mode:
-                quantity_mode = False
-                sw_press_nonce += 1
-                sw_click_count = 0
-                should_submit_qty = True
-                click_nonce = sw_press_nonce
-            else:
-                sw_press_nonce += 1
-                sw_click_count += 1
-                should_submit_qty = False
-                click_nonce = sw_press_nonce
-                click_count = sw_click_count
-
-        if should_submit_qty:
-            client.send_action("set_packed_qty", force=True)
-            return
-
-        def _handle_multi_click_after_window(nonce: int, count: int) -> None:
-            nonlocal quantity_mode, sw_click_count
-            time.sleep(max(0.0, settings.sw_multi_click_window_s))
-            with mode_lock:
-                if nonce != sw_press_nonce or quantity_mode:
-                    return
-                sw_click_count = 0
-                enter_quantity_mode = count >= 3
-                if enter_quantity_mode:
-                    quantity_mode = True
-            if enter_quantity_mode:
-                client.send_action("confirm_hold", force=True)
-                return
-            client.send_action("confirm")
-
-        threading.Thread(target=_handle_multi_click_after_window, args=(click_nonce, click_count), daemon=True).start()
-
-    # Simple edge mapping suitable for many detented encoders.
-    # If direction is reversed, swap next/prev here or swap CLK/DT wiring.
-    clk.when_pressed = lambda: _send_rotary_turn(cw=True)
-    dt.when_pressed = lambda: _send_rotary_turn(cw=False)
-    sw.when_pressed = _on_sw_pressed
-    print_btn.when_pressed = lambda: client.send_action("print")
-    fulfill_btn.when_pressed = lambda: client.send_action("fulfill")
+    metrics: MetricsServer | None = None
+    if settings.metrics_addr:
+        metrics = MetricsServer(settings.metrics_addr, lambda: client.collect_metrics(environment))
+        if metrics.start():
+            print(f"[INFO] metrics on {settings.metrics_addr}/metrics")
+        else:
+            metrics = None
 
     stop_event = threading.Event()
 
@@ -674,21 +2695,25 @@ def main() -> int:
 
     signal.signal(signal.SIGINT, _handle_stop)
     signal.signal(signal.SIGTERM, _handle_stop)
+    # `kill -USR1 <pid>` prints p50/p99/max per action and stage.
+    signal.signal(signal.SIGUSR1, lambda _signum, _frame: client.scheduler.call_later(0.0, client.report_latency))
+
+    executor, jobs = start_jobs(client, environment, settings)
 
     print("Rotary client running. Rotate knob or press button to send actions.")
-    next_heartbeat_at = 0.0
-    next_env_at = 0.0
-    while not stop_event.is_set():
-        now = time.monotonic()
-        if now >= next_heartbeat_at:
-            client.send_remote_heartbeat()
-            next_heartbeat_at = now + max(5.0, settings.heartbeat_interval_s)
-        if now >= next_env_at:
-            client.send_environment_telemetry()
-            next_env_at = now + max(5.0, settings.telemetry_interval_s)
-        time.sleep(0.2)
-
-    dht_monitor.stop()
+    # The main thread only sleeps until a signal arrives; deadlines live on the timer thread.
+    while not stop_event.wait(3600):
+        pass
+
+    if metrics is not None:
+        metrics.stop()
+    for job in jobs:
+        job.stop()
+    executor.shutdown(wait=False, cancel_futures=True)
+    environment.stop()
+    if controls.recorder is not None:
+        controls.recorder.close()
+    client.close()
     led.off()
 
     return 0
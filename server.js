@@ -10,6 +10,7 @@ import { config } from "./src/config.js";
 import { createApp } from "./src/app.js";
 import { runMigrations } from "./src/db/sqlite.js";
 import { controllerBridge } from "./src/services/controllerBridge.js";
+import { handleRemoteCommand, isRemoteCommand, isRemoteRequestAuthorized } from "./src/services/remoteCommands.js";
 
 const DEPLOY_BRANCH = "1.9";
 const DEPLOY_REF = `refs/heads/${DEPLOY_BRANCH}`;
@@ -52,30 +53,59 @@ function setupControllerWebSocket(httpServer) {
     });
   };
 
-  wss.on("connection", (ws, req, source) => {
+  wss.on("connection", (ws, req, source, stream, remoteAuthorized) => {
     const controllerSource = source || "unknown";
     controllerBridge.touchConnection(controllerSource, {
       remoteAddress: req.socket?.remoteAddress || null,
-      protocol: "ws"
+      protocol: "ws",
+      stream
     });
 
-    ws.send(JSON.stringify({ channel: "ready", payload: controllerBridge.getStatus() }));
+    ws.send(JSON.stringify({ channel: "ready", payload: { ...controllerBridge.getStatus(), remoteCommands: true } }));
     subscribeClient(ws);
 
     ws.on("message", (buffer) => {
+      let seq = null;
       try {
         const payload = JSON.parse(String(buffer || "{}"));
-        const event = {
-          ...payload,
-          source: String(payload?.source || controllerSource).trim() || controllerSource
-        };
-        const result = controllerBridge.ingest(event);
-        if (!result.ok) {
-          ws.send(JSON.stringify({ channel: "error", payload: result }));
+        if (isRemoteCommand(payload)) {
+          // Same handlers as /dispatch/remote/*; the reply echoes the request id (the idempotency key).
+          handleRemoteCommand(payload, { authorized: remoteAuthorized }).then((result) => {
+            if (ws.readyState === ws.OPEN) ws.send(JSON.stringify({ channel: "remote-result", payload: result }));
+          });
+          return;
+        }
+        const isBatch = Array.isArray(payload) || payload?.type === "controller-batch";
+        if (isBatch) {
+          const result = controllerBridge.ingestBatch(Array.isArray(payload) ? payload : payload.events, {
+            source: String(payload?.source || controllerSource).trim() || controllerSource
+          });
+          seq = result.seq ?? null;
+          const failures = result.ok ? result.results.filter((entry) => !entry.ok) : [result];
+          if (failures.length) {
+            ws.send(JSON.stringify({ channel: "error", payload: { ok: false, code: "BATCH_PARTIAL", failures } }));
+          }
+        } else {
+          seq = Number.isSafeInteger(payload?.seq) && payload.seq > 0 ? payload.seq : null;
+          const event = {
+            ...payload,
+            source: String(payload?.source || controllerSource).trim() || controllerSource
+          };
+          const result = controllerBridge.ingest(event);
+          if (!result.ok) {
+            ws.send(JSON.stringify({ channel: "error", payload: result }));
+            // Never ack a rate-limited event; the daemon would delete it from its outbox.
+            if (result.code === "RATE_LIMITED") seq = null;
+          }
         }
       } catch (error) {
         ws.send(JSON.stringify({ channel: "error", payload: { ok: false, code: "INVALID_JSON", error: error.message } }));
       }
+      // Sequenced events are acknowledged even when invalid so a bad event cannot block replay.
+      if (seq !== null) {
+        controllerBridge.recordSeq(controllerSource, seq);
+        ws.send(JSON.stringify({ channel: "ack", payload: { seq, serverTime: Date.now() } }));
+      }
     });
 
     ws.on("close", () => {
@@ -88,9 +118,15 @@ function setupControllerWebSocket(httpServer) {
     if (url.pathname !== "/ws/controller") return;
 
     const source = String(url.searchParams.get("source") || req.headers["x-controller-source"] || "unknown").trim() || "unknown";
+    const stream = String(url.searchParams.get("stream") || "").trim() || null;
+    // Controller events stay open as before; remote commands need the same token as the HTTP routes.
+    const remoteAuthorized = isRemoteRequestAuthorized({
+      authorization: req.headers.authorization,
+      ip: req.socket?.remoteAddress
+    });
 
     wss.handleUpgrade(req, socket, head, (ws) => {
-      wss.emit("connection", ws, req, source);
+      wss.emit("connection", ws, req, source, stream, remoteAuthorized);
     });
   });
 }
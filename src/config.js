@@ -63,6 +63,7 @@ export const config = {
   ROTARY_DEBOUNCE_MS: numberOrDefault(process.env.ROTARY_DEBOUNCE_MS, 40, { min: 1 }),
   REMOTE_TOKEN: process.env.REMOTE_TOKEN || "",
   REMOTE_HEARTBEAT_STALE_MS: numberOrDefault(process.env.REMOTE_HEARTBEAT_STALE_MS, 30000, { min: 1000 }),
+  REMOTE_IDEMPOTENCY_WINDOW: numberOrDefault(process.env.REMOTE_IDEMPOTENCY_WINDOW, 64, { min: 1 }),
 
   ENV_TEMP_MIN_C: numberOrDefault(process.env.ENV_TEMP_MIN_C, 5),
   ENV_TEMP_MAX_C: numberOrDefault(process.env.ENV_TEMP_MAX_C, 35),
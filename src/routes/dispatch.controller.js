@@ -5,9 +5,6 @@ import {
   confirm,
   requestFulfill,
   requestPrint,
-  confirmHold,
-  setPackedQty,
-  adjustPackedQty,
   getEnvironmentState,
   getRemoteState,
   getState,
@@ -15,49 +12,31 @@ import {
   onCustomEvent,
   onStateChange,
   prev,
-  recordRemoteHeartbeat,
-  syncState,
-  upsertEnvironmentReading
+  syncState
 } from "../services/dispatchController.js";
+import {
+  applyEnvironmentUpload,
+  applyRemoteAction,
+  applyRemoteHeartbeat,
+  isRemoteRequestAuthorized,
+  isRotaryRequestAuthorized,
+  remoteUnauthorizedResult
+} from "../services/remoteCommands.js";
 
 const router = Router();
 const lastActionAtByKey = new Map();
-const remoteIdempotencyByRemote = new Map();
 
 function getRequestIp(req) {
   const raw = String(req.ip || req.socket?.remoteAddress || "");
   return raw.replace("::ffff:", "") || "unknown";
 }
 
-function isPrivateIp(ip) {
-  if (!ip) return false;
-  if (ip === "127.0.0.1" || ip === "::1") return true;
-  const parts = ip.split(".").map((part) => Number(part));
-  if (parts.length !== 4 || parts.some((part) => Number.isNaN(part))) return false;
-  if (parts[0] === 10) return true;
-  if (parts[0] === 192 && parts[1] === 168) return true;
-  if (parts[0] === 172 && parts[1] >= 16 && parts[1] <= 31) return true;
-  return false;
-}
-
 function isAuthorized(req) {
-  const token = String(config.ROTARY_TOKEN || "").trim();
-  const authHeader = String(req.get("authorization") || "").trim();
-  const bearerToken = authHeader.startsWith("Bearer ") ? authHeader.slice(7).trim() : "";
-
-  if (token) {
-    return bearerToken && bearerToken === token;
-  }
-
-  return isPrivateIp(getRequestIp(req));
+  return isRotaryRequestAuthorized({ authorization: req.get("authorization"), ip: getRequestIp(req) });
 }
 
 function isRemoteAuthorized(req) {
-  const token = String(config.REMOTE_TOKEN || "").trim();
-  if (!token) return isAuthorized(req);
-  const authHeader = String(req.get("authorization") || "").trim();
-  const bearerToken = authHeader.startsWith("Bearer ") ? authHeader.slice(7).trim() : "";
-  return bearerToken && bearerToken === token;
+  return isRemoteRequestAuthorized({ authorization: req.get("authorization"), ip: getRequestIp(req) });
 }
 
 function unauthorizedResponse(res) {
@@ -69,11 +48,8 @@ function unauthorizedResponse(res) {
 }
 
 function remoteUnauthorizedResponse(res) {
-  const hasToken = Boolean(String(config.REMOTE_TOKEN || "").trim());
-  return res.status(hasToken ? 401 : 403).json({
-    ok: false,
-    error: hasToken ? "Unauthorized" : "Forbidden"
-  });
+  const { status, body } = remoteUnauthorizedResult();
+  return res.status(status).json(body);
 }
 
 function shouldDebounce(req, actionName) {
@@ -100,6 +76,12 @@ function logAction(action, req, beforeState, afterState) {
   });
 }
 
+// Remote clients estimate their clock offset from this to split round trips into one-way latency.
+router.use(["/dispatch/remote", "/dispatch/environment"], (_req, res, next) => {
+  res.set("X-Server-Time", String(Date.now()));
+  next();
+});
+
 router.get("/dispatch/state", (req, res) => {
   const state = getState();
   res.json({ ok: true, ...state });
@@ -119,40 +101,20 @@ router.get("/dispatch/environment", (req, res) => {
   res.json({ ok: true, environment });
 });
 
-router.post("/dispatch/environment", (req, res) => {
+router.post("/dispatch/environment", async (req, res) => {
   if (!isRemoteAuthorized(req)) {
     return remoteUnauthorizedResponse(res);
   }
-  try {
-    const environment = upsertEnvironmentReading(req.body, {
-      staleMs: config.ENV_STALE_MS,
-      tempMin: config.ENV_TEMP_MIN_C,
-      tempMax: config.ENV_TEMP_MAX_C,
-      humidityMin: config.ENV_HUMIDITY_MIN,
-      humidityMax: config.ENV_HUMIDITY_MAX
-    });
-    return res.json({ ok: true, environment });
-  } catch (error) {
-    if (error?.code === "INVALID_ENVIRONMENT_PAYLOAD") {
-      return res.status(400).json({ ok: false, error: error.message });
-    }
-    return res.status(500).json({ ok: false, error: "Failed to save environment reading" });
-  }
+  const { status, body } = await applyEnvironmentUpload(req.body);
+  return res.status(status).json(body);
 });
 
 router.post("/dispatch/remote/heartbeat", (req, res) => {
   if (!isRemoteAuthorized(req)) {
     return remoteUnauthorizedResponse(res);
   }
-  try {
-    const remote = recordRemoteHeartbeat(req.body, { staleMs: config.REMOTE_HEARTBEAT_STALE_MS });
-    return res.json({ ok: true, remote });
-  } catch (error) {
-    if (error?.code === "INVALID_REMOTE_PAYLOAD") {
-      return res.status(400).json({ ok: false, error: error.message });
-    }
-    return res.status(500).json({ ok: false, error: "Failed to record remote heartbeat" });
-  }
+  const { status, body } = applyRemoteHeartbeat(req.body);
+  return res.status(status).json(body);
 });
 
 router.get("/dispatch/remote/status", (req, res) => {
@@ -164,64 +126,8 @@ router.post("/dispatch/remote/action", (req, res) => {
   if (!isRemoteAuthorized(req)) {
     return remoteUnauthorizedResponse(res);
   }
-
-  const action = String(req.body?.action || "").trim().toLowerCase();
-  const remoteId = String(req.body?.remoteId || "unknown").trim() || "unknown";
-  const idempotencyKey = String(req.body?.idempotencyKey || "").trim();
-  if (!action) {
-    return res.status(400).json({ ok: false, error: "action is required" });
-  }
-
-  const allowed = new Set(["next", "prev", "confirm", "print", "fulfill", "confirm_hold", "set_packed_qty", "qty_increase", "qty_decrease"]);
-  if (!allowed.has(action)) {
-    return res.status(400).json({ ok: false, error: "Unsupported remote action" });
-  }
-
-  if (idempotencyKey) {
-    const lastKey = remoteIdempotencyByRemote.get(remoteId);
-    if (lastKey && lastKey === idempotencyKey) {
-      const state = getState();
-      return res.json({ ok: true, action, selectedOrderId: state.selectedOrderId, selectedLineItemKey: state.selectedLineItemKey, deduped: true });
-    }
-    remoteIdempotencyByRemote.set(remoteId, idempotencyKey);
-  }
-
-  try {
-    let state;
-    if (action === "next") state = next();
-    if (action === "prev") state = prev();
-    if (action === "confirm") state = confirm();
-    if (action === "print") state = requestPrint();
-    if (action === "fulfill") state = requestFulfill();
-    if (action === "confirm_hold") state = confirmHold();
-    if (action === "set_packed_qty") {
-      state = setPackedQty({
-        lineItemKey: req.body?.lineItemKey ?? req.body?.selectedLineItemKey,
-        qty: req.body?.qty
-      });
-    }
-    if (action === "qty_increase") {
-      state = adjustPackedQty({
-        lineItemKey: req.body?.lineItemKey ?? req.body?.selectedLineItemKey,
-        delta: 1
-      });
-    }
-    if (action === "qty_decrease") {
-      state = adjustPackedQty({
-        lineItemKey: req.body?.lineItemKey ?? req.body?.selectedLineItemKey,
-        delta: -1
-      });
-    }
-    return res.json({ ok: true, action, selectedOrderId: state?.selectedOrderId || null, selectedLineItemKey: state?.selectedLineItemKey || null });
-  } catch (error) {
-    if (error?.code === "NO_SELECTED_ORDER") {
-      return res.status(409).json({ ok: false, action, error: error.message });
-    }
-    if (error?.code === "INVALID_REMOTE_PAYLOAD") {
-      return res.status(400).json({ ok: false, action, error: error.message });
-    }
-    return res.status(500).json({ ok: false, action, error: "Failed to apply remote action" });
-  }
+  const { status, body } = applyRemoteAction(req.body);
+  return res.status(status).json(body);
 });
 
 router.get("/dispatch/events", (req, res) => {
@@ -274,20 +180,23 @@ function handleAction(actionName, fn) {
 
     const beforeState = getState();
     try {
-      const state = fn();
+      const state = fn(req);
       logAction(actionName, req, beforeState, state);
       return res.json({ ok: true, action: actionName, selectedOrderId: state.selectedOrderId, selectedLineItemKey: state.selectedLineItemKey });
     } catch (error) {
       if (error?.code === "NO_SELECTED_ORDER") {
         return res.status(409).json({ ok: false, action: actionName, error: error.message });
       }
+      if (error?.code === "INVALID_REMOTE_PAYLOAD") {
+        return res.status(400).json({ ok: false, action: actionName, error: error.message });
+      }
       return res.status(500).json({ ok: false, action: actionName, error: "Failed to apply action" });
     }
   };
 }
 
-router.post("/dispatch/next", handleAction("next", () => next()));
-router.post("/dispatch/prev", handleAction("prev", () => prev()));
+router.post("/dispatch/next", handleAction("next", (req) => next({ steps: req.body?.steps })));
+router.post("/dispatch/prev", handleAction("prev", (req) => prev({ steps: req.body?.steps })));
 router.post("/dispatch/confirm", handleAction("confirm", () => confirm()));
 router.post("/dispatch/print", handleAction("print", () => requestPrint()));
 router.post("/dispatch/fulfill", handleAction("fulfill", () => requestFulfill()));
@@ -1,11 +1,20 @@
 import { Router } from "express";
 
-import { getLatestEnvironmentTelemetry, ingestEnvironmentTelemetry } from "../services/environmentTelemetry.js";
+import {
+  getLatestEnvironmentTelemetry,
+  ingestEnvironmentTelemetry,
+  ingestEnvironmentTelemetryBatch
+} from "../services/environmentTelemetry.js";
 
 const router = Router();
 
 router.post("/environment/ingest", async (req, res) => {
   try {
+    const readings = Array.isArray(req.body) ? req.body : req.body?.readings;
+    if (Array.isArray(readings)) {
+      const { environment, accepted, rejected } = await ingestEnvironmentTelemetryBatch(readings);
+      return res.json({ ok: true, environment, accepted, rejected });
+    }
     const environment = await ingestEnvironmentTelemetry(req.body || {});
     return res.json({ ok: true, environment });
   } catch (error) {
@@ -21,6 +21,7 @@ export class ControllerBridge {
     this.events = new EventEmitter();
     this.controllers = new Map();
     this.lastAcceptedAtBySource = new Map();
+    this.sequenceBySource = new Map();
   }
 
   touchConnection(source, connectionMeta = {}) {
@@ -34,9 +35,12 @@ export class ControllerBridge {
       lastHeartbeatAt: nowIso(),
       remoteAddress: connectionMeta.remoteAddress || previous.remoteAddress || null,
       protocol: connectionMeta.protocol || previous.protocol || "ws",
+      stream: connectionMeta.stream || previous.stream || null,
       lastEvent: previous.lastEvent || null,
-      sensor: previous.sensor || null
+      sensor: previous.sensor || null,
+      sensors: previous.sensors || {}
     });
+    if (connectionMeta.stream) this.#resetSequenceIfNewStream(key, connectionMeta.stream);
     this.events.emit("controller-status", this.getControllerSnapshot(key));
   }
 
@@ -53,38 +57,83 @@ export class ControllerBridge {
   }
 
   ingest(rawEvent) {
+    const seq = this.#parseSeq(rawEvent?.seq);
+    if (seq !== null && this.isDuplicateSeq(rawEvent?.source, seq)) {
+      return { ok: true, duplicate: true, seq };
+    }
     const parsed = this.#validateEvent(rawEvent);
     const source = parsed.source;
-    const lastAcceptedAt = this.lastAcceptedAtBySource.get(source) || 0;
-    const nowMs = Date.now();
-    if (nowMs - lastAcceptedAt < this.minIntervalMs) {
-      return { ok: false, code: "RATE_LIMITED", reason: "Event dropped due to rate limit" };
+    // Sensor readings are paced by the station's poller and sequenced events by its outbox (a dropped
+    // sequenced event would still be covered by the next cumulative ack), so neither hits the rate limit.
+    if (parsed.event !== "SENSOR" && seq === null) {
+      const lastAcceptedAt = this.lastAcceptedAtBySource.get(source) || 0;
+      const nowMs = Date.now();
+      if (nowMs - lastAcceptedAt < this.minIntervalMs) {
+        return { ok: false, code: "RATE_LIMITED", reason: "Event dropped due to rate limit" };
+      }
+      this.lastAcceptedAtBySource.set(source, nowMs);
     }
-    this.lastAcceptedAtBySource.set(source, nowMs);
+    if (seq !== null) this.recordSeq(source, seq);
 
-    const previous = this.controllers.get(source) || {};
-    const next = {
-      ...previous,
-      source,
-      connected: true,
-      lastSeenAt: nowIso(),
-      lastHeartbeatAt: nowIso(),
-      lastEvent: parsed
-    };
+    this.#accept(parsed);
+    this.events.emit("controller-status", this.getControllerSnapshot(source));
 
-    if (parsed.event === "SENSOR") {
-      next.sensor = {
-        tempC: parsed.data.temp_c,
-        humidity: parsed.data.humidity,
-        ts: parsed.ts
-      };
+    return { ok: true, event: parsed, ...(seq !== null ? { seq } : {}) };
+  }
+
+  ingestBatch(rawEvents, { source: defaultSource = "" } = {}) {
+    if (!Array.isArray(rawEvents) || !rawEvents.length) {
+      throw this.#invalid("events must be a non-empty array");
     }
 
-    this.controllers.set(source, next);
-    this.events.emit("controller-event", parsed);
-    this.events.emit("controller-status", this.getControllerSnapshot(source));
+    const batchSource = String(defaultSource || rawEvents[0]?.source || "").trim();
+    const seq = rawEvents.reduce((max, rawEvent) => Math.max(max, this.#parseSeq(rawEvent?.seq) ?? 0), 0) || null;
+    // An unsequenced frame counts once against the per-source rate limit, however many events it
+    // carries. Sequenced frames are paced by the outbox and skip it, as in ingest(). A rejected batch
+    // carries no seq, so nothing is acked and nothing is lost.
+    if (seq === null) {
+      const lastAcceptedAt = this.lastAcceptedAtBySource.get(batchSource) || 0;
+      const nowMs = Date.now();
+      if (nowMs - lastAcceptedAt < this.minIntervalMs) {
+        return { ok: false, code: "RATE_LIMITED", reason: "Batch dropped due to rate limit" };
+      }
+      this.lastAcceptedAtBySource.set(batchSource, nowMs);
+    }
+
+    const touchedSources = new Set();
+    const results = rawEvents.map((rawEvent) => {
+      const eventSeq = this.#parseSeq(rawEvent?.seq);
+      const event = { ...rawEvent, source: String(rawEvent?.source || batchSource).trim() };
+      if (eventSeq !== null && this.isDuplicateSeq(event.source, eventSeq)) {
+        return { ok: true, duplicate: true, seq: eventSeq };
+      }
+      let parsed;
+      try {
+        parsed = this.#validateEvent(event);
+      } catch (error) {
+        return { ok: false, code: error.code || "INVALID_CONTROLLER_EVENT", error: error.message, seq: eventSeq };
+      }
+      if (eventSeq !== null) this.recordSeq(parsed.source, eventSeq);
+      this.#accept(parsed);
+      touchedSources.add(parsed.source);
+      return { ok: true, event: parsed, seq: eventSeq };
+    });
+
+    touchedSources.forEach((key) => this.events.emit("controller-status", this.getControllerSnapshot(key)));
+    const accepted = results.filter((result) => result.ok && !result.duplicate).length;
+    return { ok: true, accepted, results, ...(seq !== null ? { seq } : {}) };
+  }
+
+  isDuplicateSeq(source, seq) {
+    const key = String(source || "").trim();
+    const state = this.sequenceBySource.get(key);
+    return Boolean(state) && seq <= state.lastSeq;
+  }
 
-    return { ok: true, event: parsed };
+  recordSeq(source, seq) {
+    const key = String(source || "").trim();
+    const state = this.sequenceBySource.get(key) || { stream: null, lastSeq: 0 };
+    if (seq > state.lastSeq) this.sequenceBySource.set(key, { ...state, lastSeq: seq });
   }
 
   getControllerSnapshot(source) {
@@ -115,6 +164,47 @@ export class ControllerBridge {
     return () => this.events.off("controller-status", listener);
   }
 
+  #accept(parsed) {
+    const previous = this.controllers.get(parsed.source) || {};
+    const next = {
+      ...previous,
+      source: parsed.source,
+      connected: true,
+      lastSeenAt: nowIso(),
+      lastHeartbeatAt: nowIso(),
+      lastEvent: parsed
+    };
+
+    if (parsed.event === "SENSOR") {
+      // `sensor` stays the station's latest reading; `sensors` keeps one per sensor id.
+      next.sensor = {
+        tempC: parsed.data.temp_c,
+        humidity: parsed.data.humidity,
+        ts: parsed.ts,
+        ...(parsed.data.sensor ? { id: parsed.data.sensor } : {})
+      };
+      if (parsed.data.sensor) {
+        next.sensors = { ...(previous.sensors || {}), [parsed.data.sensor]: next.sensor };
+      }
+    }
+
+    this.controllers.set(parsed.source, next);
+    this.events.emit("controller-event", parsed);
+  }
+
+  #parseSeq(value) {
+    if (value === undefined || value === null || value === "") return null;
+    const seq = Number(value);
+    return Number.isSafeInteger(seq) && seq > 0 ? seq : null;
+  }
+
+  #resetSequenceIfNewStream(source, stream) {
+    const current = this.sequenceBySource.get(source);
+    if (!current || current.stream !== stream) {
+      this.sequenceBySource.set(source, { stream, lastSeq: 0 });
+    }
+  }
+
   #validateEvent(rawEvent) {
     if (!rawEvent || typeof rawEvent !== "object") {
       throw this.#invalid("Payload must be an object");
@@ -151,7 +241,8 @@ export class ControllerBridge {
     const temp = toFiniteNumber(data.temp_c);
     const humidity = toFiniteNumber(data.humidity);
     if (temp === null || humidity === null) throw this.#invalid("SENSOR requires numeric temp_c and humidity");
-    return { type, source, ts, event, data: { temp_c: temp, humidity } };
+    const sensor = String(data.sensor ?? "").trim().slice(0, 64);
+    return { type, source, ts, event, data: { temp_c: temp, humidity, ...(sensor ? { sensor } : {}) } };
   }
 
   #invalid(message) {
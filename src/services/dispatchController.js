@@ -218,10 +218,39 @@ export function syncState({ queueOrderIds, lineItemKeysByOrderId, mode } = {}) {
   return nextState;
 }
 
-export function next() {
+const MAX_SELECTION_STEPS = 500;
+
+// Step count for next/prev and qty_increase/qty_decrease. The action name gives the direction,
+// so steps is a count: an integer from 1 to MAX_SELECTION_STEPS, default 1.
+export function normalizeSteps(steps) {
+  if (steps === undefined || steps === null) return 1;
+  const parsed = Number(steps);
+  if (!Number.isInteger(parsed) || parsed < 1 || parsed > MAX_SELECTION_STEPS) {
+    const err = new Error(`steps must be an integer between 1 and ${MAX_SELECTION_STEPS}.`);
+    err.code = "INVALID_REMOTE_PAYLOAD";
+    throw err;
+  }
+  return parsed;
+}
+
+// Moves the selection by `count` lines (negative moves back) and emits a single state change.
+function moveSelection(action, count) {
   const previousState = getState();
   if (!dispatchState.queueOrderIds.length) return getState();
   ensureSelection();
+  for (let step = 0; step < Math.abs(count); step += 1) {
+    if (count > 0) {
+      stepForward();
+    } else {
+      stepBackward();
+    }
+  }
+  const nextState = getState();
+  emitStateChange(action, previousState, nextState, count === 1 || count === -1 ? {} : { steps: count });
+  return nextState;
+}
+
+function stepForward() {
   const lineItemKeys = getLineItemKeysForOrder(dispatchState.selectedOrderId);
   if (lineItemKeys.length) {
     const currentLineIndex = lineItemKeys.indexOf(dispatchState.selectedLineItemKey);
@@ -235,15 +264,9 @@ export function next() {
     const index = getSelectedIndex();
     selectIndex(index === -1 ? 0 : index + 1);
   }
-  const nextState = getState();
-  emitStateChange("next", previousState, nextState);
-  return nextState;
 }
 
-export function prev() {
-  const previousState = getState();
-  if (!dispatchState.queueOrderIds.length) return getState();
-  ensureSelection();
+function stepBackward() {
   const lineItemKeys = getLineItemKeysForOrder(dispatchState.selectedOrderId);
   if (lineItemKeys.length) {
     const currentLineIndex = lineItemKeys.indexOf(dispatchState.selectedLineItemKey);
@@ -261,9 +284,14 @@ export function prev() {
     const previousOrderLineItems = getLineItemKeysForOrder(selectedOrderId);
     dispatchState.selectedLineItemKey = previousOrderLineItems[previousOrderLineItems.length - 1] || null;
   }
-  const nextState = getState();
-  emitStateChange("prev", previousState, nextState);
-  return nextState;
+}
+
+export function next({ steps } = {}) {
+  return moveSelection("next", normalizeSteps(steps));
+}
+
+export function prev({ steps } = {}) {
+  return moveSelection("prev", -normalizeSteps(steps));
 }
 
 export function confirm() {
@@ -516,13 +544,14 @@ export function getEnvironmentState({ now = Date.now(), staleMs = 60000 } = {})
   return cloneEnvironment();
 }
 
-export function recordRemoteHeartbeat(heartbeat, { now = Date.now(), staleMs = 30000 } = {}) {
+export function recordRemoteHeartbeat(heartbeat, { now = Date.now(), staleMs = 30000, implicit = false } = {}) {
   const remoteId = String(heartbeat?.remoteId || "").trim();
   if (!remoteId) {
     const err = new Error("remoteId is required.");
     err.code = "INVALID_REMOTE_PAYLOAD";
     throw err;
   }
+  if (implicit) return recordImplicitHeartbeat(remoteId, heartbeat, { now, staleMs });
   const previousState = getState();
   dispatchState.remote.remoteId = remoteId;
   dispatchState.remote.firmwareVersion = String(heartbeat?.firmwareVersion || "").trim() || null;
@@ -538,6 +567,33 @@ export function recordRemoteHeartbeat(heartbeat, { now = Date.now(), staleMs = 3
   return nextState.remote;
 }
 
+// Actions and telemetry uploads from a remote prove it is alive without a separate heartbeat
+// request. They only refresh liveness, keep battery/signal/profile from the last explicit
+// heartbeat, and emit events only when the remote's identity or status actually changes.
+function recordImplicitHeartbeat(remoteId, heartbeat, { now, staleMs }) {
+  const previous = cloneRemote();
+  const previousSeenMs = previous.lastSeenAt ? new Date(previous.lastSeenAt).getTime() : NaN;
+  const wasLive = Number.isFinite(previousSeenMs) && now - previousSeenMs <= staleMs;
+  const firmwareVersion = String(heartbeat?.firmwareVersion || heartbeat?.firmware || "").trim();
+
+  dispatchState.remote.remoteId = remoteId;
+  if (firmwareVersion) dispatchState.remote.firmwareVersion = firmwareVersion;
+  dispatchState.remote.lastSeenAt = new Date(now).toISOString();
+  dispatchState.remote.status = "connected";
+
+  const changed =
+    !wasLive ||
+    previous.remoteId !== remoteId ||
+    previous.firmwareVersion !== dispatchState.remote.firmwareVersion;
+  if (changed) {
+    const previousState = { ...getState(), remote: previous };
+    const nextState = getState();
+    emitStateChange("remoteHeartbeat", previousState, nextState, { source: "remote", remoteId, implicit: true });
+    emitCustomEvent("remote-status", { remote: nextState.remote, staleMs });
+  }
+  return cloneRemote();
+}
+
 export function getRemoteState({ now = Date.now(), staleMs = 30000 } = {}) {
   if (!dispatchState.remote.lastSeenAt) return cloneRemote();
   const lastSeenMs = new Date(dispatchState.remote.lastSeenAt).getTime();
@@ -4,6 +4,8 @@ import { promises as fs } from "fs";
 const TELEMETRY_DIR = path.join(process.cwd(), "data", "telemetry");
 const TELEMETRY_FILE = path.join(TELEMETRY_DIR, "environment.json");
 
+// Newest reading per station sensor; the reported latest is the newest of these.
+const latestBySensor = new Map();
 let latestEnvironment = null;
 
 function normalizeNumber(value, field) {
@@ -23,6 +25,23 @@ function firstDefined(...values) {
   return null;
 }
 
+function optionalNumber(value, field) {
+  return value === undefined || value === null || value === "" ? null : normalizeNumber(value, field);
+}
+
+// Per-minute rollups backfilled by the Pi stations carry their spread and sample count.
+function normalizeRollup(payload) {
+  if (payload.samples === undefined && payload.periodS === undefined) return null;
+  return {
+    periodS: optionalNumber(payload.periodS, "periodS") ?? 60,
+    samples: optionalNumber(payload.samples, "samples") ?? 0,
+    temperatureMinC: optionalNumber(payload.temperatureMinC, "temperatureMinC"),
+    temperatureMaxC: optionalNumber(payload.temperatureMaxC, "temperatureMaxC"),
+    humidityMinPct: optionalNumber(payload.humidityMinPct, "humidityMinPct"),
+    humidityMaxPct: optionalNumber(payload.humidityMaxPct, "humidityMaxPct")
+  };
+}
+
 function normalizePayload(payload = {}) {
   const stationId = String(firstDefined(payload.stationId, payload.deviceId) || "").trim();
   if (!stationId) {
@@ -52,8 +71,12 @@ function normalizePayload(payload = {}) {
   const hasTemp = rawTemperature !== null;
   const hasHumidity = rawHumidity !== null;
 
-  return {
+  // Stations with several sensors tag each reading with the sensor it came from.
+  const sensorId = String(payload.sensorId || "").trim().slice(0, 64);
+
+  const reading = {
     stationId,
+    ...(sensorId ? { sensorId } : {}),
     timestamp,
     temperatureC: hasTemp ? normalizeNumber(rawTemperature, "temperatureC") : null,
     humidityPct: hasHumidity ? normalizeNumber(rawHumidity, "humidityPct") : null,
@@ -64,6 +87,29 @@ function normalizePayload(payload = {}) {
       : 0,
     receivedAt: new Date().toISOString()
   };
+  const rollup = normalizeRollup(payload);
+  return rollup ? { ...reading, rollup } : reading;
+}
+
+function sensorKey(reading) {
+  return `${reading.stationId}\u0000${reading.sensorId || ""}`;
+}
+
+function isOlderThan(reading, current) {
+  return Boolean(current) && new Date(reading.timestamp).getTime() < new Date(current.timestamp).getTime();
+}
+
+// A backfill of older minutes never replaces a newer reading, neither its own sensor's nor,
+// as the reported latest, another sensor's. Returns whether the latest reading changed.
+function updateLatest(reading) {
+  const key = sensorKey(reading);
+  if (isOlderThan(reading, latestBySensor.get(key))) return false;
+  latestBySensor.set(key, reading);
+  if (latestEnvironment && sensorKey(latestEnvironment) !== key && isOlderThan(reading, latestEnvironment)) {
+    return false;
+  }
+  latestEnvironment = reading;
+  return true;
 }
 
 async function persistLatestEnvironment() {
@@ -77,11 +123,48 @@ async function persistLatestEnvironment() {
 }
 
 export async function ingestEnvironmentTelemetry(payload) {
-  latestEnvironment = normalizePayload(payload);
-  await persistLatestEnvironment();
+  const reading = normalizePayload(payload);
+  if (updateLatest(reading)) {
+    await persistLatestEnvironment();
+  }
   return latestEnvironment;
 }
 
+export async function ingestEnvironmentTelemetryBatch(payloads) {
+  if (!Array.isArray(payloads) || !payloads.length) {
+    const err = new Error("readings must be a non-empty array");
+    err.code = "INVALID_ENVIRONMENT_TELEMETRY";
+    throw err;
+  }
+
+  const rejected = [];
+  const accepted = [];
+  payloads.forEach((payload, index) => {
+    try {
+      accepted.push(normalizePayload(payload));
+    } catch (error) {
+      if (error?.code !== "INVALID_ENVIRONMENT_TELEMETRY") throw error;
+      rejected.push({ index, error: error.message });
+    }
+  });
+  if (!accepted.length) {
+    const err = new Error(rejected[0].error);
+    err.code = "INVALID_ENVIRONMENT_TELEMETRY";
+    throw err;
+  }
+
+  // Batched uploads keep each sensor's newest reading, unless a backfill of older minutes
+  // arrives after a live one. History stays in the Pi-side ring buffer (sensorlog.py).
+  let changed = false;
+  accepted.forEach((reading) => {
+    changed = updateLatest(reading) || changed;
+  });
+  if (changed) {
+    await persistLatestEnvironment();
+  }
+  return { environment: latestEnvironment, accepted: accepted.length, rejected };
+}
+
 export function getLatestEnvironmentTelemetry() {
   return latestEnvironment ? { ...latestEnvironment } : null;
 }
@@ -0,0 +1,243 @@
+import { config } from "../config.js";
+import { ingestEnvironmentTelemetryBatch } from "./environmentTelemetry.js";
+import {
+  adjustPackedQty,
+  confirm,
+  confirmHold,
+  getEnvironmentState,
+  getState,
+  next,
+  normalizeSteps,
+  prev,
+  recordRemoteHeartbeat,
+  requestFulfill,
+  requestPrint,
+  setPackedQty,
+  upsertEnvironmentReading
+} from "./dispatchController.js";
+
+// Remote commands are shared by the HTTP routes (/dispatch/remote/*, /dispatch/environment)
+// and the /ws/controller socket. Each handler returns { status, body } so either transport
+// can relay the same answer.
+
+const REMOTE_ACTIONS = new Set([
+  "next",
+  "prev",
+  "confirm",
+  "print",
+  "fulfill",
+  "confirm_hold",
+  "set_packed_qty",
+  "qty_increase",
+  "qty_decrease"
+]);
+// Recent idempotency keys per remote, oldest first. A window rather than only the last key,
+// because a retried action can arrive after newer presses from the same remote.
+const remoteIdempotencyByRemote = new Map();
+
+function hasIdempotencyKey(remoteId, key) {
+  return Boolean(remoteIdempotencyByRemote.get(remoteId)?.has(key));
+}
+
+function rememberIdempotencyKey(remoteId, key) {
+  let keys = remoteIdempotencyByRemote.get(remoteId);
+  if (!keys) {
+    keys = new Set();
+    remoteIdempotencyByRemote.set(remoteId, keys);
+  }
+  keys.add(key);
+  const window = Math.max(1, Math.floor(config.REMOTE_IDEMPOTENCY_WINDOW || 1));
+  while (keys.size > window) {
+    keys.delete(keys.values().next().value);
+  }
+}
+
+function forgetIdempotencyKey(remoteId, key) {
+  remoteIdempotencyByRemote.get(remoteId)?.delete(key);
+}
+
+function bearerTokenFrom(authorization) {
+  const authHeader = String(authorization || "").trim();
+  return authHeader.startsWith("Bearer ") ? authHeader.slice(7).trim() : "";
+}
+
+export function isPrivateIp(ip) {
+  if (!ip) return false;
+  if (ip === "127.0.0.1" || ip === "::1") return true;
+  const parts = ip.split(".").map((part) => Number(part));
+  if (parts.length !== 4 || parts.some((part) => Number.isNaN(part))) return false;
+  if (parts[0] === 10) return true;
+  if (parts[0] === 192 && parts[1] === 168) return true;
+  if (parts[0] === 172 && parts[1] >= 16 && parts[1] <= 31) return true;
+  return false;
+}
+
+export function isRotaryRequestAuthorized({ authorization, ip }) {
+  const token = String(config.ROTARY_TOKEN || "").trim();
+  if (token) {
+    const bearerToken = bearerTokenFrom(authorization);
+    return Boolean(bearerToken) && bearerToken === token;
+  }
+  return isPrivateIp(String(ip || "").replace("::ffff:", ""));
+}
+
+export function isRemoteRequestAuthorized({ authorization, ip }) {
+  const token = String(config.REMOTE_TOKEN || "").trim();
+  if (!token) return isRotaryRequestAuthorized({ authorization, ip });
+  const bearerToken = bearerTokenFrom(authorization);
+  return Boolean(bearerToken) && bearerToken === token;
+}
+
+export function remoteUnauthorizedResult() {
+  const hasToken = Boolean(String(config.REMOTE_TOKEN || "").trim());
+  return { status: hasToken ? 401 : 403, body: { ok: false, error: hasToken ? "Unauthorized" : "Forbidden" } };
+}
+
+export function recordImplicitRemoteHeartbeat(body) {
+  if (!String(body?.remoteId || "").trim()) return;
+  recordRemoteHeartbeat(
+    { remoteId: body.remoteId, firmwareVersion: body.firmwareVersion ?? body.firmware },
+    { staleMs: config.REMOTE_HEARTBEAT_STALE_MS, implicit: true }
+  );
+}
+
+export function applyRemoteAction(body) {
+  const action = String(body?.action || "").trim().toLowerCase();
+  const remoteId = String(body?.remoteId || "unknown").trim() || "unknown";
+  const idempotencyKey = String(body?.idempotencyKey || "").trim();
+  if (!action) {
+    return { status: 400, body: { ok: false, error: "action is required" } };
+  }
+  if (!REMOTE_ACTIONS.has(action)) {
+    return { status: 400, body: { ok: false, error: "Unsupported remote action" } };
+  }
+  recordImplicitRemoteHeartbeat(body);
+
+  if (idempotencyKey) {
+    if (hasIdempotencyKey(remoteId, idempotencyKey)) {
+      const state = getState();
+      return {
+        status: 200,
+        body: { ok: true, action, selectedOrderId: state.selectedOrderId, selectedLineItemKey: state.selectedLineItemKey, deduped: true }
+      };
+    }
+    rememberIdempotencyKey(remoteId, idempotencyKey);
+  }
+
+  try {
+    let state;
+    // Rotation may arrive as one action carrying the net detent count; `steps` defaults to 1.
+    if (action === "next") state = next({ steps: body?.steps });
+    if (action === "prev") state = prev({ steps: body?.steps });
+    if (action === "confirm") state = confirm();
+    if (action === "print") state = requestPrint();
+    if (action === "fulfill") state = requestFulfill();
+    if (action === "confirm_hold") state = confirmHold();
+    if (action === "set_packed_qty") {
+      state = setPackedQty({
+        lineItemKey: body?.lineItemKey ?? body?.selectedLineItemKey,
+        qty: body?.qty
+      });
+    }
+    if (action === "qty_increase") {
+      state = adjustPackedQty({
+        lineItemKey: body?.lineItemKey ?? body?.selectedLineItemKey,
+        delta: normalizeSteps(body?.steps)
+      });
+    }
+    if (action === "qty_decrease") {
+      state = adjustPackedQty({
+        lineItemKey: body?.lineItemKey ?? body?.selectedLineItemKey,
+        delta: -normalizeSteps(body?.steps)
+      });
+    }
+    return {
+      status: 200,
+      body: { ok: true, action, selectedOrderId: state?.selectedOrderId || null, selectedLineItemKey: state?.selectedLineItemKey || null }
+    };
+  } catch (error) {
+    // Nothing was applied, so a retry with the same key must run again rather than be deduped.
+    if (idempotencyKey) forgetIdempotencyKey(remoteId, idempotencyKey);
+    if (error?.code === "NO_SELECTED_ORDER") {
+      return { status: 409, body: { ok: false, action, error: error.message } };
+    }
+    if (error?.code === "INVALID_REMOTE_PAYLOAD") {
+      return { status: 400, body: { ok: false, action, error: error.message } };
+    }
+    return { status: 500, body: { ok: false, action, error: "Failed to apply remote action" } };
+  }
+}
+
+export function applyRemoteHeartbeat(body) {
+  try {
+    const remote = recordRemoteHeartbeat(body, { staleMs: config.REMOTE_HEARTBEAT_STALE_MS });
+    return { status: 200, body: { ok: true, remote } };
+  } catch (error) {
+    if (error?.code === "INVALID_REMOTE_PAYLOAD") {
+      return { status: 400, body: { ok: false, error: error.message } };
+    }
+    return { status: 500, body: { ok: false, error: "Failed to record remote heartbeat" } };
+  }
+}
+
+function newestDispatchReading(readings) {
+  let newest = null;
+  let newestAtMs = -Infinity;
+  readings.forEach((reading) => {
+    if (reading?.temperatureC == null || reading?.humidityPct == null) return;
+    const recordedAt = reading.recordedAt || reading.timestamp;
+    const recordedAtMs = new Date(recordedAt).getTime();
+    if (!Number.isFinite(recordedAtMs) || recordedAtMs < newestAtMs) return;
+    newestAtMs = recordedAtMs;
+    newest = { ...reading, deviceId: reading.deviceId || reading.stationId, recordedAt };
+  });
+  return newest;
+}
+
+export async function applyEnvironmentUpload(body) {
+  const environmentOptions = {
+    staleMs: config.ENV_STALE_MS,
+    tempMin: config.ENV_TEMP_MIN_C,
+    tempMax: config.ENV_TEMP_MAX_C,
+    humidityMin: config.ENV_HUMIDITY_MIN,
+    humidityMax: config.ENV_HUMIDITY_MAX
+  };
+  try {
+    recordImplicitRemoteHeartbeat(body);
+    if (Array.isArray(body?.readings)) {
+      // Batched uplink: station telemetry keeps the batch, dispatch shows its newest complete reading.
+      const { accepted, rejected } = await ingestEnvironmentTelemetryBatch(body.readings);
+      const latest = newestDispatchReading(body.readings);
+      const environment = latest
+        ? upsertEnvironmentReading(latest, environmentOptions)
+        : getEnvironmentState({ staleMs: config.ENV_STALE_MS });
+      return { status: 200, body: { ok: true, environment, accepted, rejected } };
+    }
+    const environment = upsertEnvironmentReading(body, environmentOptions);
+    return { status: 200, body: { ok: true, environment } };
+  } catch (error) {
+    if (error?.code === "INVALID_ENVIRONMENT_PAYLOAD" || error?.code === "INVALID_ENVIRONMENT_TELEMETRY") {
+      return { status: 400, body: { ok: false, error: error.message } };
+    }
+    return { status: 500, body: { ok: false, error: "Failed to save environment reading" } };
+  }
+}
+
+const SOCKET_COMMANDS = {
+  "remote-action": applyRemoteAction,
+  "remote-heartbeat": applyRemoteHeartbeat,
+  "remote-environment": applyEnvironmentUpload
+};
+
+export function isRemoteCommand(message) {
+  return Boolean(message) && Object.hasOwn(SOCKET_COMMANDS, message.type);
+}
+
+// Socket counterpart of the HTTP routes: { type, id, body } in, { id, status, body, serverTime } out.
+// serverTime (epoch ms) plays the role of the X-Server-Time response header.
+export async function handleRemoteCommand(message, { authorized }) {
+  const id = message?.id ?? null;
+  if (!authorized) return { id, ...remoteUnauthorizedResult(), serverTime: Date.now() };
+  const result = await SOCKET_COMMANDS[message.type](message.body || {});
+  return { id, ...result, serverTime: Date.now() };
+}
@@ -108,6 +108,88 @@ test('environment ingest endpoint stores telemetry and statusz includes summary'
   }
 });
 
+test('environment ingest accepts a batch of readings and keeps the newest', async () => {
+  const { server, baseUrl } = await startServer();
+  try {
+    const older = new Date(Date.now() - 20000).toISOString();
+    const newer = new Date().toISOString();
+    const response = await fetch(`${baseUrl}/api/v1/environment/ingest`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        readings: [
+          { stationId: 'scan-station-02', timestamp: newer, temperatureC: 24.1, humidityPct: 48, status: 'ok' },
+          { stationId: 'scan-station-02', timestamp: older, temperatureC: 22.9, humidityPct: 50, status: 'ok' },
+          { timestamp: newer, temperatureC: 21, humidityPct: 40 }
+        ]
+      })
+    });
+    assert.equal(response.status, 200);
+    const body = await response.json();
+    assert.equal(body.ok, true);
+    assert.equal(body.accepted, 2);
+    assert.equal(body.rejected.length, 1);
+    assert.equal(body.rejected[0].index, 2);
+    assert.equal(body.environment.temperatureC, 24.1);
+    assert.equal(body.environment.timestamp, newer);
+  } finally {
+    await new Promise((resolve) => server.close(resolve));
+  }
+});
+
+test('environment backfill of older minute rollups does not replace the latest reading', async () => {
+  const { server, baseUrl } = await startServer();
+  const ingest = (body) =>
+    fetch(`${baseUrl}/api/v1/environment/ingest`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body)
+    });
+  try {
+    const live = new Date().toISOString();
+    await ingest({ stationId: 'cold-room-01', timestamp: live, temperatureC: 4.2, humidityPct: 80, status: 'ok' });
+
+    const minute = (offset) => new Date(Math.floor(Date.now() / 60000) * 60000 - offset * 60000).toISOString();
+    const response = await ingest([
+      { stationId: 'cold-room-01', timestamp: minute(3), temperatureC: 3.9, temperatureMinC: 3.5, temperatureMaxC: 4.1, humidityPct: 81, samples: 12, periodS: 60, status: 'ok' },
+      { stationId: 'cold-room-01', timestamp: minute(2), temperatureC: 4.0, temperatureMinC: 3.8, temperatureMaxC: 4.3, humidityPct: 80, samples: 12, periodS: 60, status: 'ok' }
+    ]);
+    assert.equal(response.status, 200);
+    const body = await response.json();
+    assert.equal(body.accepted, 2);
+    assert.equal(body.environment.timestamp, live);
+    assert.equal(body.environment.temperatureC, 4.2);
+  } finally {
+    await new Promise((resolve) => server.close(resolve));
+  }
+});
+
+test('environment backfill from a second sensor does not replace another sensor\'s live reading', async () => {
+  const { server, baseUrl } = await startServer();
+  const ingest = (body) =>
+    fetch(`${baseUrl}/api/v1/environment/ingest`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body)
+    });
+  try {
+    const live = new Date().toISOString();
+    await ingest({ stationId: 'pi-station-03', sensorId: 'packing', timestamp: live, temperatureC: 21.5, humidityPct: 55, status: 'ok' });
+
+    const threeHoursAgo = new Date(Date.now() - 3 * 3600 * 1000).toISOString();
+    const response = await ingest([
+      { stationId: 'pi-station-03', sensorId: 'cold-room', timestamp: threeHoursAgo, temperatureC: 3.9, humidityPct: 82, samples: 12, periodS: 60, status: 'ok' }
+    ]);
+    assert.equal(response.status, 200);
+    const body = await response.json();
+    assert.equal(body.accepted, 1);
+    assert.equal(body.environment.sensorId, 'packing');
+    assert.equal(body.environment.timestamp, live);
+  } finally {
+    await new Promise((resolve) => server.close(resolve));
+  }
+});
+
 
 
 
@@ -43,3 +43,136 @@ test("applies per-source rate limit", () => {
   assert.equal(two.ok, false);
   assert.equal(two.code, "RATE_LIMITED");
 });
+
+test("acknowledges replayed sequence numbers as duplicates", () => {
+  const bridge = new ControllerBridge({ minIntervalMs: 1 });
+  bridge.touchConnection("pi-station-01", { stream: "abc" });
+  const event = {
+    type: "controller",
+    source: "pi-station-01",
+    seq: 7,
+    event: "PRESS",
+    data: { button: "CONFIRM", action: "click", shift: false }
+  };
+
+  const first = bridge.ingest(event);
+  const replay = bridge.ingest(event);
+
+  assert.equal(first.ok, true);
+  assert.equal(first.seq, 7);
+  assert.equal(replay.ok, true);
+  assert.equal(replay.duplicate, true);
+});
+
+test("never rate-limits sequenced events so a cumulative ack cannot drop one", () => {
+  const bridge = new ControllerBridge({ minIntervalMs: 1000 });
+  bridge.touchConnection("pi-station-01", { stream: "abc" });
+  const press = (seq) =>
+    bridge.ingest({
+      type: "controller",
+      source: "pi-station-01",
+      seq,
+      event: "PRESS",
+      data: { button: "CONFIRM", action: "click", shift: false }
+    });
+
+  const first = press(8);
+  const second = press(9);
+
+  assert.equal(first.ok, true);
+  assert.equal(second.ok, true);
+  assert.equal(second.seq, 9);
+  assert.equal(second.event.event, "PRESS");
+});
+
+test("resets sequence tracking when the controller reports a new stream", () => {
+  const bridge = new ControllerBridge({ minIntervalMs: 1 });
+  bridge.touchConnection("pi-station-01", { stream: "old" });
+  bridge.recordSeq("pi-station-01", 50);
+  assert.equal(bridge.isDuplicateSeq("pi-station-01", 3), true);
+
+  bridge.touchConnection("pi-station-01", { stream: "new" });
+  assert.equal(bridge.isDuplicateSeq("pi-station-01", 3), false);
+});
+
+test("ingests a sequenced batch frame", () => {
+  const bridge = new ControllerBridge({ minIntervalMs: 1000 });
+  const seen = [];
+  bridge.onEvent((event) => seen.push(event));
+  const result = bridge.ingestBatch(
+    [
+      { type: "controller", seq: 1, event: "ROTATE", data: { dir: "CW", steps: 2, shift: false } },
+      { type: "controller", seq: 2, event: "PRESS", data: { button: "CONFIRM", action: "click", shift: false } },
+      { type: "controller", seq: 3, event: "PRESS", data: { button: "NOPE", action: "click" } }
+    ],
+    { source: "pi-station-01" }
+  );
+
+  assert.equal(result.ok, true);
+  assert.equal(result.accepted, 2);
+  assert.equal(result.seq, 3);
+  assert.equal(result.results[2].ok, false);
+  assert.deepEqual(seen.map((event) => event.event), ["ROTATE", "PRESS"]);
+});
+
+test("keeps the latest reading per sensor id without spending the input rate limit", () => {
+  const bridge = new ControllerBridge({ minIntervalMs: 1000 });
+  const reading = (sensor, temp) =>
+    bridge.ingest({ type: "controller", source: "pi-station-02", event: "SENSOR", data: { sensor, temp_c: temp, humidity: 50 } });
+
+  assert.equal(reading("packing", 21.5).event.data.sensor, "packing");
+  reading("cold-room", 4.1);
+  reading("packing", 22);
+
+  const snapshot = bridge.getControllerSnapshot("pi-station-02");
+  assert.equal(snapshot.sensor.id, "packing");
+  assert.deepEqual(Object.keys(snapshot.sensors).sort(), ["cold-room", "packing"]);
+  assert.equal(snapshot.sensors["cold-room"].tempC, 4.1);
+  assert.equal(snapshot.sensors.packing.tempC, 22);
+
+  const press = bridge.ingest({
+    type: "controller",
+    source: "pi-station-02",
+    event: "PRESS",
+    data: { button: "CONFIRM", action: "click", shift: false }
+  });
+  assert.equal(press.ok, true);
+});
+
+test("rate-limits unsequenced batches as one unit and never offers a seq to ack", () => {
+  const bridge = new ControllerBridge({ minIntervalMs: 1000 });
+  const batch = () =>
+    bridge.ingestBatch(
+      [
+        { type: "controller", event: "ROTATE", data: { dir: "CW", steps: 1, shift: false } },
+        { type: "controller", event: "ROTATE", data: { dir: "CW", steps: 1, shift: false } }
+      ],
+      { source: "pi-station-01" }
+    );
+
+  assert.equal(batch().accepted, 2);
+  const limited = batch();
+  assert.equal(limited.code, "RATE_LIMITED");
+  assert.equal("seq" in limited, false);
+});
+
+test("does not rate-limit back-to-back sequenced batches", () => {
+  const bridge = new ControllerBridge({ minIntervalMs: 1000 });
+  bridge.touchConnection("pi-station-01", { stream: "abc" });
+  const batch = (first) =>
+    bridge.ingestBatch(
+      [
+        { type: "controller", seq: first, event: "ROTATE", data: { dir: "CW", steps: 1, shift: false } },
+        { type: "controller", seq: first + 1, event: "PRESS", data: { button: "CONFIRM", action: "click", shift: false } }
+      ],
+      { source: "pi-station-01" }
+    );
+
+  const one = batch(1);
+  const two = batch(3);
+
+  assert.equal(one.accepted, 2);
+  assert.equal(two.ok, true);
+  assert.equal(two.accepted, 2);
+  assert.equal(two.seq, 4);
+});
@@ -213,6 +213,7 @@ test('dispatch environment and remote endpoints support telemetry and remote act
       })
     });
     assert.equal(remoteActionResponse.status, 200);
+    assert.match(remoteActionResponse.headers.get('x-server-time') || '', /^\d+$/);
     const remoteActionBody = await remoteActionResponse.json();
     assert.equal(remoteActionBody.selectedOrderId, '3002');
 
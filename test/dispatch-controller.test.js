@@ -0,0 +1,84 @@
+import test from 'node:test';
+import assert from 'node:assert/strict';
+
+import {
+  getRemoteState,
+  next,
+  onCustomEvent,
+  onStateChange,
+  prev,
+  recordRemoteHeartbeat,
+  syncState
+} from '../src/services/dispatchController.js';
+
+test('implicit heartbeats refresh liveness without clearing explicit heartbeat details', () => {
+  const now = Date.now();
+  recordRemoteHeartbeat(
+    { remoteId: 'remote-implicit', firmwareVersion: '1.0.0', batteryPct: 80, profile: 'packing' },
+    { now, staleMs: 30000 }
+  );
+
+  const statusEvents = [];
+  const unsubscribe = onCustomEvent((event) => {
+    if (event.event === 'remote-status') statusEvents.push(event.payload);
+  });
+  try {
+    const remote = recordRemoteHeartbeat({ remoteId: 'remote-implicit' }, { now: now + 5000, staleMs: 30000, implicit: true });
+    assert.equal(remote.lastSeenAt, new Date(now + 5000).toISOString());
+    assert.equal(remote.status, 'connected');
+    assert.equal(remote.firmwareVersion, '1.0.0');
+    assert.equal(remote.batteryPct, 80);
+    assert.equal(remote.profile, 'packing');
+    assert.equal(statusEvents.length, 0, 'routine traffic should not broadcast remote-status');
+
+    recordRemoteHeartbeat(
+      { remoteId: 'remote-implicit', firmware: '1.1.0' },
+      { now: now + 6000, staleMs: 30000, implicit: true }
+    );
+    assert.equal(statusEvents.length, 1);
+    assert.equal(statusEvents[0].remote.firmwareVersion, '1.1.0');
+
+    const stale = getRemoteState({ now: now + 40000, staleMs: 30000 });
+    assert.equal(stale.status, 'stale');
+    recordRemoteHeartbeat({ remoteId: 'remote-implicit' }, { now: now + 41000, staleMs: 30000, implicit: true });
+    assert.equal(statusEvents.length, 2, 'traffic after an idle gap should announce the remote is back');
+    assert.equal(getRemoteState({ now: now + 41000, staleMs: 30000 }).status, 'connected');
+  } finally {
+    unsubscribe();
+  }
+});
+
+test('implicit heartbeats still require a remoteId', () => {
+  assert.throws(
+    () => recordRemoteHeartbeat({}, { implicit: true }),
+    (error) => error.code === 'INVALID_REMOTE_PAYLOAD'
+  );
+});
+
+test('next and prev move by a step count with one state change', () => {
+  syncState({
+    queueOrderIds: ['6001', '6002', '6003'],
+    lineItemKeysByOrderId: { 6001: ['a1', 'a2'], 6002: ['b1'] },
+    mode: 'dispatch'
+  });
+  const changes = [];
+  const unsubscribe = onStateChange((change) => changes.push(change));
+  try {
+    // a1 -> a2 -> 6002/b1 -> 6003
+    assert.equal(next({ steps: 3 }).selectedOrderId, '6003');
+    assert.equal(changes.length, 1);
+    assert.equal(changes[0].metadata.steps, 3);
+
+    const back = prev({ steps: 2 });
+    assert.equal(back.selectedOrderId, '6001');
+    assert.equal(back.selectedLineItemKey, 'a2');
+    assert.equal(prev({ steps: 1 }).selectedLineItemKey, 'a1');
+    assert.equal(changes.length, 3);
+
+    assert.throws(() => next({ steps: 1.5 }), { code: 'INVALID_REMOTE_PAYLOAD' });
+    assert.throws(() => prev({ steps: 0 }), { code: 'INVALID_REMOTE_PAYLOAD' });
+    assert.throws(() => next({ steps: -1 }), { code: 'INVALID_REMOTE_PAYLOAD' });
+  } finally {
+    unsubscribe();
+  }
+});
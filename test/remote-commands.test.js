@@ -0,0 +1,83 @@
+import test from 'node:test';
+import assert from 'node:assert/strict';
+
+import { syncState } from '../src/services/dispatchController.js';
+import { handleRemoteCommand, isRemoteCommand } from '../src/services/remoteCommands.js';
+
+test('socket remote commands reuse the HTTP handlers and echo the request id', async () => {
+  syncState({ queueOrderIds: ['4001', '4002'], lineItemKeysByOrderId: {}, mode: 'dispatch' });
+
+  assert.equal(isRemoteCommand({ type: 'remote-action' }), true);
+  assert.equal(isRemoteCommand({ type: 'controller' }), false);
+
+  const body = { action: 'next', remoteId: 'remote-ws', idempotencyKey: 'ws-1' };
+  const first = await handleRemoteCommand({ type: 'remote-action', id: 'ws-1', body }, { authorized: true });
+  assert.equal(first.id, 'ws-1');
+  assert.equal(first.status, 200);
+  assert.equal(first.body.selectedOrderId, '4002');
+  assert.equal(typeof first.serverTime, 'number');
+
+  const replay = await handleRemoteCommand({ type: 'remote-action', id: 'ws-1', body }, { authorized: true });
+  assert.equal(replay.body.deduped, true);
+  assert.equal(replay.body.selectedOrderId, '4002');
+
+  const heartbeat = await handleRemoteCommand({ type: 'remote-heartbeat', id: 'hb-1', body: {} }, { authorized: true });
+  assert.equal(heartbeat.status, 400);
+});
+
+test('remote actions dedupe a window of recent keys and let failed keys retry', async () => {
+  syncState({ queueOrderIds: ['5001', '5002', '5003', '5004'], lineItemKeysByOrderId: {}, mode: 'dispatch' });
+  const send = (idempotencyKey, action = 'next') =>
+    handleRemoteCommand(
+      { type: 'remote-action', id: idempotencyKey, body: { action, remoteId: 'remote-retry', idempotencyKey } },
+      { authorized: true }
+    );
+
+  assert.equal((await send('retry-1')).body.selectedOrderId, '5002');
+  assert.equal((await send('retry-2')).body.selectedOrderId, '5003');
+  // A late retry of the first press, after a newer one landed, must not advance again.
+  const lateRetry = await send('retry-1');
+  assert.equal(lateRetry.body.deduped, true);
+  assert.equal(lateRetry.body.selectedOrderId, '5003');
+
+  syncState({ queueOrderIds: [], lineItemKeysByOrderId: {}, mode: 'dispatch' });
+  assert.equal((await send('retry-print', 'print')).status, 409);
+  syncState({ queueOrderIds: ['5001'], lineItemKeysByOrderId: {}, mode: 'dispatch' });
+  const retriedPrint = await send('retry-print', 'print');
+  assert.equal(retriedPrint.status, 200);
+  assert.equal(retriedPrint.body.deduped, undefined);
+});
+
+test('remote rotation carries a step count', async () => {
+  syncState({ queueOrderIds: ['7001', '7002', '7003', '7004'], lineItemKeysByOrderId: {}, mode: 'dispatch' });
+  const send = (body) =>
+    handleRemoteCommand({ type: 'remote-action', id: 'steps', body: { remoteId: 'remote-steps', ...body } }, { authorized: true });
+
+  assert.equal((await send({ action: 'next', steps: 3 })).body.selectedOrderId, '7004');
+  assert.equal((await send({ action: 'prev', steps: 2 })).body.selectedOrderId, '7002');
+  assert.equal((await send({ action: 'next', steps: 'many' })).status, 400);
+});
+
+test('remote step counts are validated the same way for rotation and quantity', async () => {
+  syncState({ queueOrderIds: ['7101', '7102'], lineItemKeysByOrderId: { 7101: ['q1'] }, mode: 'dispatch' });
+  const send = (body) =>
+    handleRemoteCommand({ type: 'remote-action', id: 'bounds', body: { remoteId: 'remote-bounds', ...body } }, { authorized: true });
+
+  for (const action of ['next', 'prev', 'qty_increase', 'qty_decrease']) {
+    for (const steps of [-1, -1000, 0, 501, 2.5]) {
+      const result = await send({ action, steps, lineItemKey: 'q1' });
+      assert.equal(result.status, 400, `${action} steps=${steps}`);
+      assert.match(result.body.error, /between 1 and 500/);
+    }
+  }
+  assert.equal((await send({ action: 'next', steps: 1 })).status, 200);
+});
+
+test('socket remote commands require an authorized connection', async () => {
+  const result = await handleRemoteCommand(
+    { type: 'remote-action', id: 'ws-2', body: { action: 'next', remoteId: 'remote-ws' } },
+    { authorized: false }
+  );
+  assert.equal(result.id, 'ws-2');
+  assert.ok(result.status === 401 || result.status === 403);
+});